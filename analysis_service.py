@@ -2,6 +2,11 @@
 
 import jellyfish_plotly_browser as jelbrow
 import jelly_funcs as jelfun
+from jelly_cache import ResultCache
+from jelly_metrics import MetricsRegistry, StageMetrics
+from jelly_spectrograms import SpectrogramStore
+from jelly_store import FeatureStore
+import json
 import os
 import time
 from pathlib import Path
@@ -9,6 +14,17 @@ from pathlib import Path
 class AnalysisService:
     def __init__(self, config):
         self.config = config
+        
+        # Shared across requests so repeat uploads reuse earlier PSD results
+        cache_dir = config.get('RESULT_CACHE_DIR')
+        self.result_cache = ResultCache(cache_dir, config.get('RESULT_CACHE_MAX_BYTES', 2 * 1024**3)) if cache_dir else None
+
+        # Queryable record of every analysis' peaks, parameters and pairs
+        store_path = config.get('FEATURE_STORE_PATH')
+        self.feature_store = FeatureStore(store_path) if store_path else None
+
+        # Per-stage timings and memory of every analysis, for /metrics
+        self.metrics_registry = MetricsRegistry()
     
     def validate_files(self, files):
         """Validate uploaded files"""
@@ -27,9 +43,14 @@ class AnalysisService:
     
 
     
-    def process_analysis(self, session_dir, files, params):
-        """Main analysis processing"""
+    def process_analysis(self, session_dir, files, params, progress=None):
+        """Main analysis processing; progress(stage, fraction) is an optional status hook"""
         start_time = time.time()
+        metrics = StageMetrics()
+        if progress is None:
+            progress = lambda stage, fraction=None: None
+        # Spectrograms live in memory-mapped files until the page is rendered
+        spectrogram_store = SpectrogramStore(parent_dir=self.config.get('SPECTROGRAM_STORE_DIR'))
         
         try:
             # Remove dir_name from params for the analysis function only
@@ -41,34 +62,72 @@ class AnalysisService:
             #     if k not in ['dir_name', 'use_db_scale']
             # }
 
-            # Run analysis
-            fig, plots, _, dir_short_name = jelbrow.compare_methods_psd_analysis(
+            # PSD computation is most of the work; rendering gets the last 10%
+            def report_files(files_done, files_total):
+                progress(f"analyzing file {files_done}/{files_total}", 0.9 * files_done / files_total)
+
+            progress('analyzing', 0.0)
+
+            # Run analysis - headless: the web flow renders with Plotly, so no matplotlib figures
+            _, plots, _, dir_short_name = jelbrow.compare_methods_psd_analysis(
                 audio_directory=session_dir,
                 max_pairs=10,
                 selected_files=[f.filename for f in files],
+                n_workers=self.config.get('ANALYSIS_WORKERS', 1),
+                cache=self.result_cache,
+                stream_min_seconds=self.config.get('STREAM_MIN_SECONDS'),
+                headless=True,
+                spectrogram_store=spectrogram_store,
+                progress_callback=report_files,
+                metrics=metrics,
                 **analysis_params # Use filtered params
             )
             
             # Generate HTML
+            progress('rendering', 0.9)
             result = jelbrow.save_jellyfish_plotly(
                 plots,
                 base_filename=f"analysis_{int(time.time())}",
                 output_directory=session_dir,
                 #dir_name=dir_short_name, # Changed to use the user-provided name from params
+                export_spectrogram_images=False,
+                # Result page template: adds the navigation overlay at render time
+                template_name='analysis_result.html',
+                extra_template_vars={
+                    'NAV_PARAMS': params,
+                    'NAV_PROCESSING_TIME': time.time() - start_time,
+                },
+                open_browser=False,
+                feature_store=self.feature_store,
+                metrics=metrics,
                 **params
             )
             
             processing_time = time.time() - start_time
+            html_path = result[0] if isinstance(result, tuple) else result
+            self.metrics_registry.observe(metrics)
+
+            # Stage metrics travel with the result as <result>_metrics.json
+            metrics_data = dict(metrics.to_dict(), processing_time=processing_time, files_processed=len(files))
+            metrics_path = os.path.splitext(html_path)[0] + '_metrics.json'
+            with open(metrics_path, 'w', encoding='utf-8') as f:
+                json.dump(metrics_data, f, indent=2)
+
             return {
                 'success': True,
-                'html_path': result[0] if isinstance(result, tuple) else result,
+                'html_path': html_path,
+                'metrics_path': metrics_path,
+                'metrics': metrics_data,
                 'processing_time': processing_time,
                 'files_processed': len(files)
             }
             
         except Exception as e:
+            self.metrics_registry.observe(metrics, success=False)
             return {
                 'success': False,
                 'error': str(e),
                 'processing_time': time.time() - start_time
-            }
\ No newline at end of file
+            }
+        finally:
+            spectrogram_store.close()
\ No newline at end of file
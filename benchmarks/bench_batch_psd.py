@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Small-file throughput benchmark: files/s of compute_method_grid over a directory of
+short slices (copies of test_audio/slice_*.wav), file by file (batch_size=1) vs.
+batched, and whether every batched result is identical to the file-by-file one
+"""
+
+# bench_batch_psd.py
+
+import argparse
+import contextlib
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import jellyfish_plotly_browser as jelbrow
+
+DEFAULT_PARAMS = {'psd_n_fft': 1024, 'psd_hop_length': None, 'spec_n_fft': 512, 'spec_hop_length': None,
+                  'plot_fmax': 6000, 'n_fft': 1024, 'hop_length': None}
+
+
+def run_grid(paths, methods, method_params, batch_size):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        grid = jelbrow.compute_method_grid(paths, methods, method_params, batch_size=batch_size)
+        return time.perf_counter() - start, grid
+
+
+def identical(grid_a, grid_b):
+    return all(np.array_equal(x, y) for row_a, row_b in zip(grid_a, grid_b)
+               for result_a, result_b in zip(row_a, row_b) for x, y in zip(result_a, result_b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched PSD throughput on many short files")
+    parser.add_argument('--files', type=int, default=10000, help="Slices in the synthetic directory")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--methods', nargs='+', default=['FFT_DUAL'], choices=list(jelbrow.PSD_METHOD_FUNCS))
+    args = parser.parse_args()
+
+    sources = sorted(glob.glob(os.path.join(REPO_DIR, 'test_audio', 'slice_*.wav')))
+    method_params = jelbrow.build_method_params(DEFAULT_PARAMS)
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(workdir, f"slice_{i}.wav")
+            shutil.copyfile(sources[i % len(sources)], path)
+            paths.append(path)
+
+        # Warm the page cache and one-time setup before timing
+        run_grid(paths[:len(sources)], args.methods, method_params, 1)
+        baseline_time, baseline = run_grid(paths, args.methods, method_params, 1)
+        print(f"{len(paths)} files, methods {', '.join(args.methods)}")
+        print(f"{'batch size':>10} {'seconds':>9} {'files/s':>9} {'speedup':>8}  identical")
+        print(f"{1:>10} {baseline_time:>9.2f} {len(paths) / baseline_time:>9.0f} {1:>7.1f}x  -")
+        for batch_size in args.batch_sizes:
+            batch_time, grid = run_grid(paths, args.methods, method_params, batch_size)
+            print(f"{batch_size:>10} {batch_time:>9.2f} {len(paths) / batch_time:>9.0f}"
+                  f" {baseline_time / batch_time:>7.1f}x  {identical(baseline, grid)}")
+
+
+if __name__ == '__main__':
+    main()
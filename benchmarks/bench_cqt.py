@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+CQT PSD benchmark for a session of files of varying length:
+librosa.cqt per file (filter bases rebuilt every call) vs. the cached jelly_cqt
+plan (bases built once per process), and whether the results are identical
+"""
+
+# bench_cqt.py
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import librosa
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jelly_cqt as jelcqt
+
+# CQT parameters of build_method_params at the analysis defaults
+CQT_PARAMS = dict(fmin=600.0, n_bins=150, bins_per_octave=36, hop_length=128)
+
+
+def librosa_psds(signals, sr):
+    return [np.mean(np.abs(librosa.cqt(y, sr=sr, **CQT_PARAMS)) ** 2, axis=1) for y in signals]
+
+
+def plan_psds(signals, sr):
+    plan = jelcqt.cqt_plan(sr, CQT_PARAMS['fmin'], CQT_PARAMS['n_bins'], CQT_PARAMS['bins_per_octave'],
+                           CQT_PARAMS['hop_length'], signals[0].dtype)
+    return list(plan.mean_power(signals))
+
+
+def best_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CQT PSDs over a session of files")
+    parser.add_argument('--sr', type=int, default=44100)
+    parser.add_argument('--files', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--seconds', type=float, nargs='+', default=[0.05, 1, 5])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    # Short files trip librosa's 'n_fft too large' warning in both paths
+    warnings.filterwarnings('ignore', message='n_fft=')
+
+    start = time.perf_counter()
+    jelcqt.cqt_plan(args.sr, CQT_PARAMS['fmin'], CQT_PARAMS['n_bins'], CQT_PARAMS['bins_per_octave'],
+                    CQT_PARAMS['hop_length'], np.float32)
+    print(f"Plan construction (once per process): {time.perf_counter() - start:.3f} s\n")
+
+    rng = np.random.default_rng(0)
+    print(f"{'files':>6} {'seconds':>8} {'librosa (s)':>12} {'plan (s)':>10} {'speedup':>8} {'identical':>10}")
+    for n_files in args.files:
+        for seconds in args.seconds:
+            # Lengths vary by up to 20 % so no two files share a length
+            signals = [rng.normal(size=int(seconds * args.sr * rng.uniform(0.8, 1.0))).astype(np.float32)
+                       for _ in range(n_files)]
+            librosa_time, expected = best_time(lambda: librosa_psds(signals, args.sr), args.repeats)
+            plan_time, actual = best_time(lambda: plan_psds(signals, args.sr), args.repeats)
+            identical = all(np.array_equal(a, e) for a, e in zip(actual, expected))
+            print(f"{n_files:>6} {seconds:>8g} {librosa_time:>12.4f} {plan_time:>10.4f}"
+                  f" {librosa_time / plan_time:>7.1f}x {str(identical):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark: wall time of a fresh interpreter importing each module,
+plus the heaviest dependencies pulled in (from python -X importtime) and any files
+or directories the import created in the working directory
+"""
+
+# bench_import.py
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMER = (
+    "import time, sys; sys.path.insert(0, {repo!r}); start = time.perf_counter(); "
+    "import {module}; print(time.perf_counter() - start)"
+)
+
+
+def cold_import_seconds(module, cwd):
+    """Import time of module in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', TIMER.format(repo=REPO_DIR, module=module)],
+                            cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(module, cwd, top=8):
+    """(cumulative ms, name) of the slowest top-level dependencies, from -X importtime."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             f"import sys; sys.path.insert(0, {REPO_DIR!r}); import {module}"],
+                            cwd=cwd, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only direct children of the top level, so nested imports are not double counted
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import time")
+    parser.add_argument('--modules', nargs='+',
+                        default=['jelly_funcs', 'jellyfish_plotly_browser', 'analysis_service', 'jelly_app'])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="Heaviest dependencies to list per module")
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'median (s)':>10} {'min (s)':>9}  side effects")
+    for module in args.modules:
+        # Empty scratch directory, so anything the import creates shows up
+        with tempfile.TemporaryDirectory() as cwd:
+            times = [cold_import_seconds(module, cwd) for _ in range(args.repeats)]
+            created = sorted(os.listdir(cwd))
+        print(f"{module:<28} {statistics.median(times):>10.3f} {min(times):>9.3f}  {created or 'none'}")
+
+    if args.top:
+        for module in args.modules:
+            with tempfile.TemporaryDirectory() as cwd:
+                print(f"\nHeaviest imports under {module}:")
+                for ms, name in heaviest_imports(module, cwd, args.top):
+                    print(f"  {ms:>8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
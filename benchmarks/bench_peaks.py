@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Peak detection benchmark over a synthetic file x method grid:
+adaptive find_peaks retry loop (previous implementation) vs. jelly_peaks candidate filtering
+"""
+
+# bench_peaks.py
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.signal import find_peaks
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jelly_peaks as jelpeaks
+
+
+def detect_loop(frequencies, psd_db, max_peaks=40, height_percentile=0.5, prominence_factor=0.04, min_width=0.5):
+    """Previous implementation: one full find_peaks pass per relaxation level."""
+    min_desired_peaks = min(10, max_peaks)
+    all_peaks_indices, peak_properties = [], {}
+    while len(all_peaks_indices) < min_desired_peaks and height_percentile > 0.2:
+        all_peaks_indices, peak_properties = find_peaks(
+            psd_db, height=np.percentile(psd_db, height_percentile * 100),
+            prominence=prominence_factor * np.std(psd_db), width=max(min_width, 1.0))
+        if len(all_peaks_indices) < min_desired_peaks:
+            height_percentile -= 0.05
+            prominence_factor /= 1.5
+    peak_widths = peak_properties['widths'] * (frequencies[1] - frequencies[0]) if len(all_peaks_indices) else np.zeros(0)
+    peak_indices = np.asarray(all_peaks_indices, dtype=np.intp)
+    if len(peak_indices) > max_peaks:
+        top_indices = np.argsort(psd_db[peak_indices])[::-1][:max_peaks]
+        peak_indices, peak_widths = peak_indices[top_indices], peak_widths[top_indices]
+    return peak_indices, peak_widths
+
+
+def synthetic_psd_db(rng, n_bins, n_harmonics, noise_db):
+    """
+    Falling spectrum with harmonic bumps and noise. Few harmonics and little noise need
+    several relaxation levels, like the wavelet and chirplet PSDs do on real recordings.
+    """
+    bins = np.arange(n_bins)
+    spacing = n_bins / (n_harmonics + 2)
+    bumps = sum(np.exp(-0.5 * ((bins - k * spacing) / (n_bins / 400)) ** 2) * 20 / k
+                for k in range(1, n_harmonics + 1))
+    return -40 - 30 * bins / n_bins + bumps + noise_db * rng.normal(size=n_bins)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive PSD peak detection")
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--methods', type=int, default=8)
+    parser.add_argument('--bins', type=int, nargs='+', default=[513, 2049, 8193])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"Grid of {args.files} files x {args.methods} methods")
+    print(f"{'bins':>6} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>8}  identical")
+
+    for n_bins in args.bins:
+        frequencies = np.linspace(0, 22050, n_bins)
+        spectra = [(frequencies, synthetic_psd_db(rng, n_bins, n_harmonics=2 + i % args.methods,
+                                                  noise_db=0.01 * (i % args.methods)))
+                   for i in range(args.files * args.methods)]
+
+        loop_times, batch_times = [], []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            expected = [detect_loop(f, p) for f, p in spectra]
+            loop_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            actual = jelpeaks.detect_peaks_grid(spectra)
+            batch_times.append(time.perf_counter() - start)
+
+        identical = all(np.array_equal(e[0], a[0]) and np.array_equal(e[1], a[1])
+                        for e, a in zip(expected, actual))
+        loop_time, batch_time = min(loop_times), min(batch_times)
+        print(f"{n_bins:>6} {loop_time:>10.4f} {batch_time:>10.4f} {loop_time / batch_time:>7.1f}x  {identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Spectrogram regridding benchmark for calculate_psd_spectro:
+per-frame interp1d loop (previous implementation) vs. cached sparse interpolation matrix
+"""
+
+# bench_regrid.py
+
+import argparse
+import os
+import sys
+import time
+
+import librosa
+import numpy as np
+from scipy.interpolate import interp1d
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jelly_funcs as jelfun
+
+
+def regrid_loop(power_spectrum_spec, spec_frequencies, frequencies):
+    """Previous implementation: one interp1d per time frame."""
+    interpolated_spectrogram = np.zeros((len(frequencies), power_spectrum_spec.shape[1]))
+    for time_idx in range(power_spectrum_spec.shape[1]):
+        interp_func = interp1d(spec_frequencies, power_spectrum_spec[:, time_idx],
+                               kind='linear', bounds_error=False, fill_value=0)
+        interpolated_spectrogram[:, time_idx] = interp_func(frequencies)
+    return interpolated_spectrogram
+
+
+def best_of(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spectrogram regridding")
+    parser.add_argument('--sr', type=int, default=44100)
+    parser.add_argument('--psd-n-fft', type=int, default=1024)
+    parser.add_argument('--spec-n-fft', type=int, default=512)
+    parser.add_argument('--frames', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    spec_frequencies = librosa.fft_frequencies(sr=args.sr, n_fft=args.spec_n_fft)
+    frequencies = librosa.fft_frequencies(sr=args.sr, n_fft=args.psd_n_fft)
+    rng = np.random.default_rng(0)
+
+    print(f"Regridding {len(spec_frequencies)} -> {len(frequencies)} bins (sr={args.sr})")
+    print(f"{'frames':>8} {'loop (s)':>10} {'sparse (s)':>11} {'speedup':>8} {'max rel err':>12}")
+
+    for n_frames in args.frames:
+        power_spectrum_spec = rng.random((len(spec_frequencies), n_frames), dtype=np.float32)
+
+        loop_time, expected = best_of(
+            lambda: regrid_loop(power_spectrum_spec, spec_frequencies, frequencies), args.repeats)
+
+        jelfun.spectrogram_regrid_matrix.cache_clear()
+        sparse_time, actual = best_of(
+            lambda: jelfun.spectrogram_regrid_matrix(args.sr, args.spec_n_fft, args.psd_n_fft) @ power_spectrum_spec,
+            args.repeats)
+
+        error = np.max(np.abs(actual - expected)) / np.max(np.abs(expected))
+        print(f"{n_frames:>8} {loop_time:>10.4f} {sparse_time:>11.4f} {loop_time / sparse_time:>7.1f}x {error:>12.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for FFT_DUAL spectrograms of a session: resident memory after
+compare_methods_psd_analysis and after the HTML export, with spectrograms held in
+memory (spectrogram_store=False) vs. the memory-mapped SpectrogramStore (default).
+Each mode runs in its own process; reads /proc/self/status, so Linux only.
+"""
+
+# bench_spectrogram_store.py
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+STATUS_FIELDS = ('RssAnon', 'RssFile', 'VmHWM')
+
+
+def memory_status():
+    """Selected /proc/self/status fields in MB."""
+    status = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            if key in STATUS_FIELDS:
+                status[key] = int(value.split()[0]) / 1024
+    return status
+
+
+def run_child(audio_directory, in_memory):
+    import jellyfish_plotly_browser as jelbrow
+
+    report = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _, plots, _, _ = jelbrow.compare_methods_psd_analysis(
+            audio_directory, methods=['FFT_DUAL'], headless=True, n_workers=1,
+            spectrogram_store=False if in_memory else None)
+        gc.collect()
+        report['analysis'] = memory_status()
+        jelbrow.save_jellyfish_plotly(plots, base_filename='bench', output_directory=os.path.join(audio_directory, 'out'),
+                                      dir_name='bench', export_spectrogram_images=False, open_browser=False)
+        gc.collect()
+        report['export'] = memory_status()
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark resident memory of session spectrograms")
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--sr', type=int, default=44100)
+    parser.add_argument('--child', nargs=2, metavar=('DIRECTORY', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1] == 'memory')
+        return
+
+    import soundfile as sf
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        for i in range(args.files):
+            sf.write(os.path.join(workdir, f"noise_{i}.wav"),
+                     rng.normal(scale=0.1, size=int(args.seconds * args.sr)).astype(np.float32), args.sr)
+
+        print(f"{args.files} files x {args.seconds:g} s at {args.sr} Hz, FFT_DUAL")
+        print(f"{'spectrograms':>12} {'stage':>9} " + ' '.join(f"{field + ' (MB)':>13}" for field in STATUS_FIELDS))
+        for mode in ('memory', 'memmap'):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', workdir, mode],
+                                    check=True, capture_output=True, text=True).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            for stage, status in report.items():
+                print(f"{mode:>12} {stage:>9} " + ' '.join(f"{status[field]:>13.0f}" for field in STATUS_FIELDS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Stationary wavelet level energy benchmark:
+pywt.swt with every level at once (previous implementation) vs. jelly_wavelets
+one level at a time vs. StreamingSWTEnergy fed in blocks - time and peak traced memory
+"""
+
+# bench_stationary_wavelet.py
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pywt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jelly_wavelets as jelwave
+
+
+def level_energies_all_at_once(y, wavelet, level):
+    """Previous implementation: 2 * level full-length arrays, then one reduction per level."""
+    coeffs = pywt.swt(y, wavelet, level=level)
+    return np.array([np.sum(np.square(cD), dtype=np.float64) for _, cD in reversed(coeffs)])
+
+
+def level_energies_streaming(y, wavelet, level, block_size):
+    accumulator = jelwave.StreamingSWTEnergy(wavelet, level)
+    for start in range(0, len(y), block_size):
+        accumulator.push(y[start:start + block_size])
+    return accumulator.finish()[0]
+
+
+def best_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def peak_memory(func):
+    """Peak traced allocation of one call, in MB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024**2
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stationary wavelet level energies")
+    parser.add_argument('--sr', type=int, default=44100)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[5, 30, 120])
+    parser.add_argument('--levels', type=int, nargs='+', default=[4, 6, 8])
+    parser.add_argument('--block-size', type=int, default=262144, help="Samples per streamed block")
+    parser.add_argument('--wavelet', default='sym8')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'seconds':>8} {'level':>5} {'swt (s)':>9} {'levels (s)':>11} {'stream (s)':>11}"
+          f" {'swt MB':>8} {'levels MB':>10} {'stream MB':>10}  max rel. diff (levels, stream)")
+    for seconds in args.seconds:
+        n_samples = int(seconds * args.sr)
+        y = rng.normal(size=n_samples).astype(np.float32)
+        for level in args.levels:
+            # pywt.swt needs a multiple of 2**level; the PSD method pads to a power of two
+            y_padded = np.pad(y, (0, -n_samples % 2**level))
+            swt_time, expected = best_time(lambda: level_energies_all_at_once(y_padded, args.wavelet, level),
+                                           args.repeats)
+            levels_time, (actual, _) = best_time(
+                lambda: jelwave.stationary_wavelet_energies(y_padded, args.wavelet, level), args.repeats)
+            stream_time, streamed = best_time(
+                lambda: level_energies_streaming(y, args.wavelet, level, args.block_size), args.repeats)
+
+            swt_mb = peak_memory(lambda: level_energies_all_at_once(y_padded, args.wavelet, level))
+            levels_mb = peak_memory(lambda: jelwave.stationary_wavelet_energies(y_padded, args.wavelet, level))
+            stream_mb = peak_memory(lambda: level_energies_streaming(y, args.wavelet, level, args.block_size))
+
+            # Streaming zero-extends instead of wrapping around, so it differs at the edges
+            levels_diff = np.max(np.abs(actual / expected - 1))
+            stream_diff = np.max(np.abs(streamed / expected - 1))
+            print(f"{seconds:>8g} {level:>5} {swt_time:>9.4f} {levels_time:>11.4f} {stream_time:>11.4f}"
+                  f" {swt_mb:>8.1f} {levels_mb:>10.1f} {stream_mb:>10.1f}  {levels_diff:.1e}, {stream_diff:.1e}")
+
+
+if __name__ == '__main__':
+    main()
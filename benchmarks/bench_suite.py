@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark suite: every PSD method (path-based entry points, decode included),
+find_spectral_veins, prepare_plotly_template_vars and save_jellyfish_plotly, on synthetic
+audio at several durations and sample rates and on test_audio/slice_*.wav.
+Results are written as JSON; --compare flags regressions against a stored baseline
+"""
+
+# bench_suite.py
+#
+#   python benchmarks/bench_suite.py --output baseline.json
+#   python benchmarks/bench_suite.py --compare baseline.json          # run, then compare
+#   python benchmarks/bench_suite.py --current new.json --compare baseline.json
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+from natsort import natsorted
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import jelly_funcs as jelfun
+import jellyfish_plotly_browser as jelbrow
+
+# Analysis defaults, as compare_methods_psd_analysis uses them
+DEFAULT_PARAMS = {'psd_n_fft': 1024, 'psd_hop_length': None, 'spec_n_fft': 512, 'spec_hop_length': None,
+                  'plot_fmax': 6000, 'n_fft': 1024, 'hop_length': None}
+
+# Benchmarked entry point -> (PSD_METHOD_FUNCS name for its parameters, function of an audio path)
+PSD_CASES = {
+    'calculate_psd_spectro': ('FFT_DUAL', jelfun.calculate_psd_spectro),
+    'cqt_based_psd': ('CQT', jelbrow.cqt_based_psd),
+    'multi_resolution_psd': ('Multi-Res', jelbrow.multi_resolution_psd),
+    'chirplet_transform': ('Chirplet', jelbrow.chirplet_transform),
+    'chirplet_transform_zero_padding': ('Chirplet Zero', jelbrow.chirplet_transform_zero_padding),
+    'wavelet_packet_psd': ('Wavelet', jelbrow.wavelet_packet_psd),
+    'improved_wavelet_packet_psd': ('Improved Wavelet', jelbrow.improved_wavelet_packet_psd),
+    'stationary_wavelet_psd': ('Stationary Wavelet', jelbrow.stationary_wavelet_psd),
+}
+
+# Cases that need every method's results for the input first
+EXPORT_CASES = ('find_spectral_veins', 'prepare_plotly_template_vars', 'save_jellyfish_plotly')
+
+
+def synthetic_audio(duration, sr, seed=0):
+    """Harmonic call with vibrato, a slow amplitude envelope and background noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    f0 = 440 + 30 * np.sin(2 * np.pi * 5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k for k in range(1, 10) if k * 470 < sr / 2)
+    y *= 0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t) ** 2
+    y += 0.05 * rng.normal(size=len(t))
+    return (0.3 * y / np.max(np.abs(y))).astype(np.float32)
+
+
+def make_inputs(durations, sample_rates, include_test_audio, workdir):
+    """Benchmark inputs: one directory of wav files each, as {'name', 'directory', 'files', ...}."""
+    inputs = []
+    for sr in sample_rates:
+        for duration in durations:
+            name = f"synthetic_{duration:g}s_{sr}Hz"
+            directory = os.path.join(workdir, name)
+            os.makedirs(directory)
+            sf.write(os.path.join(directory, f"{name}.wav"), synthetic_audio(duration, sr), sr)
+            inputs.append({'name': name, 'directory': directory, 'files': [f"{name}.wav"],
+                           'seconds': duration, 'sr': sr})
+    if include_test_audio:
+        directory = os.path.join(REPO_DIR, 'test_audio')
+        files = natsorted(os.path.basename(path) for path in glob.glob(os.path.join(directory, 'slice_*.wav')))
+        if files:
+            seconds = sum(sf.info(os.path.join(directory, f)).duration for f in files)
+            inputs.append({'name': 'test_audio', 'directory': directory, 'files': files,
+                           'seconds': round(seconds, 3), 'sr': sf.info(os.path.join(directory, files[0])).samplerate})
+    return inputs
+
+
+def time_calls(func, repeats, warmup):
+    """Wall seconds of repeats calls to func (after warmup untimed calls), stdout silenced."""
+    times = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(warmup):
+            func()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def case_id(case, item):
+    return f"{case}[{item['name']}]"
+
+
+def input_cases(item, method_params, workdir, png_export, selected):
+    """
+    (case name, callable) pairs for one input; each call covers all of the input's files.
+    selected(case id) filters the cases; the analysis feeding the export cases only runs if needed.
+    """
+    paths = [os.path.join(item['directory'], f) for f in item['files']]
+    cases = []
+    for case, (method_name, func) in PSD_CASES.items():
+        kwargs = method_params[method_name]
+        cases.append((case, lambda func=func, kwargs=kwargs: [func(path, **kwargs) for path in paths]))
+    if not any(selected(case_id(case, item)) for case in EXPORT_CASES):
+        return [(case, func) for case, func in cases if selected(case_id(case, item))]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        spectrograms = [jelfun.calculate_psd_spectro(path, **method_params['FFT_DUAL']) for path in paths]
+        _, plots, _, _ = jelbrow.compare_methods_psd_analysis(
+            item['directory'], selected_files=item['files'], methods=list(jelbrow.PSD_METHOD_FUNCS),
+            max_cols=len(jelbrow.PSD_METHOD_FUNCS), headless=True,
+            **{k: DEFAULT_PARAMS[k] for k in ('psd_n_fft', 'spec_n_fft', 'plot_fmax')})
+
+    cases.append(('find_spectral_veins', lambda: [
+        jelbrow.find_spectral_veins(spectrogram, frequencies, times, num_veins=6)
+        for frequencies, times, spectrogram, _ in spectrograms]))
+    cases.append(('prepare_plotly_template_vars', lambda: jelbrow.prepare_plotly_template_vars(
+        plots, dir_name=item['name'], psd_n_fft=DEFAULT_PARAMS['psd_n_fft'], spec_n_fft=DEFAULT_PARAMS['spec_n_fft'])))
+    output_directory = os.path.join(workdir, 'html', item['name'])
+    cases.append(('save_jellyfish_plotly', lambda: jelbrow.save_jellyfish_plotly(
+        plots, base_filename='bench', output_directory=output_directory, dir_name=item['name'],
+        export_spectrogram_images=png_export, open_browser=False,
+        psd_n_fft=DEFAULT_PARAMS['psd_n_fft'], spec_n_fft=DEFAULT_PARAMS['spec_n_fft'])))
+    return [(case, func) for case, func in cases if selected(case_id(case, item))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    method_params = jelbrow.build_method_params(DEFAULT_PARAMS)
+
+    def selected(case_id):
+        return not args.filter or any(pattern in case_id for pattern in args.filter)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs = make_inputs(args.durations, args.sample_rates, not args.no_test_audio, workdir)
+        for item in inputs:
+            print(f"\n{item['name']}: {len(item['files'])} file(s), {item['seconds']:g} s at {item['sr']} Hz")
+            for case, func in input_cases(item, method_params, workdir, not args.no_png, selected):
+                times = time_calls(func, args.repeats, args.warmup)
+                results[case_id(case, item)] = {
+                    'case': case, 'input': item['name'], 'files': len(item['files']),
+                    'audio_seconds': item['seconds'], 'sr': item['sr'],
+                    'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times),
+                    'stdev': statistics.stdev(times) if len(times) > 1 else 0.0, 'runs': times,
+                }
+                print(f"  {case:<34} median {statistics.median(times):9.4f} s   min {min(times):9.4f} s")
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'current', 'output')},
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, statistic='median', threshold=0.10, min_delta=0.005):
+    """
+    Print current vs. baseline per case; a case regresses when it is more than threshold
+    slower (relative) and min_delta seconds slower (absolute, to ignore timer noise).
+    Returns the regressed case ids.
+    """
+    regressions = []
+    print(f"\n{'case':<64} {'baseline':>10} {'current':>10} {'change':>8}")
+    for case_id in sorted(set(current['results']) | set(baseline['results'])):
+        if case_id not in baseline['results']:
+            print(f"{case_id:<64} {'-':>10} {current['results'][case_id][statistic]:>10.4f}      new")
+            continue
+        if case_id not in current['results']:
+            print(f"{case_id:<64} {baseline['results'][case_id][statistic]:>10.4f} {'-':>10}  missing")
+            continue
+        before = baseline['results'][case_id][statistic]
+        after = current['results'][case_id][statistic]
+        change = after / before - 1 if before > 0 else 0.0
+        status = ''
+        if change > threshold and after - before > min_delta:
+            status = 'REGRESSION'
+            regressions.append(case_id)
+        elif change < -threshold and before - after > min_delta:
+            status = 'faster'
+        print(f"{case_id:<64} {before:>10.4f} {after:>10.4f} {change:>+7.1%}  {status}")
+
+    print(f"\nBaseline {baseline['meta'].get('git_commit')} ({baseline['meta'].get('created')}) vs. "
+          f"current {current['meta'].get('git_commit')} ({current['meta'].get('created')}), "
+          f"{statistic}, threshold {threshold:.0%}")
+    print(f"{len(regressions)} regression(s)" + (": " + ", ".join(regressions) if regressions else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every PSD method and the HTML export path")
+    parser.add_argument('--durations', type=float, nargs='+', default=[1, 5, 15], help="Synthetic audio seconds")
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[22050, 44100])
+    parser.add_argument('--no-test-audio', action='store_true', help="Skip test_audio/slice_*.wav")
+    parser.add_argument('--no-png', action='store_true', help="save_jellyfish_plotly without spectrogram PNGs")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed calls before each case")
+    parser.add_argument('--filter', nargs='+', help="Only cases whose id contains one of these strings")
+    parser.add_argument('--output', default=f"bench_suite_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument('--current', help="Compare this stored result instead of running the suite")
+    parser.add_argument('--compare', metavar='BASELINE', help="Baseline JSON to flag regressions against")
+    parser.add_argument('--statistic', choices=['median', 'min', 'mean'], default='median')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    parser.add_argument('--min-delta', type=float, default=0.005, help="Ignore slowdowns below this many seconds")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.statistic, args.threshold, args.min_delta)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
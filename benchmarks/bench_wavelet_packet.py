@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Wavelet packet band energy benchmark:
+pywt.WaveletPacket node tree + per-node Python loop (previous implementation) vs.
+jelly_wavelets level arrays, for single signals and batches of equal-length signals
+"""
+
+# bench_wavelet_packet.py
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pywt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jelly_wavelets as jelwave
+
+
+def band_energies_tree(y, wavelet, level):
+    """Previous implementation: full node tree, then one Python-level reduction per node."""
+    wp = pywt.WaveletPacket(data=y, wavelet=wavelet, mode='symmetric', maxlevel=level)
+    return np.array([np.sum(np.abs(node.data)**2) for node in wp.get_level(level, 'natural')])
+
+
+def best_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def peak_memory(func):
+    """Peak traced allocation of one call, in MB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024**2
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wavelet packet band energies")
+    parser.add_argument('--sr', type=int, default=44100)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[0.5, 5, 30])
+    parser.add_argument('--levels', type=int, nargs='+', default=[6, 8])
+    parser.add_argument('--batch', type=int, default=8, help="Signals per batched call")
+    parser.add_argument('--wavelet', default='sym8')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'seconds':>8} {'level':>5} {'tree (s)':>10} {'arrays (s)':>11} {'speedup':>8}"
+          f" {'batch tree (s)':>15} {'batch arrays (s)':>17} {'speedup':>8}"
+          f" {'tree MB':>8} {'arrays MB':>9}  identical")
+    for seconds in args.seconds:
+        signals = rng.normal(size=(args.batch, int(seconds * args.sr))).astype(np.float32)
+        for level in args.levels:
+            tree_time, expected = best_time(lambda: band_energies_tree(signals[0], args.wavelet, level), args.repeats)
+            array_time, (actual, _) = best_time(
+                lambda: jelwave.wavelet_packet_band_energies(signals[0], args.wavelet, level, order='natural'),
+                args.repeats)
+
+            batch_tree_time, batch_expected = best_time(
+                lambda: [band_energies_tree(y, args.wavelet, level) for y in signals], args.repeats)
+            batch_array_time, (batch_actual, _) = best_time(
+                lambda: jelwave.wavelet_packet_band_energies(signals, args.wavelet, level, order='natural'),
+                args.repeats)
+
+            tree_mb = peak_memory(lambda: band_energies_tree(signals[0], args.wavelet, level))
+            array_mb = peak_memory(lambda: jelwave.wavelet_packet_band_energies(signals[0], args.wavelet, level))
+
+            identical = np.array_equal(expected, actual) and np.array_equal(np.array(batch_expected), batch_actual)
+            print(f"{seconds:>8g} {level:>5} {tree_time:>10.4f} {array_time:>11.4f} {tree_time / array_time:>7.1f}x"
+                  f" {batch_tree_time:>15.4f} {batch_array_time:>17.4f} {batch_tree_time / batch_array_time:>7.1f}x"
+                  f" {tree_mb:>8.1f} {array_mb:>9.1f}  {identical}")
+
+
+if __name__ == '__main__':
+    main()
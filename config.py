@@ -24,4 +24,20 @@ class Config:
     
     # Performance settings
     SESSION_TIMEOUT = 3600  # 1 hour
-    MAX_FILES_PER_SESSION = 100
\ No newline at end of file
+    MAX_FILES_PER_SESSION = 100
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 1))  # Worker processes per analysis (1 = serial, 0 = all CPUs)
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', 'result_cache')  # Empty string disables the PSD result cache
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 2 * 1024**3))  # 2GB, LRU-evicted
+    FEATURE_STORE_PATH = os.environ.get('FEATURE_STORE_PATH', 'feature_store.sqlite')  # Peaks/pairs per file and method; empty string disables
+    STREAM_MIN_SECONDS = float(os.environ.get('STREAM_MIN_SECONDS', 300))  # Longer recordings compute FFT_DUAL and Stationary Wavelet block-wise
+    SPECTROGRAM_STORE_DIR = os.environ.get('SPECTROGRAM_STORE_DIR') or None  # Parent of per-analysis memory-mapped spectrogram files (default: system temp dir; avoid tmpfs)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))  # Analyses run concurrently by the job queue
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 8))  # Waiting jobs before /process answers 429
+    JOB_POLL_INTERVAL_MS = 1000  # Upload form status polling interval
+    LIVE_FRAME_RATE = float(os.environ.get('LIVE_FRAME_RATE', 4))  # Live monitor updates pushed per second
+    LIVE_WINDOW_SECONDS = float(os.environ.get('LIVE_WINDOW_SECONDS', 5))  # Rolling window of a live PSD
+    LIVE_MAX_WINDOW_SECONDS = float(os.environ.get('LIVE_MAX_WINDOW_SECONDS', 60))  # Longest window a client may request
+    LIVE_MAX_BUFFER_BYTES = int(os.environ.get('LIVE_MAX_BUFFER_BYTES', 256 * 1024**2))  # Frame buffers of one live session
+    LIVE_MAX_SESSIONS = int(os.environ.get('LIVE_MAX_SESSIONS', 4))
+    LIVE_IDLE_TIMEOUT = 60  # Seconds without chunks before a live session is dropped
+    METRICS_TRACEMALLOC = os.environ.get('METRICS_TRACEMALLOC', '') == '1'  # Per-stage traced allocation peaks (slower)
\ No newline at end of file
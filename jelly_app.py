@@ -35,7 +35,8 @@ print(f"✅ Running on Python {sys.version_info.major}.{sys.version_info.minor}.
 
 # jelly_app.py
 
-from flask import Flask, request, render_template, jsonify, send_file
+from flask import Flask, request, render_template, jsonify, send_file, Response, stream_with_context
+from werkzeug.exceptions import HTTPException
 import os
 import uuid
 import tempfile
@@ -43,14 +44,29 @@ import shutil
 from pathlib import Path
 import time
 
+import numpy as np
+
 from config import Config
 from analysis_service import AnalysisService
+from jelly_jobs import JobQueue, QueueFull
+from jelly_live import LiveSessionRegistry, sse_events
+from jelly_metrics import start_memory_tracing
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+if app.config['METRICS_TRACEMALLOC']:
+    start_memory_tracing()
+
 # Initialize services
 analysis_service = AnalysisService(app.config)
+job_queue = JobQueue(num_workers=app.config['JOB_WORKERS'],
+                     max_pending=app.config['JOB_QUEUE_SIZE'],
+                     job_ttl=app.config['SESSION_TIMEOUT'])
+live_sessions = LiveSessionRegistry(max_sessions=app.config['LIVE_MAX_SESSIONS'],
+                                    idle_timeout=app.config['LIVE_IDLE_TIMEOUT'],
+                                    max_window_seconds=app.config['LIVE_MAX_WINDOW_SECONDS'],
+                                    max_buffer_bytes=app.config['LIVE_MAX_BUFFER_BYTES'])
 
 
 @app.route('/')
@@ -61,9 +77,17 @@ def upload_form():
                          methods=Config.DEFAULT_METHODS)
 
 
+def run_analysis_job(session_dir, files, params, progress):
+    """Job body: run the analysis and raise on failure so the job is marked failed"""
+    result = analysis_service.process_analysis(session_dir, files, params, progress=progress)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return result
+
+
 @app.route('/process', methods=['POST'])
 def process_files():
-    """Streamlined processing with better error handling"""
+    """Validate and save uploads, then queue the analysis; returns a job id to poll"""
     session_id = str(uuid.uuid4())[:8]
     session_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
     
@@ -75,6 +99,7 @@ def process_files():
         valid_files = analysis_service.validate_files(files)
         
         if not valid_files:
+            shutil.rmtree(session_dir, ignore_errors=True)
             return jsonify({'error': 'No valid audio files uploaded'}), 400
         
         # Save files
@@ -108,61 +133,208 @@ def process_files():
             'dir_name': request.form.get('dir_name', '').strip() or 'analysis'
         }
         
-        # Run analysis
-        result = analysis_service.process_analysis(session_dir, saved_files, params)
-        
-        if result['success']:
-            # Load and modify HTML
-            with open(result['html_path'], 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            
-            # Add navigation and timing info - UPDATED with resolution display
-            html_content = add_flask_navigation(html_content, result['processing_time'], params)
-            return html_content
+        # Queue analysis - the request returns right away, the browser polls /jobs/<id>
+        try:
+            job = job_queue.submit(run_analysis_job,
+                                   args=(session_dir, saved_files, params),
+                                   job_id=session_id)
+        except QueueFull as e:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '30'
+            return response, 429
         
-        else:
-            return render_template('error.html', 
-                                 error=result['error'],
-                                 session_id=session_id), 500
+        return jsonify(job_status(job)), 202
     
+    # The upload form reads every /process response as JSON; HTTP errors (413) go to their handlers
+    except HTTPException:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise
+    except ValueError as e:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return jsonify({'error': f'Invalid analysis parameters: {e}'}), 400
     except Exception as e:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def job_status(job):
+    """Status payload shared by /process and /jobs/<id>"""
+    status = job.to_dict()
+    status['queue_position'] = job_queue.queue_position(job)
+    status['status_url'] = f"/jobs/{job.id}"
+    status['result_url'] = f"/jobs/{job.id}/result"
+    status['metrics_url'] = f"/jobs/{job.id}/metrics"
+    return status
+
+
+@app.route('/jobs/<job_id>')
+def job_status_route(job_id):
+    """Poll a queued analysis: status, stage, progress (0-1) and queue position"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job_status(job))
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Finished analysis HTML; 202 while the job is still queued/running"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template('error.html', 
+                             error=f'Unknown or expired job: {job_id}',
+                             session_id=job_id), 404
+    
+    if job.status == 'failed':
         return render_template('error.html', 
-                             error=str(e),
-                             session_id=session_id), 500
-
-def add_flask_navigation(html_content, processing_time, params):
-    """Add Flask-specific UI elements to generated HTML"""
-    # UPDATED - Add resolution info display
-    nav_html = f'''
-    <div style="position: fixed; top: 10px; left: 10px; z-index: 2000; background: rgba(0,123,255,0.9); padding: 15px; border-radius: 5px; color: white; font-family: monospace; font-size: 12px;">
-        <a href="/" style="color: white; text-decoration: none; font-weight: bold;">← New Analysis</a>
-        <div style="border-top: 1px solid rgba(255,255,255,0.3); margin: 8px 0; padding-top: 8px;">
-            <strong>Resolution Settings:</strong><br>
-            PSD N_FFT: {params.get('psd_n_fft', 'N/A')}<br>
-            Spec N_FFT: {params.get('spec_n_fft', 'N/A')}<br>
-            PSD Hop: {params.get('psd_hop_length', 'N/A')}<br>
-            Spec Hop: {params.get('spec_hop_length', 'N/A')}
-        </div>
-        <div style="color: rgba(255,255,255,0.7); font-size: 11px; margin-top: 8px;">
-            Generated in {processing_time:.2f}s
-        </div>
-    </div>
-    '''
+                             error=job.error,
+                             session_id=job_id), 500
     
-    return html_content.replace('<body>', f'<body>{nav_html}')
+    if job.status != 'done':
+        return jsonify(job_status(job)), 202
+    
+    # Navigation overlay is already in the page (templates/analysis_result.html);
+    # stream the file from disk with ETag/Last-Modified and Range support
+    return send_file(os.path.abspath(job.result['html_path']),
+                     mimetype='text/html',
+                     conditional=True,
+                     max_age=0)
+
+
+@app.route('/jobs/<job_id>/metrics')
+def job_metrics(job_id):
+    """Per-stage timings and memory of a finished analysis (also saved as <result>_metrics.json)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if job.status != 'done':
+        return jsonify(job_status(job)), 202
+    return jsonify(job.result['metrics'])
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: per-stage totals over all analyses, plus queue gauges"""
+    text = analysis_service.metrics_registry.prometheus_text()
+    text += ("# HELP jelly_pending_jobs Analyses waiting in the job queue.\n"
+             "# TYPE jelly_pending_jobs gauge\n"
+             f"jelly_pending_jobs {job_queue.pending_count()}\n"
+             "# HELP jelly_live_sessions Open live monitor sessions.\n"
+             "# TYPE jelly_live_sessions gauge\n"
+             f"jelly_live_sessions {len(live_sessions)}\n")
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
 
 
 
+# ==================== LIVE MONITOR ====================
+
+# PCM sample formats accepted by /live/<id>/chunk, as little-endian numpy dtypes and scale to -1..1
+LIVE_SAMPLE_FORMATS = {'float32': ('<f4', 1.0), 'int16': ('<i2', 1 / 32768)}
+
+
+@app.route('/live', methods=['POST'])
+def live_create():
+    """Open a live session; JSON body with sr (required) and optional analysis settings"""
+    options = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        sr = int(options['sr'])
+        session_kwargs = {
+            'sr': sr,
+            'psd_n_fft': int(options.get('psd_n_fft', Config.DEFAULT_N_FFT)),
+            'spec_n_fft': int(options.get('spec_n_fft', Config.DEFAULT_SPEC_N_FFT)),
+            'window_seconds': float(options.get('window_seconds', app.config['LIVE_WINDOW_SECONDS'])),
+            'peak_fmin': float(options.get('peak_fmin', Config.DEFAULT_PEAK_FMIN)),
+            'peak_fmax': float(options.get('peak_fmax', Config.DEFAULT_PEAK_FMAX)),
+            'plot_fmax': float(options.get('plot_fmax', Config.DEFAULT_PEAK_FMAX)),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid live session options: {e}'}), 400
+
+    try:
+        session = live_sessions.create(**session_kwargs)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid live session options: {e}'}), 400
+    except MemoryError:
+        return jsonify({'error': 'Not enough memory for a live session with these options'}), 503
+    except RuntimeError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(app.config['LIVE_IDLE_TIMEOUT'])
+        return response, 429
+
+    return jsonify({
+        'session_id': session.id,
+        'chunk_url': f"/live/{session.id}/chunk",
+        'events_url': f"/live/{session.id}/events",
+        'view_url': f"/live/{session.id}",
+        'frame_rate': app.config['LIVE_FRAME_RATE'],
+    }), 201
+
+
+@app.route('/live/<session_id>/chunk', methods=['POST'])
+def live_chunk(session_id):
+    """Append raw mono PCM (body; ?format=float32|int16, little-endian) to a live session"""
+    live_sessions.prune()
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': f'Unknown live session: {session_id}'}), 404
+
+    sample_format = request.args.get('format', 'float32')
+    if sample_format not in LIVE_SAMPLE_FORMATS:
+        return jsonify({'error': f'Unsupported format: {sample_format}'}), 400
+    dtype, scale = LIVE_SAMPLE_FORMATS[sample_format]
+    body = request.get_data(cache=False)
+    if len(body) % np.dtype(dtype).itemsize:
+        return jsonify({'error': 'Chunk length is not a whole number of samples'}), 400
+
+    samples = np.frombuffer(body, dtype=dtype)
+    session.push(samples * scale if scale != 1.0 else samples)
+    return jsonify({'samples': int(len(samples)), 'stream_seconds': session.samples_received / session.sr})
+
+
+@app.route('/live/<session_id>/events')
+def live_events(session_id):
+    """Server-sent events: the session's latest PSD, peaks, ridge and veins at LIVE_FRAME_RATE"""
+    live_sessions.prune()
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': f'Unknown live session: {session_id}'}), 404
+    events = sse_events(session, app.config['LIVE_FRAME_RATE'], idle_timeout=app.config['LIVE_IDLE_TIMEOUT'])
+    response = Response(stream_with_context(events),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/live/<session_id>', methods=['GET', 'DELETE'])
+def live_view(session_id):
+    """GET: live monitor page; DELETE: close the session"""
+    if request.method == 'DELETE':
+        if live_sessions.close(session_id) is None:
+            return jsonify({'error': f'Unknown live session: {session_id}'}), 404
+        return jsonify({'session_id': session_id, 'closed': True})
+
+    if live_sessions.get(session_id) is None:
+        return render_template('error.html', 
+                             error=f'Unknown or expired live session: {session_id}',
+                             session_id=session_id), 404
+    return render_template('live.html', session_id=session_id,
+                           events_url=f"/live/{session_id}/events")
 
 
 # Error handlers and cleanup routes...
 @app.errorhandler(413)
 def too_large(e):
-    return "File too large", 413
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'Upload too large (limit {limit_mb} MB)'}), 413
 
 @app.route('/health')
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': time.time()})
+    return jsonify({'status': 'healthy', 'timestamp': time.time(),
+                    'pending_jobs': job_queue.pending_count(),
+                    'live_sessions': len(live_sessions)})
 
 if __name__ == '__main__':
     # Setup
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# jelly_batch.py
+
+# Batch analysis of a whole slices tree (e.g. tranche/slices) from the command line:
+# every numbered slice directory is analyzed with the chosen methods on a worker
+# pool and its peaks are recorded in the feature store. Files already recorded
+# with the same methods and parameters are skipped, so an interrupted run resumes
+# where it stopped. Ends with a throughput summary (files/s, time per stage).
+#
+#   python jelly_batch.py tranche/slices --methods FFT_DUAL CQT --workers 4
+
+import argparse
+import os
+import sys
+import time
+
+from natsort import natsorted
+
+import jelly_funcs as jelfun
+import jellyfish_plotly_browser as jelbrow
+from jelly_cache import ResultCache, file_content_hash
+from jelly_metrics import StageMetrics, measure
+from jelly_store import FeatureStore
+from config import Config
+
+
+def find_slice_dirs(root):
+    """Numbered slice directories under root (get_subdir_pathlist), or root itself if it has none."""
+    slice_dirs = jelfun.get_subdir_pathlist(root)
+    return natsorted(slice_dirs) if slice_dirs else [str(root)]
+
+
+def pending_files(store, slice_dir, filenames, methods, params, force=False):
+    """(filename, content hash) of the files not yet recorded for every method with these params."""
+    pending = []
+    for filename in filenames:
+        file_hash = file_content_hash(os.path.join(slice_dir, filename))
+        if force or not all(store.has_analysis(file_hash, method, params) for method in methods):
+            pending.append((filename, file_hash))
+    return pending
+
+
+def analyze_directory(slice_dir, pending, methods, params, store, args, cache, metrics):
+    """Analyze the pending files of one directory and record them; returns the plots recorded."""
+    _, plots, _, _ = jelbrow.compare_methods_psd_analysis(
+        audio_directory=slice_dir,
+        selected_files=[filename for filename, _ in pending],
+        methods=methods,
+        headless=True,
+        n_workers=args.workers,
+        cache=cache,
+        stream_min_seconds=args.stream_min_seconds,
+        metrics=metrics,
+        **params
+    )
+    file_hashes = {os.path.join(slice_dir, filename): file_hash for filename, file_hash in pending}
+    with measure(metrics, 'feature_store'):
+        return store.record_plots(plots, params=params, file_hashes=file_hashes)
+
+
+def print_summary(n_dirs, n_files, n_skipped, n_recorded, elapsed, metrics):
+    print("\n==================== BATCH SUMMARY ====================")
+    print(f"Directories: {n_dirs}")
+    print(f"Files analyzed: {n_files} ({n_skipped} already recorded, skipped)")
+    print(f"Analyses recorded: {n_recorded}")
+    print(f"Wall time: {elapsed:.1f} s, {n_files / elapsed if elapsed > 0 else 0:.2f} files/s")
+    if metrics.stages:
+        print(metrics.summary())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every slice directory under a tree into the feature store")
+    parser.add_argument('root', nargs='?', default='tranche/slices', help="Tree of slice directories")
+    parser.add_argument('--methods', nargs='+', default=Config.ALL_METHODS,
+                        choices=list(jelbrow.PSD_METHOD_FUNCS))
+    parser.add_argument('--store', default=Config.FEATURE_STORE_PATH or 'feature_store.sqlite',
+                        help="Feature store (SQLite) to record results in")
+    parser.add_argument('--cache-dir', default=Config.RESULT_CACHE_DIR,
+                        help="PSD result cache directory (empty string disables)")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (0 = all CPUs)")
+    parser.add_argument('--extensions', nargs='+', default=['.wav'])
+    parser.add_argument('--psd-n-fft', type=int, default=Config.DEFAULT_N_FFT)
+    parser.add_argument('--spec-n-fft', type=int, default=Config.DEFAULT_SPEC_N_FFT)
+    parser.add_argument('--peak-fmin', type=float, default=Config.DEFAULT_PEAK_FMIN)
+    parser.add_argument('--peak-fmax', type=float, default=Config.DEFAULT_PEAK_FMAX)
+    parser.add_argument('--height-percentile', type=float, default=0.6)
+    parser.add_argument('--prominence-factor', type=float, default=0.05)
+    parser.add_argument('--min-width', type=float, default=0.6)
+    parser.add_argument('--stream-min-seconds', type=float, default=Config.STREAM_MIN_SECONDS)
+    parser.add_argument('--force', action='store_true', help="Re-analyze files that are already recorded")
+    args = parser.parse_args(argv)
+
+    # Compute parameters; these are stored with every analysis and checked when resuming
+    params = {
+        'psd_n_fft': args.psd_n_fft,
+        'spec_n_fft': args.spec_n_fft,
+        'peak_fmin': args.peak_fmin,
+        'peak_fmax': args.peak_fmax,
+        'height_percentile': args.height_percentile,
+        'prominence_factor': args.prominence_factor,
+        'min_width': args.min_width,
+    }
+
+    store = FeatureStore(args.store)
+    cache = ResultCache(args.cache_dir, Config.RESULT_CACHE_MAX_BYTES) if args.cache_dir else None
+    slice_dirs = find_slice_dirs(args.root)
+    print(f"Batch: {len(slice_dirs)} directories under {args.root}, methods: {', '.join(args.methods)}")
+
+    metrics = StageMetrics()
+    n_files = n_skipped = n_recorded = 0
+    start = time.perf_counter()
+    for dir_idx, slice_dir in enumerate(slice_dirs, 1):
+        filenames = jelbrow.select_audio_files(slice_dir, extensions=tuple(args.extensions), verbose=False)
+        pending = pending_files(store, slice_dir, filenames, args.methods, params, args.force)
+        n_skipped += len(filenames) - len(pending)
+        print(f"[{dir_idx}/{len(slice_dirs)}] {slice_dir}: {len(pending)} of {len(filenames)} files to analyze")
+        if not pending:
+            continue
+
+        dir_start = time.perf_counter()
+        try:
+            n_recorded += analyze_directory(slice_dir, pending, args.methods, params, store, args,
+                                            cache, metrics)
+        except Exception as e:
+            # Keep going; the directory is retried on the next run
+            print(f"Error analyzing {slice_dir}: {e}")
+            continue
+        n_files += len(pending)
+        print(f"[{dir_idx}/{len(slice_dirs)}] {len(pending)} files in {time.perf_counter() - dir_start:.1f} s")
+
+    print_summary(len(slice_dirs), n_files, n_skipped, n_recorded, time.perf_counter() - start, metrics)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
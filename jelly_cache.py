@@ -0,0 +1,145 @@
+# jelly_cache.py
+
+# Content-addressed, on-disk cache for PSD/spectrogram method outputs.
+# Keys combine the audio file's content hash, the method name and its compute
+# parameters, so display-only settings (plot range, dB toggle) never miss.
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Bump when a method's numerical output changes so stale entries stop matching.
+#   2: Wavelet and Improved Wavelet band energies in frequency (Gray-code) order
+#      instead of pywt's natural node order
+#   3: Stationary Wavelet approximation band back on the level-1 approximation
+#      (version 2 entries hold the deepest approximation's power there)
+CACHE_VERSION = 3
+
+# Parameters that do not change a method's output
+IGNORED_PARAMS = {'verbose'}
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Stores method results (tuples of numpy arrays) as .npz files under cache_dir,
+    evicting least-recently-used entries once the total size passes max_bytes.
+    Only holds a path and a size limit, so it can be handed to worker processes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._approx_bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, file_hash, method_name, params):
+        """Cache key for one method run on one file's content."""
+        key_params = {k: v for k, v in sorted(params.items()) if k not in IGNORED_PARAMS}
+        key_source = json.dumps([CACHE_VERSION, file_hash, method_name, key_params],
+                                sort_keys=True, default=str)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npz")
+
+    def __contains__(self, key):
+        """Whether key has an entry, without loading it."""
+        return os.path.exists(self._entry_path(key))
+
+    def get(self, key):
+        """Cached result tuple for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = tuple(data[f"arr_{i}"] for i in range(len(data.files)))
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        # Touch so eviction treats this entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result tuple; written atomically so concurrent workers never see partial files."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, *[np.asarray(item) for item in result])
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self._approx_bytes is None:
+            self._approx_bytes = self.size_bytes()
+        else:
+            self._approx_bytes += os.path.getsize(path)
+        if self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.npz'):
+                    full_path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(full_path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, full_path))
+        return entries
+
+    def size_bytes(self):
+        """Total size of all cached entries on disk."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, full_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full_path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._approx_bytes = total
+        if removed:
+            print(f"Result cache: evicted {removed} entries, {total / 1024**2:.1f} MB remaining")
+
+    def clear(self):
+        """Remove every cached entry."""
+        for _, _, full_path in self._entries():
+            try:
+                os.remove(full_path)
+            except OSError:
+                pass
+        self._approx_bytes = 0
@@ -0,0 +1,142 @@
+# jelly_cqt.py
+
+# Constant-Q engine for the CQT PSD method. librosa.cqt rebuilds its per-octave
+# filter bases on every call, which for short slices is nearly all of its cost.
+# A CQTPlan builds them once per (sr, fmin, n_bins, bins_per_octave, hop_length,
+# dtype) and is cached for the life of the process; transform() then runs the
+# same multirate steps as librosa.cqt (early downsampling, one STFT and sparse
+# product per octave, halving the rate between octaves, trimming and length
+# scaling), so results match librosa.cqt for any signal length.
+
+import functools
+
+import numpy as np
+
+
+def _relative_bandwidth(freqs):
+    """Relative bandwidth of each frequency, as librosa.filters._relative_bandwidth computes it."""
+    bpo = np.empty_like(freqs)
+    logf = np.log2(freqs)
+    bpo[0] = 1 / (logf[1] - logf[0])
+    bpo[-1] = 1 / (logf[-1] - logf[-2])
+    bpo[1:-1] = 2 / (logf[2:] - logf[:-2])
+    return (2.0 ** (2 / bpo) - 1) / (2.0 ** (2 / bpo) + 1)
+
+
+def _num_two_factors(x):
+    """How many times x divides evenly by 2 (0 for x <= 0)."""
+    count = 0
+    while x > 0 and x % 2 == 0:
+        count += 1
+        x //= 2
+    return count
+
+
+class CQTPlan:
+    """
+    Filter bases and rate schedule of librosa.cqt(y, sr=sr, fmin=fmin, n_bins=n_bins,
+    bins_per_octave=bins_per_octave, hop_length=hop_length) with its defaults
+    (tuning=0, filter_scale=1, norm=1, sparsity=0.01, hann window, scale=True,
+    constant padding, soxr_hq resampling), for input signals of dtype `dtype`.
+    """
+
+    res_type = 'soxr_hq'
+
+    def __init__(self, sr, fmin, n_bins, bins_per_octave, hop_length, dtype=np.float32):
+        import librosa
+        import scipy.fft
+
+        self.dtype = librosa.util.dtype_r2c(np.dtype(dtype))
+        self.frequencies = librosa.interval_frequencies(n_bins=n_bins, fmin=fmin, intervals='equal',
+                                                        bins_per_octave=bins_per_octave, sort=True)
+        self.n_bins = n_bins
+        alpha = _relative_bandwidth(self.frequencies)
+        _, filter_cutoff = librosa.filters.wavelet_lengths(freqs=self.frequencies, sr=sr, alpha=alpha)
+        nyquist = sr / 2.0
+        if filter_cutoff > nyquist:
+            raise librosa.ParameterError(
+                f"Wavelet basis with max frequency={np.max(self.frequencies[-bins_per_octave:])} would exceed "
+                f"the Nyquist frequency={nyquist}. Try reducing the number of frequency bins.")
+
+        n_octaves = int(np.ceil(float(n_bins) / bins_per_octave))
+        n_filters = min(bins_per_octave, n_bins)
+
+        # Early downsampling, before the first octave
+        downsample_count = min(max(0, int(np.ceil(np.log2(nyquist / filter_cutoff)) - 1) - 1),
+                               max(0, _num_two_factors(hop_length) - n_octaves + 1))
+        self.downsample_factor = 2 ** downsample_count if downsample_count > 0 else 1
+        self.n_octaves = n_octaves
+        sr = sr / float(self.downsample_factor) if downsample_count > 0 else sr
+        hop_length //= self.downsample_factor
+
+        # (fft_basis, n_fft, hop_length, halve the rate afterwards) for each octave, highest first
+        self.octaves = []
+        my_sr, my_hop = sr, hop_length
+        for i in range(n_octaves):
+            sl = slice(-n_filters, None) if i == 0 else slice(-n_filters * (i + 1), -n_filters * i)
+            basis, lengths = librosa.filters.wavelet(freqs=self.frequencies[sl], sr=my_sr, filter_scale=1,
+                                                     norm=1, pad_fft=True, window='hann', gamma=0,
+                                                     alpha=alpha[sl])
+            n_fft = basis.shape[1]
+            basis *= lengths[:, np.newaxis] / float(n_fft)
+            fft_basis = scipy.fft.fft(basis, n=n_fft, axis=1)[:, :(n_fft // 2) + 1]
+            fft_basis = librosa.util.sparsify_rows(fft_basis, quantile=0.01, dtype=self.dtype)
+            # Compensate for downsampling, exactly as librosa.vqt does
+            fft_basis[:] *= np.sqrt(sr / my_sr)
+
+            halve = False
+            if i < n_octaves - 1:
+                f_max_next = self.frequencies[sl.start - 1]
+                if my_hop % 2 == 0 and f_max_next <= my_sr / 5:
+                    halve = True
+            self.octaves.append((fft_basis, n_fft, my_hop, halve))
+            if halve:
+                my_hop //= 2
+                my_sr /= 2.0
+
+        # Length scaling at the early-downsampled rate
+        lengths, _ = librosa.filters.wavelet_lengths(freqs=self.frequencies, sr=sr, alpha=alpha)
+        self.scale = np.sqrt(lengths)[:, np.newaxis]
+
+    def transform(self, y):
+        """Complex CQT of one signal, shape (n_bins, n_frames), equal to librosa.cqt's."""
+        import librosa
+
+        if self.downsample_factor > 1:
+            if y.shape[-1] < self.downsample_factor:
+                raise librosa.ParameterError(f"Input signal length={len(y):d} is too short for "
+                                             f"{self.n_octaves:d}-octave CQT")
+            y = librosa.resample(y, orig_sr=self.downsample_factor, target_sr=1, res_type=self.res_type,
+                                 scale=True)
+
+        responses = []
+        for fft_basis, n_fft, hop_length, halve in self.octaves:
+            D = librosa.stft(y, n_fft=n_fft, hop_length=hop_length, window='ones', pad_mode='constant',
+                             dtype=self.dtype)
+            responses.append(fft_basis.dot(D))
+            if halve:
+                y = librosa.resample(y, orig_sr=2, target_sr=1, res_type=self.res_type, scale=True)
+
+        # Trim every octave to the shortest and stack them, lowest bins first
+        n_frames = min(response.shape[-1] for response in responses)
+        C = np.empty((self.n_bins, n_frames), dtype=self.dtype, order='F')
+        end = self.n_bins
+        for response in responses:
+            n_oct = response.shape[-2]
+            if end < n_oct:
+                C[:end, :] = response[-end:, :n_frames]
+            else:
+                C[end - n_oct:end, :] = response[:, :n_frames]
+            end -= n_oct
+        C /= self.scale
+        return C
+
+    def mean_power(self, signals):
+        """Mean CQT power over frames of each signal, shape (len(signals), n_bins)."""
+        return np.array([np.mean(np.abs(self.transform(y)) ** 2, axis=1) for y in signals])
+
+
+@functools.lru_cache(maxsize=32)
+def cqt_plan(sr, fmin, n_bins, bins_per_octave, hop_length, dtype=np.float32):
+    """Shared CQTPlan for these parameters, built on first use."""
+    return CQTPlan(sr, fmin, n_bins, bins_per_octave, hop_length, dtype)
@@ -1,6 +1,7 @@
 # jelly_funcs.py (constructed from all_functions_psd_rebuilt.py)
 
 from datetime import datetime
+from functools import lru_cache
 import os
 from pathlib import Path
 import re
@@ -44,21 +45,9 @@ def get_timestamp():
 
 
 
-# Dual-Resolution PSD and Spectrogram Calculation, 
-# Interpolates spectrogram to smooth and restore info and, most importantly, match x-axis scaling
-def calculate_psd_spectro(audio_path, 
-                            # PSD Parameters (frequency-optimized)
-                            psd_n_fft=2048,
-                            psd_hop_length=None,
-                            
-                            # Spectrogram Parameters (time-optimized)  
-                            spec_n_fft=1024,
-                            spec_hop_length=None,
-                            
-                            # Control Flags
-                            use_dual_resolution=True,
-                            verbose=False):
-    """Calculate both PSD and spectrogram with dual resolution - PSD optimized for frequency, spectrogram for time."""
+# Decode-once audio source, shared by every PSD method for a given file
+def load_audio(audio_path):
+    """Decode an audio file once into a read-only float32 buffer plus its native sample rate."""
     
     # Convert to Path object for robust handling
     audio_path = Path(audio_path)
@@ -87,6 +76,128 @@ def calculate_psd_spectro(audio_path,
     if len(y) == 0:
         raise ValueError(f"Audio file is empty: {audio_path_str}")
 
+    # Shared between methods, so lock it against in-place edits
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    y.setflags(write=False)
+    return y, sr
+
+
+# Per-file memo of power spectrograms, shared by the STFT-based methods for one decoded file
+class STFTPlan:
+    """
+    Power spectrograms |STFT|**2 of one signal, memoized by (n_fft, hop_length, window).
+    Methods run on the same decoded file (e.g. FFT_DUAL and Multi-Res at 1024/256)
+    share a transform instead of computing it twice. Create one per file and drop it
+    with the file; hits/misses count how often a transform was reused.
+    """
+
+    def __init__(self, y):
+        self.y = y
+        self.hits = 0
+        self.misses = 0
+        self._power = {}
+
+    def power(self, n_fft, hop_length, window='hann'):
+        """Read-only power spectrogram, as np.abs(librosa.stft(y, ...))**2."""
+        key = (int(n_fft), int(hop_length), window)
+        power = self._power.get(key)
+        if power is not None:
+            self.hits += 1
+            return power
+
+        self.misses += 1
+        power = np.abs(librosa.stft(self.y, n_fft=n_fft, hop_length=hop_length, window=window))**2
+        # Shared between methods, so lock it against in-place edits
+        power.setflags(write=False)
+        self._power[key] = power
+        return power
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'transforms': len(self._power),
+            'bytes': sum(power.nbytes for power in self._power.values()),
+        }
+
+
+def power_spectrogram(y, n_fft, hop_length, stft_plan=None):
+    """np.abs(librosa.stft(y, n_fft, hop_length))**2, through stft_plan when it was made for y."""
+    if stft_plan is not None and stft_plan.y is y:
+        return stft_plan.power(n_fft, hop_length)
+    return np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length))**2
+
+
+def interpolation_matrix(x_old, x_new):
+    """
+    Sparse (len(x_new), len(x_old)) matrix M such that M @ y matches
+    interp1d(x_old, y, kind='linear', bounds_error=False, fill_value=0)(x_new)
+    for every column of y. x_old must be sorted ascending.
+    """
+    from scipy import sparse
+
+    x_old = np.asarray(x_old, dtype=np.float64)
+    x_new = np.asarray(x_new, dtype=np.float64)
+
+    # Rows outside the source range stay empty, i.e. fill_value=0
+    rows = np.nonzero((x_new >= x_old[0]) & (x_new <= x_old[-1]))[0]
+    hi = np.clip(np.searchsorted(x_old, x_new[rows]), 1, len(x_old) - 1)
+    lo = hi - 1
+    weight_hi = (x_new[rows] - x_old[lo]) / (x_old[hi] - x_old[lo])
+
+    return sparse.csr_matrix(
+        (np.concatenate([1 - weight_hi, weight_hi]),
+         (np.concatenate([rows, rows]), np.concatenate([lo, hi]))),
+        shape=(len(x_new), len(x_old))
+    )
+
+
+@lru_cache(maxsize=32)
+def spectrogram_regrid_matrix(sr, spec_n_fft, psd_n_fft):
+    """Cached interpolation matrix from the spec_n_fft frequency grid onto the psd_n_fft grid."""
+    spec_frequencies = librosa.fft_frequencies(sr=sr, n_fft=spec_n_fft)
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=psd_n_fft)
+    return interpolation_matrix(spec_frequencies, frequencies)
+
+
+# Dual-Resolution PSD and Spectrogram Calculation, 
+# Interpolates spectrogram to smooth and restore info and, most importantly, match x-axis scaling
+def calculate_psd_spectro(audio_path, 
+                            # PSD Parameters (frequency-optimized)
+                            psd_n_fft=2048,
+                            psd_hop_length=None,
+                            
+                            # Spectrogram Parameters (time-optimized)  
+                            spec_n_fft=1024,
+                            spec_hop_length=None,
+                            
+                            # Control Flags
+                            use_dual_resolution=True,
+                            verbose=False):
+    """Calculate both PSD and spectrogram with dual resolution - PSD optimized for frequency, spectrogram for time."""
+    y, sr = load_audio(audio_path)
+    return calculate_psd_spectro_from_array(y, sr,
+                                            psd_n_fft=psd_n_fft,
+                                            psd_hop_length=psd_hop_length,
+                                            spec_n_fft=spec_n_fft,
+                                            spec_hop_length=spec_hop_length,
+                                            use_dual_resolution=use_dual_resolution,
+                                            verbose=verbose)
+
+
+def calculate_psd_spectro_from_array(y, sr,
+                                     psd_n_fft=2048,
+                                     psd_hop_length=None,
+                                     spec_n_fft=1024,
+                                     spec_hop_length=None,
+                                     use_dual_resolution=True,
+                                     verbose=False,
+                                     stft_plan=None):
+    """
+    Array-based entry point for calculate_psd_spectro, for audio already decoded by load_audio.
+    stft_plan: optional STFTPlan for y, shared with the file's other methods.
+    """
+
     # Set hop lengths - be careful about x-axis scaling mismatches!!!
     if psd_hop_length is None:
         psd_hop_length = psd_n_fft // 16
@@ -103,37 +214,23 @@ def calculate_psd_spectro(audio_path,
     # DUAL RESOLUTION LOGIC WITH INTERPOLATION
     if use_dual_resolution:
         # HIGH FREQUENCY RESOLUTION PSD 
-        stft_psd = librosa.stft(y, n_fft=psd_n_fft, hop_length=psd_hop_length)
-        power_spectrum_psd = np.abs(stft_psd)**2
+        power_spectrum_psd = power_spectrogram(y, psd_n_fft, psd_hop_length, stft_plan)
         psd_mean = np.mean(power_spectrum_psd, axis=1)
         frequencies = librosa.fft_frequencies(sr=sr, n_fft=psd_n_fft)  # Master frequency grid
         
         # HIGH TIME RESOLUTION SPECTROGRAM
-        stft_spec = librosa.stft(y, n_fft=spec_n_fft, hop_length=spec_hop_length)
-        power_spectrum_spec = np.abs(stft_spec)**2
+        power_spectrum_spec = power_spectrogram(y, spec_n_fft, spec_hop_length, stft_plan)
         times = librosa.frames_to_time(np.arange(power_spectrum_spec.shape[1]), 
                                        sr=sr, hop_length=spec_hop_length)
         spec_frequencies = librosa.fft_frequencies(sr=sr, n_fft=spec_n_fft)
         
         # INTERPOLATE SPECTROGRAM TO MATCH PSD FREQUENCY GRID
-        from scipy.interpolate import interp1d
-        interpolated_spectrogram = np.zeros((len(frequencies), power_spectrum_spec.shape[1]))
-        
         if verbose:
             print(f"Interpolating spectrogram from {len(spec_frequencies)} to {len(frequencies)} freq bins")
         
-        # Interpolate each time slice of the spectrogram
-        for time_idx in range(power_spectrum_spec.shape[1]):
-            # Create interpolation function for this time slice
-            interp_func = interp1d(
-                spec_frequencies, 
-                power_spectrum_spec[:, time_idx], 
-                kind='linear',           # Linear interpolation
-                bounds_error=False,     # Don't error if outside bounds
-                fill_value=0           # Use 0 for frequencies outside range
-            )
-            # Apply interpolation to get values at PSD frequency grid
-            interpolated_spectrogram[:, time_idx] = interp_func(frequencies)
+        # All time slices at once: one sparse product instead of an interp1d per frame
+        regrid_matrix = spectrogram_regrid_matrix(sr, spec_n_fft, psd_n_fft)
+        interpolated_spectrogram = regrid_matrix @ power_spectrum_spec
         
         power_spectrum = interpolated_spectrogram
         
@@ -147,8 +244,7 @@ def calculate_psd_spectro(audio_path,
     else:
         # SINGLE RESOLUTION (original behavior)
         hop_length = psd_n_fft // 16
-        stft_result = librosa.stft(y, n_fft=psd_n_fft, hop_length=hop_length)
-        power_spectrum = np.abs(stft_result)**2
+        power_spectrum = power_spectrogram(y, psd_n_fft, hop_length, stft_plan)
         
         # Get time axis
         times = librosa.frames_to_time(np.arange(power_spectrum.shape[1]), 
@@ -162,6 +258,269 @@ def calculate_psd_spectro(audio_path,
     return frequencies, times, power_spectrum, psd_mean
 
 
+# ==================== BATCHED PSD ====================
+
+def batched_power_spectrogram(signals, n_fft, hop_length, window='hann'):
+    """
+    Power spectrograms of several signals in one transform, as np.abs(librosa.stft(y, ...))**2
+    for each. The signals are zero-padded into one 2-D array; a length mask keeps only each
+    signal's own frames, which go through a single windowed rfft.
+    Returns (power, offsets): power is (n_fft // 2 + 1, total frames), and signal i's
+    spectrogram is power[:, offsets[i]:offsets[i + 1]].
+    """
+    from scipy.signal import get_window
+
+    lengths = np.array([len(y) for y in signals])
+    pad = n_fft // 2
+    n_frames = 1 + (lengths + 2 * pad - n_fft) // hop_length
+
+    # center=True, pad_mode='constant': every signal sits between pad zeros
+    padded = np.zeros((len(signals), lengths.max() + 2 * pad), dtype=np.float32)
+    for row, y in zip(padded, signals):
+        row[pad:pad + len(y)] = y
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=1)[:, ::hop_length]
+    mask = np.arange(frames.shape[1]) < n_frames[:, np.newaxis]
+
+    # Same precision path as librosa: float64 FFT stored as complex64, power in float32
+    spectrum = np.fft.rfft(frames[mask] * get_window(window, n_fft, fftbins=True), axis=1).astype(np.complex64)
+    # Frames x bins in memory, so each slice is laid out like librosa's Fortran-ordered STFT
+    # and reductions over it (np.mean(..., axis=1)) add up in the same order
+    power = (np.abs(spectrum) ** 2).T
+    return power, np.concatenate([[0], np.cumsum(n_frames)])
+
+
+def calculate_psd_spectro_from_arrays(audios,
+                                      psd_n_fft=2048,
+                                      psd_hop_length=None,
+                                      spec_n_fft=1024,
+                                      spec_hop_length=None,
+                                      use_dual_resolution=True,
+                                      verbose=False,
+                                      max_batch_frames=8192):
+    """
+    calculate_psd_spectro_from_array for many short (y, sr) signals, one result per signal.
+    Signals sharing a sample rate are transformed together (batched_power_spectrogram) and
+    regridded in one sparse product, so per-call overhead is paid per group rather than
+    per file; every result is identical to the single-file path. Groups are split so a
+    transform covers at most max_batch_frames padded PSD frames, and longer signals take
+    the single-file path.
+    """
+    if psd_hop_length is None:
+        psd_hop_length = psd_n_fft // 16
+    if spec_hop_length is None:
+        spec_hop_length = spec_n_fft // 16
+    if not use_dual_resolution:
+        # Single resolution (original behavior): one STFT feeds both outputs
+        psd_hop_length = spec_hop_length = psd_n_fft // 16
+        spec_n_fft = psd_n_fft
+
+    def psd_frames(i):
+        return 1 + len(audios[i][0]) // psd_hop_length
+
+    results = [None] * len(audios)
+    groups = {}
+    for i, (y, sr) in enumerate(audios):
+        if psd_frames(i) > max_batch_frames:
+            results[i] = calculate_psd_spectro_from_array(y, sr, psd_n_fft=psd_n_fft, psd_hop_length=psd_hop_length,
+                                                          spec_n_fft=spec_n_fft, spec_hop_length=spec_hop_length,
+                                                          use_dual_resolution=use_dual_resolution, verbose=verbose)
+        else:
+            groups.setdefault(sr, []).append(i)
+
+    def run_chunk(sr, indices):
+        signals = [audios[i][0] for i in indices]
+        if verbose:
+            print(f"PSD: {psd_n_fft}-point FFT, {psd_hop_length} hop; spectrogram: {spec_n_fft}-point FFT, "
+                  f"{spec_hop_length} hop - batch of {len(signals)} signals at {sr} Hz")
+        frequencies = librosa.fft_frequencies(sr=sr, n_fft=psd_n_fft)
+        psd_power, psd_offsets = batched_power_spectrogram(signals, psd_n_fft, psd_hop_length)
+        if use_dual_resolution:
+            spec_power, spec_offsets = batched_power_spectrogram(signals, spec_n_fft, spec_hop_length)
+            spectrogram = spectrogram_regrid_matrix(sr, spec_n_fft, psd_n_fft) @ spec_power
+        else:
+            spectrogram, spec_offsets = psd_power, psd_offsets
+        frame_times = librosa.frames_to_time(np.arange(np.diff(spec_offsets).max()), sr=sr, hop_length=spec_hop_length)
+
+        for k, i in enumerate(indices):
+            psd_mean = np.mean(psd_power[:, psd_offsets[k]:psd_offsets[k + 1]], axis=1)
+            power_spectrum = np.copy(spectrogram[:, spec_offsets[k]:spec_offsets[k + 1]])
+            results[i] = (frequencies.copy(), frame_times[:power_spectrum.shape[1]].copy(), power_spectrum, psd_mean)
+
+    for sr, indices in groups.items():
+        # Shortest first, so each chunk pads to a length close to its members'
+        indices.sort(key=lambda i: len(audios[i][0]))
+        chunk = []
+        for i in indices:
+            if chunk and (len(chunk) + 1) * psd_frames(i) > max_batch_frames:
+                run_chunk(sr, chunk)
+                chunk = []
+            chunk.append(i)
+        run_chunk(sr, chunk)
+
+    return results
+
+
+# ==================== STREAMING PSD ====================
+
+class StreamingSTFT:
+    """
+    Incremental power STFT matching librosa.stft(center=True, pad_mode='constant').
+    push() accepts consecutive sample blocks and returns |STFT|^2 for every frame
+    that is complete so far; finish() flushes the trailing zero-padded frames.
+    """
+
+    def __init__(self, n_fft, hop_length, window='hann'):
+        from scipy.signal import get_window
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = get_window(window, n_fft, fftbins=True)
+        # center=True: the signal is preceded by n_fft // 2 zeros
+        self._buffer = np.zeros(n_fft // 2, dtype=np.float32)
+
+    def push(self, samples):
+        buffer = np.concatenate([self._buffer, samples])
+        n_frames = 0 if len(buffer) < self.n_fft else 1 + (len(buffer) - self.n_fft) // self.hop_length
+        if n_frames == 0:
+            self._buffer = buffer
+            return np.zeros((self.n_fft // 2 + 1, 0), dtype=np.float32)
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+        # Same precision path as librosa: float64 FFT stored as complex64, power in float32
+        spectrum = np.fft.rfft(frames * self.window, axis=1).astype(np.complex64)
+        power = (np.abs(spectrum) ** 2).T
+
+        # Keep the unconsumed tail (next frame starts n_frames * hop in)
+        self._buffer = buffer[n_frames * self.hop_length:]
+        return power
+
+    def finish(self):
+        """Frames overlapping the trailing n_fft // 2 zeros of center padding."""
+        tail = self.push(np.zeros(self.n_fft // 2, dtype=np.float32))
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return tail
+
+
+def calculate_psd_spectro_streaming(audio_path,
+                                    psd_n_fft=2048,
+                                    psd_hop_length=None,
+                                    spec_n_fft=1024,
+                                    spec_hop_length=None,
+                                    use_dual_resolution=True,
+                                    block_size=262144,
+                                    keep_spectrogram=True,
+                                    spec_decimation=1,
+                                    max_spec_frames=None,
+                                    verbose=False):
+    """
+    Block-wise version of calculate_psd_spectro for long recordings.
+    Reads block_size samples at a time with soundfile and accumulates the mean power
+    frame by frame, so peak memory follows block_size rather than file length.
+
+    The spectrogram is optional: with spec_decimation > 1 (or max_spec_frames set),
+    consecutive frames are averaged in groups; keep_spectrogram=False returns None for it.
+    Formats soundfile cannot open fall back to the in-memory path.
+    """
+    import soundfile as sf
+
+    try:
+        sound_file = sf.SoundFile(str(audio_path))
+    except Exception as e:
+        if verbose:
+            print(f"Streaming unavailable for {audio_path} ({e}), loading into memory")
+        return calculate_psd_spectro(audio_path, psd_n_fft=psd_n_fft, psd_hop_length=psd_hop_length,
+                                     spec_n_fft=spec_n_fft, spec_hop_length=spec_hop_length,
+                                     use_dual_resolution=use_dual_resolution, verbose=verbose)
+
+    if psd_hop_length is None:
+        psd_hop_length = psd_n_fft // 16
+    if spec_hop_length is None:
+        spec_hop_length = spec_n_fft // 16
+    if not use_dual_resolution:
+        # Single resolution (original behavior): one STFT feeds both outputs
+        psd_hop_length = spec_hop_length = psd_n_fft // 16
+        spec_n_fft = psd_n_fft
+
+    with sound_file:
+        sr = sound_file.samplerate
+        total_samples = sound_file.frames
+
+        if total_samples == 0:
+            raise ValueError(f"Audio file is empty: {audio_path}")
+
+        if max_spec_frames:
+            total_spec_frames = 1 + total_samples // spec_hop_length
+            spec_decimation = max(spec_decimation, -(-total_spec_frames // max_spec_frames))
+
+        if verbose:
+            print(f"Streaming {total_samples / sr:.1f}s in blocks of {block_size} samples")
+            print(f"PSD: {psd_n_fft}-point FFT, {psd_hop_length} hop")
+            print(f"Spectrogram: {spec_n_fft}-point FFT, {spec_hop_length} hop, decimation {spec_decimation}")
+
+        psd_stft = StreamingSTFT(psd_n_fft, psd_hop_length)
+        spec_stft = StreamingSTFT(spec_n_fft, spec_hop_length) if use_dual_resolution else psd_stft
+        regrid_matrix = spectrogram_regrid_matrix(sr, spec_n_fft, psd_n_fft) if use_dual_resolution else None
+
+        psd_sum = np.zeros(psd_n_fft // 2 + 1, dtype=np.float64)
+        psd_count = 0
+        spec_columns = []
+        pending = np.zeros((spec_n_fft // 2 + 1, 0), dtype=np.float32)  # frames waiting to fill a decimation group
+
+        def consume(psd_power, spec_power, final=False):
+            nonlocal psd_sum, psd_count, pending
+            psd_sum += psd_power.sum(axis=1, dtype=np.float64)
+            psd_count += psd_power.shape[1]
+            if not keep_spectrogram:
+                return
+
+            # Average groups first, then regrid - both are linear, and this regrids fewer columns
+            pending = np.concatenate([pending, spec_power], axis=1)
+            n_full = pending.shape[1] // spec_decimation * spec_decimation
+            columns = []
+            if n_full and spec_decimation == 1:
+                columns.append(pending)
+            elif n_full:
+                groups = pending[:, :n_full].reshape(pending.shape[0], -1, spec_decimation)
+                columns.append(groups.mean(axis=2, dtype=np.float64))
+            if final and pending.shape[1] > n_full:
+                columns.append(pending[:, n_full:].mean(axis=1, keepdims=True, dtype=np.float64))
+            pending = pending[:, n_full:]
+
+            for column_block in columns:
+                spec_columns.append(regrid_matrix @ column_block if regrid_matrix is not None else column_block)
+
+        # Same samples as librosa.load(sr=None): float32, channels averaged to mono
+        for block in sound_file.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            samples = block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
+            psd_power = psd_stft.push(samples)
+            spec_power = spec_stft.push(samples) if use_dual_resolution else psd_power
+            consume(psd_power, spec_power)
+
+        psd_power = psd_stft.finish()
+        spec_power = spec_stft.finish() if use_dual_resolution else psd_power
+        consume(psd_power, spec_power, final=True)
+
+    psd_mean = (psd_sum / psd_count).astype(np.float32)
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=psd_n_fft)
+
+    if not keep_spectrogram:
+        return frequencies, None, None, psd_mean
+
+    power_spectrum = np.concatenate(spec_columns, axis=1)
+    n_spec_frames = 1 + total_samples // spec_hop_length
+    frame_times = librosa.frames_to_time(np.arange(n_spec_frames), sr=sr, hop_length=spec_hop_length)
+    if spec_decimation > 1:
+        # Each decimated column sits at the mean time of the frames it averages
+        group_ids = np.arange(n_spec_frames) // spec_decimation
+        times = np.bincount(group_ids, weights=frame_times) / np.bincount(group_ids)
+    else:
+        times = frame_times
+
+    if verbose:
+        print(f"Streamed spectrogram shape: {power_spectrum.shape}")
+
+    return frequencies, times, power_spectrum, psd_mean
+
+
 def find_artifacts_dir():
     """
     Search upward from the current directory for a directory named 'code',
@@ -0,0 +1,144 @@
+# jelly_jobs.py
+
+# In-process job queue for the Flask app: /process enqueues an analysis and
+# returns immediately, a small pool of worker threads runs the jobs, and the
+# browser polls for status/progress before fetching the finished HTML.
+# No external broker - jobs live in memory and are forgotten after job_ttl.
+
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when the pending queue is at capacity."""
+
+
+class Job:
+    """One queued analysis and everything the status endpoint reports about it."""
+
+    def __init__(self, func, args, kwargs, job_id=None):
+        self.id = job_id or str(uuid.uuid4())[:8]
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'      # queued -> running -> done | failed
+        self.stage = 'queued'
+        self.progress = 0.0         # 0..1
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def set_progress(self, stage, progress=None):
+        """Progress hook handed to the job function."""
+        self.stage = stage
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, float(progress)))
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'error': self.error,
+            'queued_seconds': round((self.started or now) - self.created, 2),
+            'elapsed_seconds': round((self.finished or now) - self.started, 2) if self.started else None,
+        }
+
+
+class JobQueue:
+    """
+    Bounded FIFO of Jobs consumed by num_workers daemon threads.
+    submit() raises QueueFull once max_pending jobs are waiting, so callers can
+    push back on clients instead of piling up work.
+    """
+
+    def __init__(self, num_workers=1, max_pending=8, job_ttl=3600):
+        self.num_workers = max(1, int(num_workers))
+        self.max_pending = max(1, int(max_pending))
+        self.job_ttl = job_ttl
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"jelly-job-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, func, args=(), kwargs=None, job_id=None):
+        """
+        Queue func(*args, progress=job.set_progress, **kwargs) and return the Job.
+        Raises QueueFull if max_pending jobs are already waiting.
+        """
+        self.start()
+        self._prune()
+
+        job = Job(func, tuple(args), dict(kwargs or {}), job_id=job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull(f"Job queue is full ({self.max_pending} pending)")
+        return job
+
+    def get(self, job_id):
+        """Job for job_id, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """1-based position among queued jobs, or 0 once the job has started."""
+        if job.status != 'queued':
+            return 0
+        with self._lock:
+            waiting = [j for j in self._jobs.values() if j.status == 'queued']
+        return sum(1 for j in waiting if j.created <= job.created)
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            job.stage = 'starting'
+            job.started = time.time()
+            try:
+                job.result = job.func(*job.args, progress=job.set_progress, **job.kwargs)
+                job.set_progress('done', 1.0)
+                job.status = 'done'
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = 'failed'
+                job.stage = 'failed'
+            finally:
+                job.finished = time.time()
+                # Drop references to request data once the job is over
+                job.args = job.kwargs = None
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl."""
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
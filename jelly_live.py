@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# jelly_live.py
+
+# Live PSD monitoring. Clients POST raw PCM chunks to the Flask app; a LiveSession
+# turns them into STFT frames incrementally (every sample is transformed once) and
+# keeps the last window_seconds of PSD and spectrogram frames in ring buffers.
+# Snapshots give the calculate_psd_spectro-equivalent PSD and spectrogram of that
+# window plus peaks, ridge and veins; the app pushes them to the browser as
+# server-sent events at a fixed frame rate, always the latest state, so latency
+# stays bounded however fast chunks arrive.
+#
+# Run as a script to feed an audio file as a simulated stream:
+#   python jelly_live.py test_audio/slice_1.wav --server http://localhost:5000
+#   python jelly_live.py test_audio/slice_1.wav --offline     # no server, prints peak tracks
+
+import argparse
+import json
+import threading
+import time
+import uuid
+
+import librosa
+import numpy as np
+
+import jelly_funcs as jelfun
+from jelly_peaks import detect_psd_peaks, find_max_energy_ridge, find_spectral_veins
+
+
+class FrameRing:
+    """The most recent `capacity` columns of a (bins, frames) stream, oldest first on read."""
+
+    def __init__(self, n_bins, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros((n_bins, self.capacity), dtype=np.float32)
+        self.total = 0  # frames ever appended
+
+    def append(self, frames):
+        n_new = frames.shape[1]
+        # Only the last capacity frames survive, but every frame counts towards total
+        frames = frames[:, -self.capacity:]
+        n_kept = frames.shape[1]
+        start = (self.total + n_new - n_kept) % self.capacity
+        first = min(n_kept, self.capacity - start)
+        self._data[:, start:start + first] = frames[:, :first]
+        self._data[:, :n_kept - first] = frames[:, first:]
+        self.total += n_new
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def first_index(self):
+        """Stream index of the oldest frame held."""
+        return self.total - len(self)
+
+    def ordered(self):
+        """Copy of the held frames in time order."""
+        if self.total <= self.capacity:
+            return self._data[:, :self.total].copy()
+        start = self.total % self.capacity
+        return np.concatenate([self._data[:, start:], self._data[:, :start]], axis=1)
+
+
+class LiveSession:
+    """
+    Rolling dual-resolution PSD/spectrogram over the last window_seconds of a PCM stream.
+    push() is cheap (incremental STFT frames into ring buffers); snapshot() does the
+    peak, ridge and vein analysis of the current window. Thread-safe.
+    Raises ValueError for settings outside their valid range, or whose ring buffers
+    would exceed max_buffer_bytes (None = no limit).
+    """
+
+    def __init__(self, sr, psd_n_fft=1024, spec_n_fft=512, psd_hop_length=None, spec_hop_length=None,
+                 window_seconds=5.0, peak_fmin=100, peak_fmax=6000, plot_fmax=6000,
+                 height_percentile=0.6, prominence_factor=0.05, min_width=0.6,
+                 num_veins=6, max_spec_columns=400, session_id=None, max_buffer_bytes=None):
+        if not sr > 0:
+            raise ValueError(f"sr must be positive, got {sr}")
+        if psd_n_fft < 2 or spec_n_fft < 2:
+            raise ValueError(f"psd_n_fft and spec_n_fft must be at least 2, got {psd_n_fft} and {spec_n_fft}")
+        if not 0 < window_seconds < np.inf:
+            raise ValueError(f"window_seconds must be positive, got {window_seconds}")
+        self.id = session_id or str(uuid.uuid4())[:8]
+        self.sr = int(sr)
+        # Same hop defaults as calculate_psd_spectro
+        self.psd_n_fft = psd_n_fft
+        self.spec_n_fft = spec_n_fft
+        self.psd_hop_length = psd_hop_length or max(1, psd_n_fft // 16)
+        self.spec_hop_length = spec_hop_length or max(1, spec_n_fft // 16)
+        # Checked before anything of this size is allocated
+        window_samples = window_seconds * self.sr
+        psd_capacity = np.ceil(window_samples / self.psd_hop_length) + 1
+        spec_capacity = np.ceil(window_samples / self.spec_hop_length) + 1
+        buffer_bytes = 4 * ((psd_n_fft // 2 + 1) * psd_capacity + (spec_n_fft // 2 + 1) * spec_capacity)
+        if max_buffer_bytes is not None and buffer_bytes > max_buffer_bytes:
+            raise ValueError(f"A {window_seconds:g} s window at {self.sr} Hz needs {buffer_bytes / 1024**2:.0f} MB "
+                             f"of frame buffers (limit {max_buffer_bytes / 1024**2:.0f} MB)")
+        self.window_seconds = window_seconds
+        self.peak_fmin = peak_fmin
+        self.peak_fmax = peak_fmax
+        self.plot_fmax = plot_fmax
+        self.height_percentile = height_percentile
+        self.prominence_factor = prominence_factor
+        self.min_width = min_width
+        self.num_veins = num_veins
+        self.max_spec_columns = max_spec_columns
+
+        self.frequencies = librosa.fft_frequencies(sr=self.sr, n_fft=psd_n_fft)
+        self._regrid_matrix = jelfun.spectrogram_regrid_matrix(self.sr, spec_n_fft, psd_n_fft)
+        self._psd_stft = jelfun.StreamingSTFT(psd_n_fft, self.psd_hop_length)
+        self._spec_stft = jelfun.StreamingSTFT(spec_n_fft, self.spec_hop_length)
+        self._psd_frames = FrameRing(psd_n_fft // 2 + 1, psd_capacity)
+        self._spec_frames = FrameRing(spec_n_fft // 2 + 1, spec_capacity)
+
+        self._lock = threading.Lock()
+        self.samples_received = 0
+        self.version = 0        # bumped whenever new frames arrive
+        self.closed = False
+        self.created = self.last_active = time.time()
+
+    def push(self, samples):
+        """Append mono PCM samples (float, -1..1); returns the number of new PSD frames."""
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        with self._lock:
+            psd_power = self._psd_stft.push(samples)
+            spec_power = self._spec_stft.push(samples)
+            self._psd_frames.append(psd_power)
+            self._spec_frames.append(spec_power)
+            self.samples_received += len(samples)
+            self.last_active = time.time()
+            if psd_power.shape[1] or spec_power.shape[1]:
+                self.version += 1
+        return psd_power.shape[1]
+
+    def finish(self):
+        """End of stream: flush the trailing center-padded frames, as calculate_psd_spectro includes them."""
+        with self._lock:
+            self._psd_frames.append(self._psd_stft.finish())
+            self._spec_frames.append(self._spec_stft.finish())
+            self.version += 1
+            self.last_active = time.time()
+
+    def snapshot(self):
+        """Current window: PSD (dB), peaks, decimated spectrogram (dB), ridge and veins."""
+        start = time.perf_counter()
+        with self._lock:
+            version = self.version
+            stream_seconds = self.samples_received / self.sr
+            psd_frames = self._psd_frames.ordered()
+            spec_frames = self._spec_frames.ordered()
+            first_spec_frame = self._spec_frames.first_index
+
+        snapshot = {'session_id': self.id, 'version': version, 'stream_seconds': stream_seconds,
+                    'frequencies': None, 'psd_db': None, 'peaks': [], 'spectrogram': None,
+                    'ridge': None, 'veins': []}
+        if psd_frames.shape[1] == 0 or spec_frames.shape[1] == 0:
+            snapshot['compute_ms'] = (time.perf_counter() - start) * 1000
+            return snapshot
+
+        psd_db = 10 * np.log10(np.maximum(np.mean(psd_frames, axis=1), 1e-15))
+        peak_indices, peak_widths, _ = detect_psd_peaks(
+            self.frequencies, psd_db, self.peak_fmin, self.peak_fmax,
+            height_percentile=self.height_percentile,
+            prominence_factor=self.prominence_factor,
+            min_width=self.min_width
+        )
+
+        # Average the window's spectrogram columns in groups to at most max_spec_columns,
+        # then regrid onto the PSD frequencies as calculate_psd_spectro does
+        n_columns = spec_frames.shape[1]
+        group = max(1, -(-n_columns // self.max_spec_columns))
+        group_ids = np.arange(n_columns) // group
+        counts = np.bincount(group_ids)
+        spec_columns = np.add.reduceat(spec_frames, np.arange(0, n_columns, group), axis=1) / counts
+        spectrogram = self._regrid_matrix @ spec_columns
+        frame_times = (first_spec_frame + np.arange(n_columns)) * self.spec_hop_length / self.sr
+        times = np.bincount(group_ids, weights=frame_times) / counts
+
+        ridge_times, ridge_freqs = find_max_energy_ridge(spectrogram, self.frequencies, times)
+        veins = find_spectral_veins(spectrogram, self.frequencies, times, num_veins=self.num_veins)
+
+        # Only the displayed band goes to the browser
+        band = self.frequencies <= self.plot_fmax
+        snapshot.update({
+            'frequencies': np.round(self.frequencies[band], 2).tolist(),
+            'psd_db': np.round(psd_db[band], 2).tolist(),
+            'peaks': [{'freq': float(self.frequencies[i]), 'power_db': round(float(psd_db[i]), 2),
+                       'width': round(float(w), 2)} for i, w in zip(peak_indices, peak_widths)],
+            'spectrogram': {
+                'times': np.round(times, 4).tolist(),
+                'db': np.round(10 * np.log10(np.maximum(spectrogram[band], 1e-10)), 1).tolist(),
+            },
+            'ridge': {'times': np.round(ridge_times, 4).tolist(), 'freqs': ridge_freqs.tolist()},
+            'veins': [{'times': np.round(vein['times'], 4).tolist(), 'freqs': vein['freqs'].tolist(),
+                       'center_freq': float(vein['center_freq']), 'rank': int(vein['rank'])}
+                      for vein in veins],
+        })
+        snapshot['compute_ms'] = (time.perf_counter() - start) * 1000
+        return snapshot
+
+
+class LiveSessionRegistry:
+    """
+    Open LiveSessions by id; sessions idle for idle_timeout seconds are dropped by prune().
+    max_window_seconds and max_buffer_bytes bound what one session may allocate.
+    """
+
+    def __init__(self, max_sessions=4, idle_timeout=60, max_window_seconds=None, max_buffer_bytes=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_window_seconds = max_window_seconds
+        self.max_buffer_bytes = max_buffer_bytes
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        """
+        New session; raises RuntimeError when max_sessions are already open and
+        ValueError for settings outside the session's or the registry's limits.
+        """
+        window_seconds = kwargs.get('window_seconds', 5.0)
+        if self.max_window_seconds is not None and window_seconds > self.max_window_seconds:
+            raise ValueError(f"window_seconds must be at most {self.max_window_seconds:g}, got {window_seconds:g}")
+        kwargs.setdefault('max_buffer_bytes', self.max_buffer_bytes)
+        self.prune()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError(f"Too many live sessions ({self.max_sessions} open)")
+            session = LiveSession(**kwargs)
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.closed = True
+        return session
+
+    def prune(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session.last_active < cutoff]
+        for session_id in expired:
+            self.close(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def sse_events(session, frame_rate=4.0, keepalive_seconds=15.0, idle_timeout=None):
+    """
+    Server-sent event stream for a session: at most frame_rate snapshots per second,
+    each taken fresh when new frames have arrived, so clients never lag behind a backlog.
+    Ends when the session is closed, or has received nothing for idle_timeout seconds.
+    """
+    interval = 1.0 / frame_rate
+    last_version = -1
+    last_sent = time.time()
+    yield f"retry: {int(interval * 1000)}\n\n"
+    while not session.closed:
+        if idle_timeout is not None and time.time() - session.last_active > idle_timeout:
+            break
+        tick = time.perf_counter()
+        if session.version != last_version:
+            snapshot = session.snapshot()
+            last_version = snapshot['version']
+            last_sent = time.time()
+            yield f"data: {json.dumps(snapshot)}\n\n"
+        elif time.time() - last_sent > keepalive_seconds:
+            last_sent = time.time()
+            yield ": keepalive\n\n"
+        time.sleep(max(0.0, interval - (time.perf_counter() - tick)))
+    yield "event: closed\ndata: {}\n\n"
+
+
+# ==================== SIMULATED STREAM ====================
+
+def feed_offline(samples, sr, chunk_seconds, frame_rate, **session_kwargs):
+    """Feed samples through a LiveSession without a server, printing the top peaks per frame."""
+    session = LiveSession(sr, **session_kwargs)
+    chunk = max(1, int(chunk_seconds * sr))
+    next_frame = 0.0
+    compute_ms = []
+    for offset in range(0, len(samples), chunk):
+        session.push(samples[offset:offset + chunk])
+        stream_seconds = session.samples_received / sr
+        if stream_seconds >= next_frame:
+            next_frame += 1.0 / frame_rate
+            snapshot = session.snapshot()
+            compute_ms.append(snapshot['compute_ms'])
+            top = sorted(snapshot['peaks'], key=lambda peak: -peak['power_db'])[:5]
+            print(f"t={stream_seconds:6.2f}s  {snapshot['compute_ms']:6.1f} ms  peaks: "
+                  + ", ".join(f"{peak['freq']:.0f} Hz" for peak in top))
+    if compute_ms:
+        print(f"Snapshots: {len(compute_ms)}, compute median {np.median(compute_ms):.1f} ms, "
+              f"max {np.max(compute_ms):.1f} ms")
+
+
+def feed_server(samples, sr, server, chunk_seconds, realtime, **session_kwargs):
+    """Create a live session on the Flask app and POST samples to it as float32 chunks."""
+    import urllib.request
+
+    def post(url, data, content_type):
+        req = urllib.request.Request(url, data=data, headers={'Content-Type': content_type}, method='POST')
+        with urllib.request.urlopen(req) as response:
+            return json.loads(response.read())
+
+    session_kwargs['sr'] = sr
+    info = post(f"{server}/live", json.dumps(session_kwargs).encode('utf-8'), 'application/json')
+    print(f"Live session {info['session_id']}: open {server}{info['view_url']} to watch")
+
+    chunk = max(1, int(chunk_seconds * sr))
+    start = time.perf_counter()
+    for offset in range(0, len(samples), chunk):
+        block = np.ascontiguousarray(samples[offset:offset + chunk], dtype='<f4')
+        post(f"{server}{info['chunk_url']}", block.tobytes(), 'application/octet-stream')
+        if realtime:
+            # Pace the upload at the audio's own rate
+            time.sleep(max(0.0, (offset + len(block)) / sr - (time.perf_counter() - start)))
+    print(f"Sent {len(samples) / sr:.1f}s of audio in {time.perf_counter() - start:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Feed an audio file to the live PSD monitor as a simulated stream")
+    parser.add_argument('audio', nargs='+', help="Audio files, streamed back to back")
+    parser.add_argument('--server', default='http://localhost:5000')
+    parser.add_argument('--offline', action='store_true', help="Run the live analysis locally instead")
+    parser.add_argument('--repeat', type=int, default=1, help="Stream the files this many times over")
+    parser.add_argument('--chunk-ms', type=float, default=50)
+    parser.add_argument('--frame-rate', type=float, default=4.0, help="Snapshots per second (offline)")
+    parser.add_argument('--no-realtime', action='store_true', help="Send as fast as possible")
+    parser.add_argument('--psd-n-fft', type=int, default=1024)
+    parser.add_argument('--spec-n-fft', type=int, default=512)
+    parser.add_argument('--window-seconds', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    decoded = [jelfun.load_audio(path) for path in args.audio]
+    sr = decoded[0][1]
+    if any(file_sr != sr for _, file_sr in decoded):
+        parser.error("All files must share a sample rate")
+    samples = np.concatenate([y for y, _ in decoded] * max(1, args.repeat))
+
+    session_kwargs = dict(psd_n_fft=args.psd_n_fft, spec_n_fft=args.spec_n_fft, window_seconds=args.window_seconds)
+    if args.offline:
+        feed_offline(samples, sr, args.chunk_ms / 1000, args.frame_rate, **session_kwargs)
+    else:
+        feed_server(samples, sr, args.server.rstrip('/'), args.chunk_ms / 1000, not args.no_realtime,
+                    **session_kwargs)
+
+
+if __name__ == '__main__':
+    main()
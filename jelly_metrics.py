@@ -0,0 +1,187 @@
+# jelly_metrics.py
+
+# Per-stage instrumentation for the analysis pipeline. A StageMetrics collects,
+# for each named stage (decode, psd:<method>, peaks, ridge_veins, plotly_build,
+# json_serialize, png_export, template_render, ...), the call count, wall time,
+# CPU time and memory high-water marks of one analysis run. Nested stages are
+# charged exclusively: a parent's times exclude its children, so the stages of a
+# run add up to its total. MetricsRegistry aggregates finished runs for the
+# Prometheus /metrics endpoint.
+
+import contextlib
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Process peak resident set size so far, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageMetrics:
+    """
+    Measurements of one run, keyed by stage name; repeated stages accumulate.
+    CPU time is that of the measuring thread, so concurrent jobs do not bleed into
+    each other. Peak RSS is the process high-water mark at the end of the stage and
+    rss_growth how much the stage raised it. When tracemalloc is tracing (see
+    start_memory_tracing) each stage also records its peak traced allocation above
+    the level it started at. Picklable, so worker processes can send theirs back.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._open = []
+        self.created = time.time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        frame = {'child_wall': 0.0, 'child_cpu': 0.0, 'traced_peak': 0}
+        if tracing:
+            traced_start, traced_peak = tracemalloc.get_traced_memory()
+            # The parent's peak so far would be lost by reset_peak(); keep it
+            if self._open and 'traced_start' in self._open[-1]:
+                parent = self._open[-1]
+                parent['traced_peak'] = max(parent['traced_peak'], traced_peak - parent['traced_start'])
+            tracemalloc.reset_peak()
+            frame['traced_start'] = traced_start
+        rss_start = peak_rss_bytes()
+        self._open.append(frame)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield self
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            self._open.pop()
+            rss_end = peak_rss_bytes()
+            traced = None
+            if tracing and tracemalloc.is_tracing():
+                traced = max(frame['traced_peak'], tracemalloc.get_traced_memory()[1] - frame['traced_start'])
+            if self._open:
+                parent = self._open[-1]
+                parent['child_wall'] += wall
+                parent['child_cpu'] += cpu
+                if traced is not None and 'traced_start' in parent:
+                    parent['traced_peak'] = max(parent['traced_peak'],
+                                                traced + frame['traced_start'] - parent['traced_start'])
+            self.add(name, wall - frame['child_wall'], cpu - frame['child_cpu'],
+                     peak_rss=rss_end,
+                     rss_growth=None if rss_start is None else rss_end - rss_start,
+                     traced_peak=traced)
+
+    def add(self, name, wall, cpu, peak_rss=None, rss_growth=None, traced_peak=None, count=1):
+        """Record a stage measured elsewhere (or merge one); times add up, memory keeps the maximum."""
+        entry = self.stages.setdefault(name, {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                              'peak_rss_bytes': None, 'rss_growth_bytes': None,
+                                              'traced_peak_bytes': None})
+        entry['count'] += count
+        entry['wall_seconds'] += wall
+        entry['cpu_seconds'] += cpu
+        for key, value in (('peak_rss_bytes', peak_rss), ('rss_growth_bytes', rss_growth),
+                           ('traced_peak_bytes', traced_peak)):
+            if value is not None:
+                entry[key] = value if entry[key] is None else max(entry[key], value)
+
+    def merge(self, other):
+        """Fold in another StageMetrics, e.g. one returned by a worker process."""
+        for name, entry in other.stages.items():
+            self.add(name, entry['wall_seconds'], entry['cpu_seconds'], entry['peak_rss_bytes'],
+                     entry['rss_growth_bytes'], entry['traced_peak_bytes'], entry['count'])
+
+    def total_seconds(self):
+        return sum(entry['wall_seconds'] for entry in self.stages.values())
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'total_wall_seconds': self.total_seconds(),
+            'total_cpu_seconds': sum(entry['cpu_seconds'] for entry in self.stages.values()),
+            'stages': self.stages,
+        }
+
+    def summary(self):
+        """Text table of the stages, slowest first."""
+        lines = [f"{'stage':<24} {'calls':>6} {'wall (s)':>10} {'cpu (s)':>10} {'peak RSS (MB)':>14}"]
+        for name, entry in sorted(self.stages.items(), key=lambda item: -item[1]['wall_seconds']):
+            rss = entry['peak_rss_bytes']
+            lines.append(f"{name:<24} {entry['count']:>6} {entry['wall_seconds']:>10.3f} "
+                         f"{entry['cpu_seconds']:>10.3f} {'-' if rss is None else f'{rss / 1024**2:.1f}':>14}")
+        return "\n".join(lines)
+
+
+def measure(metrics, name):
+    """metrics.stage(name), or a no-op context when metrics is None."""
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
+
+
+def start_memory_tracing(frames=1):
+    """Start tracemalloc so stages record traced peaks (slows allocation-heavy code)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+class MetricsRegistry:
+    """Totals over finished runs, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, prefix='jelly'):
+        self.prefix = prefix
+        self.runs = 0
+        self.failures = 0
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metrics, success=True):
+        with self._lock:
+            self.runs += 1
+            if not success:
+                self.failures += 1
+            for name, entry in metrics.stages.items():
+                totals = self.stages.setdefault(name, {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                       'peak_rss_bytes': None, 'traced_peak_bytes': None})
+                totals['count'] += entry['count']
+                totals['wall_seconds'] += entry['wall_seconds']
+                totals['cpu_seconds'] += entry['cpu_seconds']
+                for key in ('peak_rss_bytes', 'traced_peak_bytes'):
+                    if entry[key] is not None:
+                        totals[key] = entry[key] if totals[key] is None else max(totals[key], entry[key])
+
+    def prometheus_text(self):
+        p = self.prefix
+        with self._lock:
+            stages = {name: dict(totals) for name, totals in self.stages.items()}
+            runs, failures = self.runs, self.failures
+
+        def label(name):
+            return name.replace('\\', '\\\\').replace('"', '\\"')
+
+        lines = [f"# HELP {p}_runs_total Analysis runs finished.",
+                 f"# TYPE {p}_runs_total counter",
+                 f"{p}_runs_total {runs}",
+                 f"# HELP {p}_run_failures_total Analysis runs that failed.",
+                 f"# TYPE {p}_run_failures_total counter",
+                 f"{p}_run_failures_total {failures}"]
+        series = (('stage_calls_total', 'counter', 'Stage executions.', 'count'),
+                  ('stage_wall_seconds_total', 'counter', 'Wall time spent in each stage, excluding nested stages.', 'wall_seconds'),
+                  ('stage_cpu_seconds_total', 'counter', 'Thread CPU time spent in each stage, excluding nested stages.', 'cpu_seconds'),
+                  ('stage_peak_rss_bytes', 'gauge', 'Highest process peak RSS seen at the end of each stage.', 'peak_rss_bytes'),
+                  ('stage_traced_peak_bytes', 'gauge', 'Largest tracemalloc peak allocated within each stage.', 'traced_peak_bytes'))
+        for metric, kind, help_text, key in series:
+            values = [(name, totals[key]) for name, totals in sorted(stages.items()) if totals[key] is not None]
+            if not values:
+                continue
+            lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} {kind}"]
+            lines += [f'{p}_{metric}{{stage="{label(name)}"}} {value}' for name, value in values]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,223 @@
+# jelly_peaks.py
+
+# Peak detection for dB-scale PSDs.
+# Candidate peaks (every local maximum) and their heights, prominences and
+# widths do not depend on the detection thresholds, so they are computed once
+# per PSD; each adaptive threshold level is then a boolean filter over the
+# candidates and yields exactly the peaks scipy.signal.find_peaks would return
+# for that level. Stacks of PSDs on a shared frequency grid are handled together.
+# The spectrogram's maximum-energy ridge and spectral veins live here too, so the
+# live monitor gets every feature it tracks without importing the plotting module.
+
+import numpy as np
+
+
+def relaxation_schedule(height_percentile, prominence_factor, min_height_percentile=0.2,
+                        height_step=0.05, prominence_divisor=1.5):
+    """(height percentile, prominence factor) levels, tried in order until enough peaks are found."""
+    levels = []
+    while height_percentile > min_height_percentile:
+        levels.append((height_percentile, prominence_factor))
+        height_percentile -= height_step
+        prominence_factor /= prominence_divisor
+    return levels
+
+
+class PeakCandidates:
+    """
+    Local maxima of one signal with their height, prominence and width (in samples,
+    at half prominence - the same properties find_peaks filters on).
+    Prominences and widths are measured lazily, only for candidates that reach that
+    stage of a select(), and each candidate is measured at most once.
+    """
+
+    def __init__(self, x):
+        from scipy.signal import find_peaks
+
+        self.x = np.asarray(x, dtype=np.float64)
+        self.indices, _ = find_peaks(self.x)
+        self.heights = self.x[self.indices]
+        self.prominences = np.full(len(self.indices), np.nan)
+        self.left_bases = np.zeros(len(self.indices), dtype=np.intp)
+        self.right_bases = np.zeros(len(self.indices), dtype=np.intp)
+        self.widths = np.full(len(self.indices), np.nan)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def select(self, height, prominence, width):
+        """(indices, widths) of the candidates passing all three minimum thresholds."""
+        from scipy.signal import peak_prominences, peak_widths
+
+        keep = self.heights >= height
+        todo = keep & np.isnan(self.prominences)
+        if np.any(todo):
+            (self.prominences[todo], self.left_bases[todo],
+             self.right_bases[todo]) = peak_prominences(self.x, self.indices[todo])
+
+        keep &= self.prominences >= prominence
+        todo = keep & np.isnan(self.widths)
+        if np.any(todo):
+            prominence_data = (self.prominences[todo], self.left_bases[todo], self.right_bases[todo])
+            self.widths[todo] = peak_widths(self.x, self.indices[todo], rel_height=0.5,
+                                            prominence_data=prominence_data)[0]
+
+        keep &= self.widths >= width
+        return self.indices[keep], self.widths[keep]
+
+
+def detect_psd_peaks_batch(frequencies, psd_db_stack, peak_fmin, peak_fmax, max_peaks=40,
+                           height_percentile=0.5, prominence_factor=0.04, min_width=0.5):
+    """
+    detect_psd_peaks for a 2-D stack of dB PSDs (one per row) sharing frequencies.
+    Standard deviations, and the height percentile of each relaxation level once any
+    row needs it, are computed for the whole stack at once.
+    Returns a list of (peak indices, peak widths in Hz, frequency resolution), one per row.
+    """
+    psd_db_stack = np.atleast_2d(psd_db_stack)
+    peak_freq_mask = (frequencies >= peak_fmin) & (frequencies <= peak_fmax)
+    band_indices = np.where(peak_freq_mask)[0]
+    band = psd_db_stack[:, peak_freq_mask]
+    freq_resolution = frequencies[1] - frequencies[0] if len(frequencies) > 1 else 1
+
+    # Thresholds are relaxed until at least min(10, max_peaks) peaks are found
+    min_desired_peaks = min(10, max_peaks)
+    levels = relaxation_schedule(height_percentile, prominence_factor)
+    search = bool(levels) and min_desired_peaks > 0 and band.shape[1] > 0
+    if search:
+        band_std = np.std(band, axis=1)
+    height_thresholds = {}
+    width = max(min_width, 1.0)
+
+    results = []
+    for row in range(band.shape[0]):
+        peaks = np.array([], dtype=np.intp)
+        widths = np.zeros(0)
+        if search:
+            candidates = PeakCandidates(band[row])
+            for level, (level_height_percentile, level_prominence_factor) in enumerate(levels):
+                if level not in height_thresholds:
+                    height_thresholds[level] = np.percentile(band, level_height_percentile * 100, axis=1)
+                peaks, widths = candidates.select(height_thresholds[level][row],
+                                                  level_prominence_factor * band_std[row], width)
+                if len(peaks) >= min_desired_peaks:
+                    break
+
+        peak_indices = band_indices[peaks]
+        peak_widths = widths * freq_resolution
+
+        # Keep the strongest max_peaks
+        if len(peak_indices) > max_peaks:
+            top_indices = np.argsort(psd_db_stack[row, peak_indices])[::-1][:max_peaks]
+            peak_indices = peak_indices[top_indices]
+            peak_widths = peak_widths[top_indices]
+
+        results.append((peak_indices, peak_widths, freq_resolution))
+    return results
+
+
+def detect_psd_peaks(frequencies, psd_db, peak_fmin, peak_fmax, max_peaks=40,
+                     height_percentile=0.5, prominence_factor=0.04, min_width=0.5):
+    """
+    Adaptive peak detection on a dB-scale PSD within [peak_fmin, peak_fmax].
+    Thresholds are relaxed until at least min(10, max_peaks) peaks are found, then the
+    strongest max_peaks are kept.
+    Returns (peak indices into frequencies, peak widths in Hz, frequency resolution).
+    """
+    return detect_psd_peaks_batch(frequencies, np.asarray(psd_db)[np.newaxis, :], peak_fmin, peak_fmax,
+                                  max_peaks=max_peaks, height_percentile=height_percentile,
+                                  prominence_factor=prominence_factor, min_width=min_width)[0]
+
+
+def detect_peaks_grid(spectra, peak_fmin=None, peak_fmax=None, **kwargs):
+    """
+    Peaks for a list of (frequencies, psd_db) pairs, e.g. a whole file x method grid.
+    Spectra on identical frequency grids are stacked and detected in one batch;
+    peak_fmin/peak_fmax default to each grid's own frequency range, as in the plots.
+    Returns one detect_psd_peaks result per input, in input order.
+    """
+    groups = {}
+    for position, (frequencies, psd_db) in enumerate(spectra):
+        frequencies = np.asarray(frequencies)
+        key = (frequencies.dtype.str, frequencies.tobytes(), np.asarray(psd_db).dtype.str)
+        groups.setdefault(key, (frequencies, []))[1].append(position)
+
+    results = [None] * len(spectra)
+    for frequencies, positions in groups.values():
+        fmin = peak_fmin if peak_fmin is not None else np.min(frequencies)
+        fmax = peak_fmax if peak_fmax is not None else np.max(frequencies)
+        stack = np.stack([spectra[position][1] for position in positions])
+        for position, result in zip(positions, detect_psd_peaks_batch(frequencies, stack, fmin, fmax, **kwargs)):
+            results[position] = result
+    return results
+
+
+# ==================== SPECTRAL RIDGE AND VEINS ====================
+
+def find_max_energy_ridge(spectrogram, frequencies, times):
+    """Find the frequency of maximum energy at each time slice."""
+    spec_db = 10 * np.log10(np.maximum(spectrogram, 1e-10))
+    max_freq_indices = np.argmax(spec_db, axis=0)
+    ridge_freqs = frequencies[max_freq_indices]
+    return times, ridge_freqs
+
+
+def find_spectral_veins(spectrogram, frequencies, times, num_veins=6, freq_window=50, spectrogram_db=None):
+    """
+    Find veins by tracking bright regions in specific frequency bands.
+    Pass spectrogram_db (10*log10 of spectrogram) to skip recomputing it; it is floored at -100 dB
+    so results match the linear path.
+    """
+    if spectrogram_db is None:
+        spec_db = 10 * np.log10(np.maximum(spectrogram, 1e-10))
+    else:
+        spec_db = np.maximum(spectrogram_db, 10 * np.log10(1e-10))
+
+    # Find strongest frequency regions across all time
+    overall_energy = np.mean(spec_db, axis=1)
+
+    # Find peak frequency regions
+    from scipy.signal import find_peaks
+    peak_indices, _ = find_peaks(overall_energy, prominence=np.std(overall_energy)*0.3)
+
+    # Sort by strength and take top num_veins
+    if len(peak_indices) > 0:
+        peak_strengths = overall_energy[peak_indices]
+        top_peak_indices = peak_indices[np.argsort(peak_strengths)[-num_veins:]][::-1]
+    else:
+        # Fallback: just use strongest frequencies
+        top_peak_indices = np.argsort(overall_energy)[-num_veins:][::-1]
+
+    # Frequency window around each vein's centre
+    n_freqs = spec_db.shape[0]
+    window_starts = np.maximum(0, top_peak_indices - freq_window//2)
+    window_stops = np.minimum(n_freqs, top_peak_indices + freq_window//2)
+    window_width = int(np.max(window_stops - window_starts, initial=0))
+
+    # Max energy within every vein's window for every time slice, in one argmax:
+    # gather (veins, window, times), mask bins past each window's end, reduce over the window axis
+    if window_width > 0:
+        window_rows = window_starts[:, None] + np.arange(window_width)[None, :]
+        in_window = window_rows < window_stops[:, None]
+        windows = spec_db[np.minimum(window_rows, n_freqs - 1)]
+        windows = np.where(in_window[:, :, None], windows, -np.inf)
+        vein_freq_indices = window_starts[:, None] + np.argmax(windows, axis=1)
+
+    veins = []
+
+    for i, center_freq_idx in enumerate(top_peak_indices):
+        if window_stops[i] > window_starts[i]:
+            vein_times = np.asarray(times)[:spec_db.shape[1]]
+            vein_freqs = frequencies[vein_freq_indices[i]]
+        else:
+            vein_times = np.array([])
+            vein_freqs = np.array([])
+
+        veins.append({
+            'times': np.array(vein_times),
+            'freqs': np.array(vein_freqs),
+            'center_freq': frequencies[center_freq_idx],
+            'rank': i + 1
+        })
+
+    return veins
@@ -0,0 +1,77 @@
+# jelly_spectrograms.py
+
+# Per-session spectrogram store. Every FFT_DUAL spectrogram of an analysis is
+# written once to its own .npy file and handed back as a read-only memory map,
+# so plot objects reference pages on disk instead of holding float64 matrices
+# in RAM until export; the OS pages them in while the heatmaps are encoded.
+
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+
+class SpectrogramStore:
+    """
+    Write-once .npy files under one directory, read back with np.load(mmap_mode='r').
+    With directory=None a temporary directory is created (under parent_dir, or the
+    system temp dir) and removed by close(), or once the store is garbage collected;
+    plots keep a reference to their store so it outlives them. Put it on a disk-backed
+    filesystem: a tmpfs /tmp keeps the pages in memory after all.
+    """
+
+    def __init__(self, directory=None, parent_dir=None):
+        if directory is None:
+            if parent_dir is not None:
+                os.makedirs(parent_dir, exist_ok=True)
+            directory = tempfile.mkdtemp(prefix='jelly_spectrograms_', dir=parent_dir)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, directory, ignore_errors=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._finalizer = None
+        self.directory = directory
+        self.nbytes = 0
+        self.closed = False
+        self._ids = itertools.count()
+
+    def put(self, spectrogram, floor=None):
+        """
+        Write spectrogram, clipped below at floor if given, to a new .npy file and
+        return a read-only memmap of it (same dtype, shape and memory order).
+        """
+        if self.closed:
+            raise ValueError("SpectrogramStore is closed")
+        spectrogram = np.asarray(spectrogram)
+        path = os.path.join(self.directory, f"spectrogram_{next(self._ids):06d}.npy")
+        fortran_order = spectrogram.flags.f_contiguous and not spectrogram.flags.c_contiguous
+        stored = np.lib.format.open_memmap(path, mode='w+', dtype=spectrogram.dtype,
+                                           shape=spectrogram.shape, fortran_order=fortran_order)
+        if floor is None:
+            stored[...] = spectrogram
+        else:
+            # Written straight into the mapped file, without an in-memory clipped copy
+            np.maximum(spectrogram, floor, out=stored)
+        stored.flush()
+        del stored
+        self.nbytes += spectrogram.nbytes
+        return np.load(path, mmap_mode='r')
+
+    def close(self):
+        """
+        Remove a temporary store's files; memmaps already handed out stay readable on POSIX.
+        Where mapped files cannot be removed (Windows), removal is retried at garbage collection or exit.
+        """
+        self.closed = True
+        if self._finalizer is not None and self._finalizer.alive:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            if not os.path.exists(self.directory):
+                self._finalizer.detach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,262 @@
+# jelly_store.py
+
+# Persistent feature store for analysis results: one SQLite file holding, per
+# audio file content hash and method, the detected peaks (frequency, dB power,
+# width), the analysis parameters and any user pairs/ratios from get_graph_data.
+# Peaks are indexed by frequency and pairs by ratio and frequency, so
+# cross-session queries ("1.5 ratio pairs near 2 kHz") never touch the JSON exports.
+
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from jelly_cache import file_content_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    file_hash TEXT NOT NULL REFERENCES files(file_hash),
+    method TEXT NOT NULL,
+    params TEXT NOT NULL,
+    label TEXT,
+    created REAL NOT NULL,
+    UNIQUE (file_hash, method, params)
+);
+CREATE TABLE IF NOT EXISTS peaks (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    frequency REAL NOT NULL,
+    power_db REAL,
+    width REAL
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    f0 REAL NOT NULL,
+    f1 REAL NOT NULL,
+    ratio REAL NOT NULL,
+    color TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_method ON analyses(method);
+CREATE INDEX IF NOT EXISTS idx_peaks_frequency ON peaks(frequency);
+CREATE INDEX IF NOT EXISTS idx_peaks_analysis ON peaks(analysis_id);
+CREATE INDEX IF NOT EXISTS idx_pairs_ratio ON pairs(ratio);
+CREATE INDEX IF NOT EXISTS idx_pairs_f0 ON pairs(f0);
+CREATE INDEX IF NOT EXISTS idx_pairs_f1 ON pairs(f1);
+CREATE INDEX IF NOT EXISTS idx_pairs_analysis ON pairs(analysis_id);
+"""
+
+# Peak detection settings read off each plot and stored with the caller's parameters
+PLOT_PARAMS = ('peak_fmin', 'peak_fmax', 'height_percentile', 'prominence_factor', 'min_width')
+
+# Display-only or per-run settings that do not change the stored features
+IGNORED_PARAMS = {'dir_name', 'methods', 'use_db_scale', 'plot_fmin', 'plot_fmax',
+                  'show_ridge', 'show_veins', 'verbose'}
+
+
+def _plain(value):
+    """JSON-safe version of a parameter value (numpy scalars/arrays, paths)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def plot_pairs(plot):
+    """
+    (f0, f1, ratio, color) for each user pair, from get_graph_data edges or plot.pairs.
+    Pairs whose lower frequency is not positive (e.g. a 0 Hz peak) have no ratio and are skipped.
+    """
+    candidates = []
+    if hasattr(plot, 'get_graph_data'):
+        for edge in plot.get_graph_data().get('edges', []):
+            candidates.append((edge['source'], edge['target'], edge.get('color')))
+    if not candidates:
+        for pair in getattr(plot, 'pairs', []):
+            if 'f0' in pair and 'f1' in pair:
+                candidates.append((pair['f0'], pair['f1'], pair.get('color')))
+
+    pairs = []
+    for a, b, color in candidates:
+        f0, f1 = sorted((float(a), float(b)))
+        if f0 > 0:
+            pairs.append((f0, f1, f1 / f0, color))
+    return pairs
+
+
+class FeatureStore:
+    """
+    SQLite-backed store of per-file, per-method analysis features.
+    Re-recording a file/method/parameter combination replaces its peaks and pairs.
+    Only holds a path; every call opens its own connection, so one store can be
+    shared by the Flask job workers and batch runs.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = os.path.abspath(db_path)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _query(self, sql, args=()):
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    # ---------- writing ----------
+
+    def record_plots(self, plots, params=None, file_hashes=None):
+        """
+        Store peaks, parameters and pairs for each plot with a source_path
+        (set by compare_methods_psd_analysis); plots without one are skipped.
+        params: analysis parameters shared by all plots (n_fft, hop lengths, ...).
+        file_hashes: optional {source_path: content hash}, to avoid re-hashing.
+        Returns the number of analyses written.
+        """
+        file_hashes = dict(file_hashes or {})
+        rows = []
+        for plot in plots:
+            source_path = getattr(plot, 'source_path', None)
+            if source_path is None:
+                continue
+            if source_path not in file_hashes:
+                file_hashes[source_path] = file_content_hash(source_path)
+            rows.append((file_hashes[source_path], source_path, plot))
+
+        conn = self._connect()
+        try:
+            with conn:
+                for file_hash, source_path, plot in rows:
+                    self._write_plot(conn, file_hash, source_path, plot, params or {})
+        finally:
+            conn.close()
+        return len(rows)
+
+    def _write_plot(self, conn, file_hash, source_path, plot, params):
+        method = getattr(plot, 'method_name', 'Unknown')
+        stored_params = _plain({k: v for k, v in params.items() if k not in IGNORED_PARAMS})
+        for name in PLOT_PARAMS:
+            if hasattr(plot, name):
+                stored_params[name] = _plain(getattr(plot, name))
+        params_json = json.dumps(stored_params, sort_keys=True)
+
+        conn.execute("INSERT INTO files (file_hash, path, name) VALUES (?, ?, ?) "
+                     "ON CONFLICT (file_hash) DO UPDATE SET path = excluded.path, name = excluded.name",
+                     (file_hash, os.path.abspath(source_path), os.path.basename(source_path)))
+        conn.execute("DELETE FROM analyses WHERE file_hash = ? AND method = ? AND params = ?",
+                     (file_hash, method, params_json))
+        analysis_id = conn.execute(
+            "INSERT INTO analyses (file_hash, method, params, label, created) VALUES (?, ?, ?, ?, ?)",
+            (file_hash, method, params_json, getattr(plot, 'filename', None), time.time())
+        ).lastrowid
+
+        # Powers in dB whatever the display scale, so stored values are comparable
+        peak_powers = np.asarray(plot.peak_powers, dtype=float)
+        if not getattr(plot, 'is_db_scale', True):
+            peak_powers = 10 * np.log10(np.maximum(peak_powers, 1e-15))
+        peak_widths = np.asarray(getattr(plot, 'peak_widths', []), dtype=float)
+        if len(peak_widths) != len(plot.peak_freqs):
+            peak_widths = np.full(len(plot.peak_freqs), np.nan)
+        conn.executemany(
+            "INSERT INTO peaks (analysis_id, frequency, power_db, width) VALUES (?, ?, ?, ?)",
+            [(analysis_id, float(f), float(p), None if np.isnan(w) else float(w))
+             for f, p, w in zip(plot.peak_freqs, peak_powers, peak_widths)]
+        )
+        conn.executemany(
+            "INSERT INTO pairs (analysis_id, f0, f1, ratio, color) VALUES (?, ?, ?, ?, ?)",
+            [(analysis_id,) + pair for pair in plot_pairs(plot)]
+        )
+
+    # ---------- reading ----------
+
+    def has_analysis(self, file_hash, method=None, params=None):
+        """
+        True if file_hash has been recorded (for method, if given).
+        params: only count analyses whose stored parameters include these values.
+        """
+        sql = "SELECT 1 FROM analyses WHERE file_hash = ?"
+        args = [file_hash]
+        if method is not None:
+            sql += " AND method = ?"
+            args.append(method)
+        for name, value in _plain(params or {}).items():
+            if isinstance(value, (list, dict)):
+                sql += " AND json_extract(params, ?) = json(?)"
+                args += [f'$."{name}"', json.dumps(value)]
+            else:
+                sql += " AND json_extract(params, ?) IS ?"
+                args += [f'$."{name}"', value]
+        return bool(self._query(sql + " LIMIT 1", args))
+
+    def find_pairs(self, ratio, ratio_tol=0.02, freq=None, freq_tol=100.0, method=None):
+        """
+        Pairs whose f1/f0 ratio is within ratio_tol of ratio and, if freq is given,
+        with either frequency within freq_tol Hz of it.
+        """
+        sql = ("SELECT f.name, f.path, a.method, a.label, p.f0, p.f1, p.ratio, p.color "
+               "FROM pairs p JOIN analyses a ON a.id = p.analysis_id "
+               "JOIN files f ON f.file_hash = a.file_hash "
+               "WHERE p.ratio BETWEEN ? AND ?")
+        args = [ratio - ratio_tol, ratio + ratio_tol]
+        if freq is not None:
+            sql += " AND (p.f0 BETWEEN ? AND ? OR p.f1 BETWEEN ? AND ?)"
+            args += [freq - freq_tol, freq + freq_tol] * 2
+        if method is not None:
+            sql += " AND a.method = ?"
+            args.append(method)
+        return self._query(sql + " ORDER BY f.name, a.method, p.f0", args)
+
+    def find_peaks(self, fmin, fmax, method=None, min_power_db=None):
+        """Detected peaks with fmin <= frequency <= fmax, strongest first."""
+        sql = ("SELECT f.name, f.path, a.method, a.label, k.frequency, k.power_db, k.width "
+               "FROM peaks k JOIN analyses a ON a.id = k.analysis_id "
+               "JOIN files f ON f.file_hash = a.file_hash "
+               "WHERE k.frequency BETWEEN ? AND ?")
+        args = [fmin, fmax]
+        if method is not None:
+            sql += " AND a.method = ?"
+            args.append(method)
+        if min_power_db is not None:
+            sql += " AND k.power_db >= ?"
+            args.append(min_power_db)
+        return self._query(sql + " ORDER BY k.power_db DESC", args)
+
+    def analyses(self, file_hash=None):
+        """Recorded analyses (newest first), with parameters decoded."""
+        sql = ("SELECT a.id, f.name, f.path, a.file_hash, a.method, a.label, a.params, a.created "
+               "FROM analyses a JOIN files f ON f.file_hash = a.file_hash")
+        args = []
+        if file_hash is not None:
+            sql += " WHERE a.file_hash = ?"
+            args.append(file_hash)
+        rows = self._query(sql + " ORDER BY a.created DESC", args)
+        for row in rows:
+            row['params'] = json.loads(row['params'])
+        return rows
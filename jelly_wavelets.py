@@ -0,0 +1,139 @@
+# jelly_wavelets.py
+
+# Array-level wavelet engines for the wavelet PSD methods.
+# A wavelet packet level is one 2-D array (nodes x coefficients): every node of
+# a level has the same length, so a single pywt.dwt call along the last axis
+# splits all of them at once, and only the current level is kept in memory.
+# Leading axes are carried along, so equal-length signals decompose as a batch.
+# The stationary (undecimated) transform keeps every level at full length, so it
+# is run one level at a time, keeping only each level's energy; long recordings
+# are fed through StreamingSWTEnergy in blocks.
+
+import numpy as np
+
+
+def natural_to_frequency_order(level):
+    """Natural-order node index of each frequency-ordered band (the Gray code of the band index)."""
+    bands = np.arange(2**level)
+    return bands ^ (bands >> 1)
+
+
+# Rows at least this long go through pywt.dwt one at a time: its 1-D path is about twice
+# as fast as the N-D axis path, and the per-call overhead no longer matters
+ROW_LOOP_MIN_LENGTH = 4096
+
+
+def wavelet_packet_level(signals, wavelet='sym8', level=8, mode='symmetric'):
+    """
+    Coefficients of every wavelet packet node at level, shape (..., 2**level, n_coeffs),
+    nodes in natural order - the same arrays pywt.WaveletPacket(...).get_level(level, 'natural')
+    holds, without building the node tree.
+    signals: 1-D signal or (..., n_samples) array of equal-length signals.
+    """
+    import pywt
+
+    nodes = np.asarray(signals)[..., np.newaxis, :]
+    for _ in range(level):
+        if nodes.shape[-1] >= ROW_LOOP_MIN_LENGTH:
+            rows = nodes.reshape(-1, nodes.shape[-1])
+            children = None
+            for i, row in enumerate(rows):
+                approx, detail = pywt.dwt(row, wavelet, mode=mode)
+                if children is None:
+                    children = np.empty((len(rows), 2, len(approx)), dtype=approx.dtype)
+                children[i, 0] = approx
+                children[i, 1] = detail
+        else:
+            children = np.stack(pywt.dwt(nodes, wavelet, mode=mode, axis=-1), axis=-2)
+        # Children of node i are 2i (approximation) and 2i + 1 (detail)
+        nodes = children.reshape(nodes.shape[:-2] + (-1, children.shape[-1]))
+    return nodes
+
+
+def wavelet_packet_band_energies(signals, wavelet='sym8', level=8, mode='symmetric', order='freq'):
+    """
+    Sum of squared coefficients of each terminal wavelet packet band.
+    Returns (energies, n_coeffs): energies has shape (..., 2**level), bands in frequency
+    order (lowest band first) or, with order='natural', in pywt's natural order;
+    n_coeffs is the number of coefficients in each band (divide by it for mean power).
+    """
+    nodes = wavelet_packet_level(signals, wavelet, level, mode)
+    energies = np.sum(np.square(nodes), axis=-1)
+    if order == 'freq':
+        energies = energies[..., natural_to_frequency_order(level)]
+    elif order != 'natural':
+        raise ValueError(f"order must be 'freq' or 'natural', not {order!r}")
+    return energies, nodes.shape[-1]
+
+
+def stationary_wavelet_energies(signal, wavelet='sym8', level=6, start=0, stop=None):
+    """
+    Sum of squared stationary wavelet coefficients of each level, one level at a time:
+    the same coefficients as pywt.swt(signal, wavelet, level), but only the current
+    approximation and detail are held, so memory stays O(len(signal)) at any level.
+    len(signal) must be a multiple of 2**level.
+    Returns (detail_energies, approx_energies): entry j is for the detail and the
+    approximation of level j + 1 (finest first). Only coefficients [start:stop] are counted.
+    """
+    import pywt
+
+    approx = np.asarray(signal)
+    detail_energies = np.zeros(level)
+    approx_energies = np.zeros(level)
+    for j in range(level):
+        ((approx, detail),) = pywt.swt(approx, wavelet, level=1, start_level=j)
+        detail_energies[j] = np.sum(np.square(detail[start:stop]), dtype=np.float64)
+        approx_energies[j] = np.sum(np.square(approx[start:stop]), dtype=np.float64)
+    return detail_energies, approx_energies
+
+
+class StreamingSWTEnergy:
+    """
+    stationary_wavelet_energies of a signal fed in consecutive blocks.
+    Each block is transformed with `margin` neighbouring samples on both sides, enough
+    to cover the support of the level-`level` filters, and only its central coefficients
+    are counted - so they equal those of the whole signal transformed at once.
+    The signal is zero-extended at both ends rather than wrapped around as pywt.swt does,
+    which only changes coefficients within one filter support of the ends.
+    """
+
+    def __init__(self, wavelet='sym8', level=6):
+        import pywt
+        self.wavelet = wavelet
+        self.level = level
+        self.step = 2**level
+        span = (pywt.Wavelet(wavelet).dec_len - 1) * (self.step - 1)
+        # Whole steps, so every transformed block length is a multiple of 2**level
+        self.margin = -(-span // self.step) * self.step
+        self.detail_energies = np.zeros(level)
+        self.approx_energies = np.zeros(level)
+        self.n_samples = 0
+        self._buffer = np.zeros(self.margin, dtype=np.float32)
+
+    def _accumulate(self, block, n_center):
+        detail_energies, approx_energies = stationary_wavelet_energies(
+            block, self.wavelet, self.level, start=self.margin, stop=self.margin + n_center)
+        self.detail_energies += detail_energies
+        self.approx_energies += approx_energies
+        self.n_samples += n_center
+
+    def push(self, samples):
+        buffer = np.concatenate([self._buffer, samples])
+        n_center = (len(buffer) - 2 * self.margin) // self.step * self.step
+        if n_center <= 0:
+            self._buffer = buffer
+            return
+        self._accumulate(buffer[:n_center + 2 * self.margin], n_center)
+        # The next block's left margin is the end of this block's centre
+        self._buffer = buffer[n_center:]
+
+    def finish(self):
+        """Count the remaining samples (zero-extended) and return
+        (detail_energies, approx_energies, n_samples)."""
+        n_center = len(self._buffer) - self.margin
+        if n_center > 0:
+            padded_center = -(-n_center // self.step) * self.step
+            block = np.pad(self._buffer, (0, padded_center + self.margin - n_center))
+            self._accumulate(block, n_center)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return self.detail_energies, self.approx_energies, self.n_samples
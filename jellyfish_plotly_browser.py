@@ -5,62 +5,38 @@
 # Combines multiple spectral analysis methods with interactive visualization
 # Uses jellyfush_dynamite html as the format for the browser-based plotting
 
-from jellyfish_dynamite import save_jellyfish_template
-
-from jinja2 import Template
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+# Import stays cheap and side-effect free: heavy dependencies (scipy.signal, matplotlib,
+# plotly, pywt, networkx, jinja2) are imported inside the functions that use them, and
+# directory discovery / daily directory creation only happens in main() or on save.
+# librosa loads its submodules lazily on first use.
 
 import numpy as np
 import os
 from natsort import natsorted
-from scipy.signal import find_peaks
 
 import json
+import base64
 import librosa
 from pathlib import Path
 import warnings
-import pywt
-import scipy.signal
-from scipy.interpolate import interp1d
-from scipy.signal import savgol_filter
-import networkx as nx
 import time
 from datetime import datetime
+from collections import OrderedDict
+import threading
 import webbrowser
 
-from bokeh.plotting import figure
-from bokeh.layouts import gridplot
-from bokeh.models import ColumnDataSource, HoverTool, TapTool, CustomJS
-from bokeh.io import output_file, save, show
-from bokeh.embed import file_html
-from bokeh.resources import CDN
-import json
-
-import importlib
 import sys
 
 #import all_functions_psd_rebuilt as alllpsd
 #importlib.reload(alllpsd)
 
 import jelly_funcs as jelfun
-importlib.reload(jelfun)
-
-# 2453 [58] has fewest number of chirps. 70 directories total. 
-slicedir = Path('tranche/slices')
-all_slicedirs=jelfun.get_subdir_pathlist(slicedir) 
-
-mkdd = jelfun.make_daily_directory
-daily_dir = mkdd()
-daily_dir
-
-thisfile='jellyfish_super_scratch'
-parent_dir=os.path.join(daily_dir, thisfile)
-os.makedirs(parent_dir, exist_ok=True)
-parent_dir
-
-slicedir = Path('tranche/slices')
-all_slicedirs=jelfun.get_subdir_pathlist(slicedir) # 58: 2453 has fewest number of chirps. 70 directories total. 
+from jelly_cache import file_content_hash
+from jelly_cqt import cqt_plan
+from jelly_metrics import StageMetrics, measure
+from jelly_peaks import detect_psd_peaks, detect_peaks_grid, find_max_energy_ridge, find_spectral_veins
+from jelly_spectrograms import SpectrogramStore
+from jelly_wavelets import StreamingSWTEnergy, stationary_wavelet_energies, wavelet_packet_band_energies
 
 warnings.filterwarnings("ignore", message="n_fft=.* is too large for input signal of length=.*")
 
@@ -106,11 +82,17 @@ def setup_matplotlib_backend():
             print(f"⚠️  Backend selection failed: {e}, falling back to Agg")
             matplotlib.use('Agg')
 
-# Call before importing pyplot
-setup_matplotlib_backend()
-import matplotlib.pyplot as plt
-import matplotlib
-from matplotlib.widgets import Button
+_pyplot = None
+
+def get_pyplot():
+    """matplotlib.pyplot, selecting the backend on first use (see setup_matplotlib_backend)."""
+    global _pyplot
+    if _pyplot is None:
+        # Backend must be chosen before pyplot is imported
+        setup_matplotlib_backend()
+        import matplotlib.pyplot as plt
+        _pyplot = plt
+    return _pyplot
 
 
 
@@ -120,24 +102,46 @@ from matplotlib.widgets import Button
 
 def cqt_based_psd(audio_path, bins_per_octave=36, n_bins=144, fmin=20.0, fmax=None, hop_length=512, n_fft=2048):
     """Calculate PSD using Constant-Q Transform."""
-    y, sr = librosa.load(audio_path, sr=None)
-    
-    if fmax is None:
-        fmax = sr / 2
+    y, sr = jelfun.load_audio(audio_path)
+    return cqt_based_psd_from_array(y, sr, bins_per_octave=bins_per_octave, n_bins=n_bins, fmin=fmin, fmax=fmax, hop_length=hop_length, n_fft=n_fft)
+
+def cqt_based_psd_from_array(y, sr, bins_per_octave=36, n_bins=144, fmin=20.0, fmax=None, hop_length=512, n_fft=2048):
+    """Constant-Q PSD from an already decoded signal."""
+    return cqt_based_psd_from_arrays([(y, sr)], bins_per_octave=bins_per_octave, n_bins=n_bins, fmin=fmin,
+                                     fmax=fmax, hop_length=hop_length, n_fft=n_fft)[0]
+
+def cqt_based_psd_from_arrays(audios, bins_per_octave=36, n_bins=144, fmin=20.0, fmax=None, hop_length=512, n_fft=2048):
+    """
+    Constant-Q PSD of several decoded (y, sr) signals, one result per signal.
+    Signals sharing a sample rate share one cached jelly_cqt plan, so librosa.cqt's
+    filter bases are built once per process instead of once per file; results are
+    identical to librosa.cqt for every signal length.
+    """
     if hop_length is None:
         hop_length = n_fft // 8
-    
-    C = librosa.cqt(y, sr=sr, fmin=fmin, n_bins=n_bins, 
-                    bins_per_octave=bins_per_octave, hop_length=hop_length)
-    power_spectrum = np.abs(C)**2
-    psd_mean = np.mean(power_spectrum, axis=1)
     frequencies = librosa.cqt_frequencies(n_bins=n_bins, fmin=fmin, bins_per_octave=bins_per_octave)
     
-    return frequencies, psd_mean
+    results = [None] * len(audios)
+    groups = {}
+    for i, (y, sr) in enumerate(audios):
+        groups.setdefault((sr, np.asarray(y).dtype), []).append(i)
+    for (sr, dtype), indices in groups.items():
+        plan = cqt_plan(sr, fmin, n_bins, bins_per_octave, hop_length, dtype)
+        psd_means = plan.mean_power([audios[i][0] for i in indices])
+        for i, psd_mean in zip(indices, psd_means):
+            results[i] = (frequencies.copy(), psd_mean)
+    return results
 
 def multi_resolution_psd(audio_path, fft_sizes=[512, 1024, 2048, 4096], n_fft=None, hop_length=None):
     """Calculate PSD using multiple FFT window sizes."""
-    y, sr = librosa.load(audio_path, sr=None)
+    y, sr = jelfun.load_audio(audio_path)
+    return multi_resolution_psd_from_array(y, sr, fft_sizes=fft_sizes, n_fft=n_fft, hop_length=hop_length)
+
+def multi_resolution_psd_from_array(y, sr, fft_sizes=[512, 1024, 2048, 4096], n_fft=None, hop_length=None,
+                                    stft_plan=None):
+    """Multi-resolution PSD from an already decoded signal; stft_plan: optional jelfun.STFTPlan for y."""
+    from scipy.interpolate import interp1d
+
     fft_sizes = sorted(fft_sizes)
     
     if n_fft is None:
@@ -155,8 +159,7 @@ def multi_resolution_psd(audio_path, fft_sizes=[512, 1024, 2048, 4096], n_fft=No
     for i, curr_n_fft in enumerate(fft_sizes):
         curr_hop_length = hop_length if hop_length else curr_n_fft // 4
         
-        stft_result = librosa.stft(y, n_fft=curr_n_fft, hop_length=curr_hop_length)
-        power_spectrum = np.abs(stft_result)**2
+        power_spectrum = jelfun.power_spectrogram(y, curr_n_fft, curr_hop_length, stft_plan)
         curr_psd = np.mean(power_spectrum, axis=1)
         curr_freqs = librosa.fft_frequencies(sr=sr, n_fft=curr_n_fft)
         
@@ -178,52 +181,122 @@ def multi_resolution_psd(audio_path, fft_sizes=[512, 1024, 2048, 4096], n_fft=No
     
     return out_frequencies, out_psd
 
-def chirplet_transform(audio_path, n_chirps=100, min_freq=20, max_freq=5000, n_fft=None):
-    """Simplified chirplet transform for adaptive time-frequency analysis."""
+# Total size of the chirp banks kept between files, per process (least recently used are dropped);
+# a bank larger than this is never cached and is rebuilt block by block instead
+CHIRPLET_BANK_CACHE_BYTES = 64 * 1024 * 1024
+
+_chirplet_banks = OrderedDict()  # (n_samples, sr, n_chirps, min_freq, max_freq) -> chirplet_bank result
+_chirplet_banks_lock = threading.Lock()
+
+def _chirplet_bank_spectra(n_samples, sr, frequencies, n_fft):
+    """Conjugate rFFTs of the Hann-windowed log chirps centred on `frequencies`."""
     from scipy import signal
+    from scipy import fft as sp_fft
     
-    y, sr = librosa.load(audio_path, sr=None)
+    t = np.arange(0, n_samples/sr, 1/sr)
+    window = signal.windows.hann(len(t))
+    bank = np.empty((len(frequencies), len(t)))
+    for i, freq in enumerate(frequencies):
+        bank[i] = signal.chirp(t, f0=freq*0.8, f1=freq*1.2, t1=n_samples/sr, method='logarithmic')
+        bank[i] *= window
+    return np.conj(sp_fft.rfft(bank, n_fft, axis=-1))
+
+def _chirplet_layout(n_samples, sr, n_chirps, min_freq, max_freq):
+    """Centre frequencies, chirp length and (fast) FFT size for a chirp bank."""
+    from scipy import fft as sp_fft
     
     frequencies = np.logspace(np.log10(min_freq), np.log10(max_freq), n_chirps)
-    chirp_energies = np.zeros(n_chirps)
+    chirp_length = len(np.arange(0, n_samples/sr, 1/sr))
+    n_fft = sp_fft.next_fast_len(n_samples + chirp_length - 1, real=True)
+    return frequencies, chirp_length, n_fft
+
+def chirplet_bank(n_samples, sr, n_chirps=100, min_freq=20, max_freq=5000):
+    """
+    Cached chirp bank for one (length, sr, n_chirps, fmin, fmax): (frequencies, conj spectra, chirp_length, n_fft).
+    Every chirp spans the whole signal, so the bank depends on the exact length; banks of all
+    lengths share one least-recently-used budget of CHIRPLET_BANK_CACHE_BYTES.
+    """
+    key = (n_samples, sr, n_chirps, min_freq, max_freq)
+    with _chirplet_banks_lock:
+        if key in _chirplet_banks:
+            _chirplet_banks.move_to_end(key)
+            return _chirplet_banks[key]
+    
+    frequencies, chirp_length, n_fft = _chirplet_layout(n_samples, sr, n_chirps, min_freq, max_freq)
+    spectra = _chirplet_bank_spectra(n_samples, sr, frequencies, n_fft)
+    spectra.setflags(write=False)
+    bank = (frequencies, spectra, chirp_length, n_fft)
+    
+    with _chirplet_banks_lock:
+        _chirplet_banks[key] = bank
+        _chirplet_banks.move_to_end(key)
+        cached_bytes = sum(cached[1].nbytes for cached in _chirplet_banks.values())
+        while cached_bytes > CHIRPLET_BANK_CACHE_BYTES and _chirplet_banks:
+            _, evicted = _chirplet_banks.popitem(last=False)
+            cached_bytes -= evicted[1].nbytes
+    return bank
+
+def chirplet_energies(y, sr, n_chirps=100, min_freq=20, max_freq=5000, block_size=16):
+    """
+    Peak |correlate(y, chirp, mode='same')|^2 for every chirp in the bank.
+    The signal is transformed once; correlations are a batched multiply and inverse rFFT
+    over `block_size` chirps at a time, so working memory is block_size x n_fft.
+    """
+    from scipy import fft as sp_fft
     
-    for i, freq in enumerate(frequencies):
-        t = np.arange(0, len(y)/sr, 1/sr)
-        chirp = signal.chirp(t, f0=freq*0.8, f1=freq*1.2, t1=len(y)/sr, method='logarithmic')
-        window = signal.windows.hann(len(chirp))
-        chirp *= window
-        correlation = signal.correlate(y, chirp, mode='same')
-        chirp_energies[i] = np.max(np.abs(correlation)**2)
+    n_samples = len(y)
+    frequencies, chirp_length, n_fft = _chirplet_layout(n_samples, sr, n_chirps, min_freq, max_freq)
+    bank_bytes = n_chirps * (n_fft // 2 + 1) * np.dtype(np.complex128).itemsize
+    if bank_bytes <= CHIRPLET_BANK_CACHE_BYTES:
+        frequencies, bank, chirp_length, n_fft = chirplet_bank(n_samples, sr, n_chirps, min_freq, max_freq)
+    else:
+        bank = None
+    
+    signal_fft = sp_fft.rfft(np.asarray(y, dtype=np.float64), n_fft)
+    
+    # Circular-correlation lags that make up the centred 'same' output
+    same_lags = (np.arange(n_samples) + (chirp_length - 1) // 2 - (chirp_length - 1)) % n_fft
+    
+    chirp_energies = np.zeros(n_chirps)
+    for start in range(0, n_chirps, block_size):
+        stop = min(start + block_size, n_chirps)
+        if bank is not None:
+            block = bank[start:stop]
+        else:
+            block = _chirplet_bank_spectra(n_samples, sr, frequencies[start:stop], n_fft)
+        correlation = sp_fft.irfft(signal_fft * block, n_fft, axis=-1)[:, same_lags]
+        chirp_energies[start:stop] = np.max(correlation**2, axis=1)
     
     return frequencies, chirp_energies
 
+def chirplet_transform(audio_path, n_chirps=100, min_freq=20, max_freq=5000, n_fft=None):
+    """Simplified chirplet transform for adaptive time-frequency analysis."""
+    y, sr = jelfun.load_audio(audio_path)
+    return chirplet_transform_from_array(y, sr, n_chirps=n_chirps, min_freq=min_freq, max_freq=max_freq, n_fft=n_fft)
+
+def chirplet_transform_from_array(y, sr, n_chirps=100, min_freq=20, max_freq=5000, n_fft=None):
+    """Chirplet transform from an already decoded signal."""
+    return chirplet_energies(y, sr, n_chirps=n_chirps, min_freq=min_freq, max_freq=max_freq)
+
 def chirplet_transform_zero_padding(audio_path, n_chirps=100, min_freq=20, max_freq=5000, n_fft=2048):
     """Simplified chirplet transform with zero-padding."""
-    from scipy import signal
-    
-    y, sr = librosa.load(audio_path, sr=None)
-    
+    y, sr = jelfun.load_audio(audio_path)
+    return chirplet_transform_zero_padding_from_array(y, sr, n_chirps=n_chirps, min_freq=min_freq, max_freq=max_freq, n_fft=n_fft)
+
+def chirplet_transform_zero_padding_from_array(y, sr, n_chirps=100, min_freq=20, max_freq=5000, n_fft=2048):
+    """Zero-padded chirplet transform from an already decoded signal."""
     if len(y) < n_fft:
         y = np.pad(y, (0, n_fft - len(y)), 'constant')
     
-    frequencies = np.logspace(np.log10(min_freq), np.log10(max_freq), n_chirps)
-    chirp_energies = np.zeros(n_chirps)
-    
-    for i, freq in enumerate(frequencies):
-        t = np.arange(0, len(y)/sr, 1/sr)
-        chirp = signal.chirp(t, f0=freq*0.8, f1=freq*1.2, t1=len(y)/sr, method='logarithmic')
-        window = signal.windows.hann(len(chirp))
-        chirp *= window
-        correlation = signal.correlate(y, chirp, mode='same')
-        chirp_energies[i] = np.max(np.abs(correlation)**2)
-    
-    return frequencies, chirp_energies
+    return chirplet_energies(y, sr, n_chirps=n_chirps, min_freq=min_freq, max_freq=max_freq)
 
 def wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_length=None, n_fft=2048):
     """Calculate PSD using Wavelet Packet Decomposition."""
-    import pywt
-    
-    y, sr = librosa.load(audio_path, sr=None)
+    y, sr = jelfun.load_audio(audio_path)
+    return wavelet_packet_psd_from_array(y, sr, wavelet=wavelet, max_level=max_level, hop_length=hop_length, n_fft=n_fft)
+
+def wavelet_packet_psd_from_array(y, sr, wavelet='sym8', max_level=8, hop_length=None, n_fft=2048):
+    """Wavelet packet PSD from an already decoded signal."""
     print(f"Original Wavelet - Signal length: {len(y)}, Sample rate: {sr}")
     
     # Calculate padded length for better frequency resolution
@@ -245,11 +318,9 @@ def wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_length=None,
     if len(y) < segment_size:
         y = np.pad(y, (0, segment_size - len(y)), 'constant')
     
-    # Remove the try-except that was silently failing
-    wp = pywt.WaveletPacket(data=y, wavelet=wavelet, mode='symmetric', maxlevel=max_level)
-    nodes = [node for node in wp.get_level(max_level, 'natural')]
-    powers = [np.mean(np.abs(node.data)**2) for node in nodes]
-    powers = [max(p, 1e-10) for p in powers]
+    # Mean power per terminal band, straight from the filter bank, lowest band first
+    energies, n_coeffs = wavelet_packet_band_energies(y, wavelet, max_level, mode='symmetric')
+    powers = np.maximum(energies.astype(np.float64) / n_coeffs, 1e-10)
     
     # Define correction factors to fix frequency shift issue
     correction_factors = {
@@ -260,28 +331,28 @@ def wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_length=None,
     }
     correction = correction_factors.get(wavelet, 1.0)
     
-    freqs = []
     nyquist = sr / 2
     bands = 2**max_level
-    for i in range(bands):
-        low = i * nyquist / bands * correction
-        high = (i + 1) * nyquist / bands * correction
-        center = (low + high) / 2
-        freqs.append(center)
-    
-    if sum(powers) > 0:
-        powers = [p / sum(powers) for p in powers]
+    band_index = np.arange(bands)
+    low = band_index * nyquist / bands * correction
+    high = (band_index + 1) * nyquist / bands * correction
+    freqs = (low + high) / 2
+    
+    if np.sum(powers) > 0:
+        powers = powers / np.sum(powers)
     else:
-        raise ValueError(f"All wavelet powers are zero for file {audio_path}. This indicates a problem with the input signal or wavelet decomposition.")
+        raise ValueError("All wavelet powers are zero for the input signal. This indicates a problem with the input signal or wavelet decomposition.")
         
-    print(f"Original Wavelet - Success. PSD range: {min(powers):.2e} to {max(powers):.2e}")
-    return np.array(freqs), np.array(powers)
+    print(f"Original Wavelet - Success. PSD range: {np.min(powers):.2e} to {np.max(powers):.2e}")
+    return freqs, powers
 
 def improved_wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_length=None, n_fft=2048):
     """Improved version of wavelet packet PSD with better frequency resolution."""
-    import pywt
-    
-    y, sr = librosa.load(audio_path, sr=None)
+    y, sr = jelfun.load_audio(audio_path)
+    return improved_wavelet_packet_psd_from_array(y, sr, wavelet=wavelet, max_level=max_level, hop_length=hop_length, n_fft=n_fft)
+
+def improved_wavelet_packet_psd_from_array(y, sr, wavelet='sym8', max_level=8, hop_length=None, n_fft=2048):
+    """Improved wavelet packet PSD from an already decoded signal."""
     print(f"Improved Wavelet - Signal length: {len(y)}, Sample rate: {sr}")
     
     pow2_length = 2**int(np.ceil(np.log2(len(y))))
@@ -296,26 +367,19 @@ def improved_wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_len
     out_freqs = np.linspace(20, sr/2, n_fft//2)
     out_psd = np.zeros_like(out_freqs)
     
-    wp = pywt.WaveletPacket(data=y, wavelet=wavelet, mode='symmetric', maxlevel=max_level)
-    nodes = [node for node in wp.get_level(max_level, 'natural')]
+    # Energy per terminal band, straight from the filter bank, lowest band first
+    energies, _ = wavelet_packet_band_energies(y, wavelet, max_level, mode='symmetric')
+    energies = np.maximum(energies.astype(np.float64), 1e-20)
     
-    if not nodes:
-        raise ValueError(f"No nodes found in wavelet packet decomposition for file {audio_path}. Check input signal and parameters.")
-    
-    energies = []
-    for node in nodes:
-        energy = np.sum(np.abs(node.data)**2)
-        energies.append(max(energy, 1e-20))
-    
-    total_energy = sum(energies)
+    total_energy = np.sum(energies)
     if total_energy == 0:
-        raise ValueError(f"Total energy is zero for file {audio_path}. This indicates a problem with the input signal.")
+        raise ValueError("Total energy is zero for the input signal. This indicates a problem with the input signal.")
     
     # Calculate actual frequency bands without any "correction"
     bands = 2**max_level
     band_width = sr / (2 * bands)
-    band_centers = np.array([(i * band_width + band_width/2) for i in range(bands)])
-    powers = np.array(energies) / total_energy
+    band_centers = np.arange(bands) * band_width + band_width/2
+    powers = energies / total_energy
     
     from scipy import interpolate
     if len(band_centers) > 1:
@@ -341,36 +405,83 @@ def improved_wavelet_packet_psd(audio_path, wavelet='sym8', max_level=8, hop_len
 
 def stationary_wavelet_psd(audio_path, wavelet='sym8', max_level=6, n_fft=2048):
     """Calculate PSD using Stationary Wavelet Transform (shift-invariant)."""
-    import pywt
+    y, sr = jelfun.load_audio(audio_path)
+    return stationary_wavelet_psd_from_array(y, sr, wavelet=wavelet, max_level=max_level, n_fft=n_fft)
+
+def stationary_wavelet_level(n_samples, max_level, n_fft):
+    """max_level capped for a signal of n_samples (zero-padded to a power of two) and n_fft."""
+    padded_length = int(2**np.ceil(np.log2(n_samples)))
+    optimal_level = min(int(np.log2(n_fft)), int(np.log2(padded_length)) - 3)
+    
+    if max_level > optimal_level:
+        print(f"WARNING: Adjusting max_level from {max_level} to {optimal_level}")
+        max_level = max(1, optimal_level)
     
-    y, sr = librosa.load(audio_path, sr=None)
+    # Check if level is too high for the signal length
+    if max_level >= int(np.log2(padded_length)):
+        raise ValueError(f"max_level {max_level} is too high for signal length {padded_length}. "
+                        f"Maximum possible level is {int(np.log2(padded_length)) - 1}")
+    return max_level
+
+def stationary_wavelet_psd_from_array(y, sr, wavelet='sym8', max_level=6, n_fft=2048):
+    """Stationary wavelet PSD from an already decoded signal."""
     print(f"Stationary Wavelet - Signal length: {len(y)}, Sample rate: {sr}")
     
     target_length = int(2**np.ceil(np.log2(len(y))))
     y_padded = np.pad(y, (0, target_length - len(y)), 'constant')
+    max_level = stationary_wavelet_level(len(y), max_level, n_fft)
     
-    optimal_level = min(int(np.log2(n_fft)), int(np.log2(len(y_padded))) - 3)
-    
-    if max_level > optimal_level:
-        print(f"WARNING: Adjusting max_level from {max_level} to {optimal_level}")
-        max_level = max(1, optimal_level)
-    
+    # One level at a time: only the per-level energies are kept, not 2 * max_level full-length arrays
+    detail_energies, approx_energies = stationary_wavelet_energies(y_padded, wavelet, max_level)
+    return stationary_wavelet_psd_from_energies(detail_energies, approx_energies, len(y_padded), sr, n_fft)
+
+def stationary_wavelet_psd_streaming(audio_path, wavelet='sym8', max_level=6, n_fft=2048,
+                                     block_size=262144, verbose=False):
+    """
+    Block-wise stationary wavelet PSD for long recordings: blocks of block_size samples
+    go through jelly_wavelets.StreamingSWTEnergy, so peak memory follows block_size
+    rather than file length. Same result as the in-memory path apart from the
+    recording's edges (zero-extended instead of wrapped around).
+    """
+    import soundfile as sf
+
+    try:
+        sound_file = sf.SoundFile(str(audio_path))
+    except Exception as e:
+        if verbose:
+            print(f"Streaming unavailable for {audio_path} ({e}), loading into memory")
+        return stationary_wavelet_psd(audio_path, wavelet=wavelet, max_level=max_level, n_fft=n_fft)
+
+    with sound_file:
+        sr = sound_file.samplerate
+        if sound_file.frames == 0:
+            raise ValueError(f"Audio file is empty: {audio_path}")
+        print(f"Stationary Wavelet - Streaming {sound_file.frames} samples, Sample rate: {sr}")
+        max_level = stationary_wavelet_level(sound_file.frames, max_level, n_fft)
+
+        accumulator = StreamingSWTEnergy(wavelet, max_level)
+        # Same samples as librosa.load(sr=None): float32, channels averaged to mono
+        for block in sound_file.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            accumulator.push(block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0])
+        detail_energies, approx_energies, n_samples = accumulator.finish()
+
+    return stationary_wavelet_psd_from_energies(detail_energies, approx_energies, n_samples, sr, n_fft)
+
+def stationary_wavelet_psd_from_energies(detail_energies, approx_energies, n_coeffs, sr, n_fft=2048):
+    """
+    PSD curve from stationary wavelet level energies (finest level first, as
+    jelly_wavelets.stationary_wavelet_energies returns them): mean power per level at
+    each band's center frequency, normalized, interpolated onto n_fft // 2 bins and smoothed.
+    """
+    max_level = len(detail_energies)
     out_freqs = np.linspace(20, sr/2, n_fft//2)
     out_psd = np.zeros_like(out_freqs)
     
-    # Check if level is too high for the signal length
-    if max_level >= int(np.log2(len(y_padded))):
-        raise ValueError(f"max_level {max_level} is too high for signal length {len(y_padded)}. "
-                        f"Maximum possible level is {int(np.log2(len(y_padded))) - 1}")
-    
-    coeffs = pywt.swt(y_padded, wavelet, level=max_level)
-    
     level_powers = []
     level_freqs = []
     
-    for i, (cA, cD) in enumerate(coeffs):
-        level = max_level - i
-        power = np.mean(np.abs(cD)**2)
+    for level in range(max_level, 0, -1):
+        power = detail_energies[level - 1] / n_coeffs
         
         # Calculate actual frequency bands without any "correction"
         band_width = sr / (2**(level+1))
@@ -381,7 +492,8 @@ def stationary_wavelet_psd(audio_path, wavelet='sym8', max_level=6, n_fft=2048):
         level_powers.append(power)
         level_freqs.append(center_freq)
     
-    power = np.mean(np.abs(coeffs[-1][0])**2)
+    # Approximation band, from the level-1 approximation (coeffs[-1][0] of pywt.swt)
+    power = approx_energies[0] / n_coeffs
     center_freq = sr / (2**(max_level+1)) / 2
     level_powers.append(power)
     level_freqs.append(center_freq)
@@ -390,7 +502,7 @@ def stationary_wavelet_psd(audio_path, wavelet='sym8', max_level=6, n_fft=2048):
     if total_power > 0:
         level_powers = [p / total_power for p in level_powers]
     else:
-        raise ValueError(f"Total power is zero for file {audio_path} using stationary wavelet transform. Check input signal.")
+        raise ValueError("Total power is zero for the input signal using stationary wavelet transform. Check input signal.")
     
     for i, (freq, power) in enumerate(zip(level_freqs, level_powers)):
         idx = np.abs(out_freqs - freq).argmin()
@@ -423,15 +535,9 @@ def stationary_wavelet_psd(audio_path, wavelet='sym8', max_level=6, n_fft=2048):
 
 # ==================== SPECTRAL RIDGE DETECTION ====================
 
-def find_max_energy_ridge(spectrogram, frequencies, times):
-    """Find the frequency of maximum energy at each time slice."""
-    spec_db = 10 * np.log10(np.maximum(spectrogram, 1e-10))
-    max_freq_indices = np.argmax(spec_db, axis=0)
-    ridge_freqs = frequencies[max_freq_indices]
-    return times, ridge_freqs
-
 def plot_spectrogram_with_ridge(frequencies, times, spectrogram, show_ridge=True):
     """Plot spectrogram with optional energy ridge overlay."""
+    plt = get_pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
     
     # Plot spectrogram
@@ -454,59 +560,9 @@ def plot_spectrogram_with_ridge(frequencies, times, spectrogram, show_ridge=True
     return fig, ax
 
 
-def find_spectral_veins(spectrogram, frequencies, times, num_veins=6, freq_window=50):
-    """Find veins by tracking bright regions in specific frequency bands."""
-    spec_db = 10 * np.log10(np.maximum(spectrogram, 1e-10))
-    
-    # Find strongest frequency regions across all time
-    overall_energy = np.mean(spec_db, axis=1)
-    
-    # Find peak frequency regions
-    from scipy.signal import find_peaks
-    peak_indices, _ = find_peaks(overall_energy, prominence=np.std(overall_energy)*0.3)
-    
-    # Sort by strength and take top num_veins
-    if len(peak_indices) > 0:
-        peak_strengths = overall_energy[peak_indices]
-        top_peak_indices = peak_indices[np.argsort(peak_strengths)[-num_veins:]][::-1]
-    else:
-        # Fallback: just use strongest frequencies
-        top_peak_indices = np.argsort(overall_energy)[-num_veins:][::-1]
-    
-    veins = []
-    
-    for i, center_freq_idx in enumerate(top_peak_indices):
-        center_freq = frequencies[center_freq_idx]
-        
-        # Define frequency window around this peak
-        freq_range = slice(max(0, center_freq_idx - freq_window//2), 
-                          min(len(frequencies), center_freq_idx + freq_window//2))
-        
-        vein_times = []
-        vein_freqs = []
-        
-        # For each time slice, find max energy within this frequency window
-        for t_idx in range(spec_db.shape[1]):
-            window_slice = spec_db[freq_range, t_idx]
-            if len(window_slice) > 0:
-                local_max_idx = np.argmax(window_slice)
-                global_freq_idx = freq_range.start + local_max_idx
-                
-                vein_times.append(times[t_idx])
-                vein_freqs.append(frequencies[global_freq_idx])
-        
-        veins.append({
-            'times': np.array(vein_times),
-            'freqs': np.array(vein_freqs),
-            'center_freq': center_freq,
-            'rank': i + 1
-        })
-    
-    return veins
-
-
 def plot_spectrogram_with_veins(frequencies, times, spectrogram, show_max_ridge=True, show_multi_veins=True, num_veins=5):
     """Plot spectrogram with optional vein overlays."""
+    plt = get_pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
     
     # Plot spectrogram
@@ -526,7 +582,7 @@ def plot_spectrogram_with_veins(frequencies, times, spectrogram, show_max_ridge=
     
     # Add multiple spectral VEINS (DASHED COLORED LINES)
     if show_multi_veins:
-        veins = find_spectral_veins(spectrogram, frequencies, times, num_veins)  # CORRECT FUNCTION
+        veins = find_spectral_veins(spectrogram, frequencies, times, num_veins, spectrogram_db=spec_db)  # CORRECT FUNCTION
         vein_colors = ['coral', 'yellow', 'magenta', 'lime', 'orange', 'teal', 'green', 'plum', 'orchid']
             
         for i, vein in enumerate(veins[:len(vein_colors)]):
@@ -568,6 +624,113 @@ def plot_spectrogram_with_veins(frequencies, times, spectrogram, show_max_ridge=
 
 
 
+# ==================== HEADLESS RESULT CLASS ====================
+
+def store_spectrogram(spectrogram, spectrogram_store=None):
+    """Linear spectrogram floored at 1e-15: written to spectrogram_store (a jelly_spectrograms
+    SpectrogramStore) and returned as a read-only memmap, or kept in memory without one."""
+    if spectrogram_store is not None:
+        return spectrogram_store.put(spectrogram, floor=1e-15)
+    return np.maximum(spectrogram, 1e-15)
+
+
+def spectrogram_db_of(plot):
+    """
+    10 * log10 of plot.spectrogram_linear (None without a spectrogram), computed on first
+    access and kept: as another memmap while plot.spectrogram_store is open, in memory
+    without a store. Once the store is closed it is recomputed on each access instead.
+    """
+    if plot.spectrogram_linear is None or plot._spectrogram_db is not None:
+        return plot._spectrogram_db
+    spectrogram_db = 10 * np.log10(plot.spectrogram_linear)
+    store = plot.spectrogram_store
+    if store is None:
+        plot._spectrogram_db = spectrogram_db
+    elif not store.closed:
+        plot._spectrogram_db = spectrogram_db = store.put(spectrogram_db)
+    return spectrogram_db
+
+
+class PSDAnalysisResult:
+    """
+    Pure-data counterpart of EnhancedInteractiveHarmonicPlot for headless/web use:
+    same PSD, peak and spectrogram attributes, no matplotlib axes, widgets or redraws.
+    Accepted anywhere a plot is (prepare_plotly_template_vars, save_jellyfish_plotly).
+    """
+    def __init__(self, frequencies, psd, filename, max_peaks=40, 
+             max_pairs=10, is_db_scale=True, peak_fmin=None, peak_fmax=None, 
+             plot_fmin=None, plot_fmax=None, height_percentile=0.5, prominence_factor=0.04,
+             min_width=0.5, method_name="FFT_DUAL", 
+             times=None, spectrogram=None, show_max_energy_ridge=True, 
+             show_spectral_veins=True, num_veins=5, peaks=None, spectrogram_store=None):
+        
+        self.frequencies = frequencies
+        self.filename = filename
+        self.method_name = method_name
+        self.max_peaks = max_peaks
+        self.max_pairs = max_pairs
+        self.is_db_scale = is_db_scale
+        self.height_percentile = height_percentile
+        self.prominence_factor = prominence_factor
+        self.min_width = min_width
+        
+        # No interaction, so never any user selections
+        self.selected_peaks = []
+        self.pairs = []
+        
+        # Linear and dB versions of the PSD, as in the interactive plot
+        self.psd_linear = np.maximum(psd, 1e-15)
+        self.original_psd = self.psd_linear
+        self.psd_db = 10 * np.log10(self.psd_linear)
+        self.current_psd = self.psd_db if is_db_scale else self.psd_linear
+        self.psd = self.current_psd
+        
+        # Spectrogram data (FFT_DUAL only); a read-only memmap when a spectrogram_store is given
+        self.has_spectrogram = times is not None and spectrogram is not None
+        self.spectrogram_store = spectrogram_store
+        self._spectrogram_db = None
+        if self.has_spectrogram:
+            self.times = times
+            self.spectrogram_linear = store_spectrogram(spectrogram, spectrogram_store)
+            self.spectrogram = self.spectrogram_linear
+        else:
+            self.times = None
+            self.spectrogram = None
+            self.spectrogram_linear = None
+        
+        self.show_max_energy_ridge = show_max_energy_ridge
+        self.show_spectral_veins = show_spectral_veins
+        self.num_veins = num_veins
+        
+        # Set frequency ranges
+        self.peak_fmin = peak_fmin if peak_fmin is not None else np.min(frequencies)
+        self.peak_fmax = peak_fmax if peak_fmax is not None else np.max(frequencies)
+        self.plot_fmin = plot_fmin if plot_fmin is not None else np.min(frequencies)
+        self.plot_fmax = plot_fmax if plot_fmax is not None else min(5000, np.max(frequencies))
+        
+        # peaks: precomputed detect_psd_peaks result (e.g. from detect_peaks_grid)
+        if peaks is None:
+            peaks = detect_psd_peaks(
+                frequencies, self.psd_db, self.peak_fmin, self.peak_fmax,
+                max_peaks=max_peaks,
+                height_percentile=height_percentile,
+                prominence_factor=prominence_factor,
+                min_width=min_width
+            )
+        peak_indices, self.peak_widths, self.freq_resolution = peaks
+        self.peak_freqs = frequencies[peak_indices]
+        self.peak_powers = self.current_psd[peak_indices]
+
+    # dB spectrogram, computed from spectrogram_linear on first access
+    spectrogram_db = property(spectrogram_db_of)
+
+    def get_graph_data(self):
+        """Return a serializable representation of the (empty) pair graph."""
+        return {"nodes": [], "edges": []}
+
+
+
+
 # ==================== INTERACTIVE PLOT CLASS ====================
 
 class EnhancedInteractiveHarmonicPlot:
@@ -576,7 +739,7 @@ class EnhancedInteractiveHarmonicPlot:
              plot_fmin=None, plot_fmax=None, height_percentile=0.5, prominence_factor=0.04,
              min_width=0.5, method_name="FFT_DUAL", top_padding_db=10,
              times=None, spectrogram=None, show_max_energy_ridge=True, 
-             show_spectral_veins=True, num_veins=5):
+             show_spectral_veins=True, num_veins=5, peaks=None, spectrogram_store=None):
         
         self.frequencies = frequencies
         self.psd = psd.copy()
@@ -598,10 +761,13 @@ class EnhancedInteractiveHarmonicPlot:
         # Store spectrogram data if provided
         self.is_spectrogram_db_scale = True  # Default to dB for spectrograms
         self.has_spectrogram = times is not None and spectrogram is not None
+        self.spectrogram_store = spectrogram_store
+        self._spectrogram_db = None
         if self.has_spectrogram:
             self.times = times
-            # Store both linear and dB versions of spectrogram like PSD
-            self.spectrogram_linear = np.maximum(spectrogram.copy(), 1e-15)
+            # Linear spectrogram (a read-only memmap with a spectrogram_store); the dB
+            # version is the spectrogram_db property, computed on first access
+            self.spectrogram_linear = store_spectrogram(spectrogram, spectrogram_store)
 
             # DEBUG: Check spectrogram before dB conversion
             print(f"Spectrogram linear shape: {self.spectrogram_linear.shape}")
@@ -609,22 +775,12 @@ class EnhancedInteractiveHarmonicPlot:
             print(f"Spectrogram has zeros: {np.any(self.spectrogram_linear == 0)}")
             print(f"Spectrogram has negatives: {np.any(self.spectrogram_linear < 0)}")
 
-            self.spectrogram_db = 10 * np.log10(self.spectrogram_linear)
-            
-            # DEBUG: Check after dB conversion
-            print(f"Spectrogram dB type: {type(self.spectrogram_db)}")
-            print(f"Spectrogram dB shape: {self.spectrogram_db.shape}")
-            print(f"Spectrogram dB range: {np.min(self.spectrogram_db)} to {np.max(self.spectrogram_db)}")
-            print(f"Spectrogram dB has inf: {np.any(np.isinf(self.spectrogram_db))}")
-            print(f"Spectrogram dB has nan: {np.any(np.isnan(self.spectrogram_db))}")
-
-            # For backward compatibility, keep original as linear
-            self.spectrogram = self.spectrogram_linear.copy()
+            # For backward compatibility, keep original as linear (read-only, so shared)
+            self.spectrogram = self.spectrogram_linear
         else:
             self.times = None
             self.spectrogram = None
             self.spectrogram_linear = None
-            self.spectrogram_db = None
         
         # Moved out of the else loop to make sure ridge and veins are visible!
         self.show_max_energy_ridge = show_max_energy_ridge
@@ -706,52 +862,17 @@ class EnhancedInteractiveHarmonicPlot:
         title_scale = "(dB)" if is_db_scale else "(linear)"
         ax.set_title(f"{filename} [{self.peak_fmin}-{self.peak_fmax} Hz] >> {self.method_name} {title_scale}")
         
-        # Find peaks using the current scale
-        peak_freq_mask = (frequencies >= self.peak_fmin) & (frequencies <= self.peak_fmax)
-        peak_detection_freqs = frequencies[peak_freq_mask]
-
-        # Use dB scale for peak detection for consistency
-        peak_detection_psd = self.psd_db[peak_freq_mask]
-        
-        # Adaptive peak detection
-        min_desired_peaks = min(10, self.max_peaks)
-        current_height_percentile = self.height_percentile
-        current_prominence_factor = self.prominence_factor
-        
-        all_peaks_indices = []
-        peak_properties = {}
-        
-        while len(all_peaks_indices) < min_desired_peaks and current_height_percentile > 0.2:
-            all_peaks_indices, peak_properties = find_peaks(
-                peak_detection_psd, 
-                height=np.percentile(peak_detection_psd, current_height_percentile*100),
-                prominence=current_prominence_factor*np.std(peak_detection_psd),
-                width=max(self.min_width, 1.0)
+        # Find peaks (on the dB scale, for consistency) and report powers in the current scale,
+        # unless they were precomputed for the whole grid
+        if peaks is None:
+            peaks = detect_psd_peaks(
+                frequencies, self.psd_db, self.peak_fmin, self.peak_fmax,
+                max_peaks=self.max_peaks,
+                height_percentile=self.height_percentile,
+                prominence_factor=self.prominence_factor,
+                min_width=self.min_width
             )
-            
-            if len(all_peaks_indices) < min_desired_peaks:
-                current_height_percentile -= 0.05
-                current_prominence_factor /= 1.5
-        
-        # Calculate peak widths
-        self.freq_resolution = frequencies[1] - frequencies[0] if len(frequencies) > 1 else 1
-        if 'widths' in peak_properties and len(peak_properties['widths']) > 0:
-            self.peak_widths = peak_properties['widths'] * self.freq_resolution
-        else:
-            self.peak_widths = np.zeros(len(all_peaks_indices))
-        
-        # Map to original frequency indices
-        peak_indices_in_original = np.where(peak_freq_mask)[0][all_peaks_indices]
-        
-        # Limit to max_peaks
-        if len(peak_indices_in_original) > self.max_peaks:
-            peak_prominences = np.array([self.psd_db[i] for i in peak_indices_in_original])
-            top_indices = np.argsort(peak_prominences)[::-1][:self.max_peaks]
-            peak_indices_in_original = peak_indices_in_original[top_indices]
-            if len(self.peak_widths) == len(all_peaks_indices):
-                self.peak_widths = self.peak_widths[top_indices]
-        
-
+        peak_indices_in_original, self.peak_widths, self.freq_resolution = peaks
         self.peak_freqs = frequencies[peak_indices_in_original]
         self.peak_powers = self.current_psd[peak_indices_in_original]
 
@@ -777,12 +898,16 @@ class EnhancedInteractiveHarmonicPlot:
         self.pair_markers = []
         self.width_markers = []
         self.legend_text = []
+        import networkx as nx
         self.graph = nx.Graph()
         
             
         self.fig.canvas.draw_idle()
 
 
+    # dB spectrogram, computed from spectrogram_linear on first access
+    spectrogram_db = property(spectrogram_db_of)
+
     def _calculate_ylimits(self, top_padding_db=10):
         """Calculate and store y-limits for both dB and linear scales"""
         # Calculate limits for dB scale
@@ -1414,7 +1539,8 @@ class EnhancedInteractiveHarmonicPlot:
         
         # Calculate new veins
         veins = find_spectral_veins(
-            self.spectrogram_linear, self.frequencies, self.times, self.num_veins
+            self.spectrogram_linear, self.frequencies, self.times, self.num_veins,
+            spectrogram_db=self.spectrogram_db
         )
         
         # Draw each vein with different style
@@ -1527,6 +1653,295 @@ def select_audio_files(directory_path, file_patterns=None, file_indices=None,
 
 # ==================== MAIN ANALYSIS FUNCTIONS ====================
 
+# METHOD FUNCTION DICTIONARY
+# Every method takes the shared (y, sr) buffer so each file is decoded only once.
+# Plain module-level functions (no lambdas) so the grid can be shipped to worker processes.
+PSD_METHOD_FUNCS = {
+    "FFT_DUAL": jelfun.calculate_psd_spectro_from_array,
+    "CQT": cqt_based_psd_from_array,
+    "Wavelet": wavelet_packet_psd_from_array,
+    "Improved Wavelet": improved_wavelet_packet_psd_from_array,
+    "Stationary Wavelet": stationary_wavelet_psd_from_array,
+    "Chirplet": chirplet_transform_from_array,
+    "Chirplet Zero": chirplet_transform_zero_padding_from_array,
+    "Multi-Res": multi_resolution_psd_from_array,
+}
+
+# Path-based block-wise variants, used for files longer than stream_min_seconds
+STREAMING_METHOD_FUNCS = {
+    "FFT_DUAL": jelfun.calculate_psd_spectro_streaming,
+    "Stationary Wavelet": stationary_wavelet_psd_streaming,
+}
+
+# Streaming methods that return a spectrogram and so accept max_spec_frames=
+STREAMING_SPEC_METHODS = {"FFT_DUAL"}
+
+# Methods accepting stft_plan=, so a file's identical STFTs are computed once across them
+STFT_PLAN_METHODS = {"FFT_DUAL", "Multi-Res"}
+
+# Multi-signal variants taking a list of (y, sr), used when a batch of files needs the method
+BATCHED_METHOD_FUNCS = {
+    "FFT_DUAL": jelfun.calculate_psd_spectro_from_arrays,
+    "CQT": cqt_based_psd_from_arrays,
+}
+
+# Only files up to this size on disk are decoded ahead for BATCHED_METHOD_FUNCS, so a batch's
+# samples stay small; larger files gain little from batching and run file by file
+BATCH_MAX_FILE_BYTES = 4 * 1024**2
+
+
+def build_method_params(default_params):
+    """Keyword arguments for each PSD_METHOD_FUNCS entry, derived from the analysis defaults."""
+    return {
+        "FFT_DUAL": dict(
+            psd_n_fft=default_params['psd_n_fft'],
+            psd_hop_length=default_params['psd_hop_length'],
+            spec_n_fft=default_params['spec_n_fft'],
+            spec_hop_length=default_params['spec_hop_length'],
+            use_dual_resolution=True,
+            verbose=True
+        ),
+        
+        # "FFT_BASIC": dict(
+        #     psd_n_fft=default_params['n_fft'],
+        #     psd_hop_length=default_params['hop_length'],
+        #     spec_n_fft=default_params['n_fft'],  # Same resolution for basic
+        #     spec_hop_length=default_params['hop_length'],  # Same resolution for basic
+        #     use_dual_resolution=False,  # Single resolution mode
+        #     verbose=True
+        # ),
+        
+        "CQT": dict(
+            bins_per_octave=36, 
+            n_bins=150, 
+            fmin=600, 
+            fmax=default_params['plot_fmax'] * 1.2, 
+            hop_length=default_params['hop_length'],
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Wavelet": dict(
+            wavelet='sym8', 
+            max_level=6, 
+            hop_length=default_params['hop_length'],
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Improved Wavelet": dict(
+            wavelet='sym8', 
+            max_level=6, 
+            hop_length=default_params['hop_length'],
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Stationary Wavelet": dict(
+            wavelet='sym8', 
+            max_level=4, 
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Chirplet": dict(
+            n_chirps=100, 
+            min_freq=20, 
+            max_freq=default_params['plot_fmax'] * 1.2, 
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Chirplet Zero": dict(
+            n_chirps=100, 
+            min_freq=20, 
+            max_freq=default_params['plot_fmax'] * 1.2, 
+            n_fft=default_params['n_fft']
+        ),
+        
+        "Multi-Res": dict(
+            fft_sizes=[512, 1024, 2048, 4096], 
+            n_fft=default_params['n_fft'], 
+            hop_length=default_params['hop_length']
+        ),
+    }
+
+
+def streamed_method_params(file_path, method_names, method_params, stream_options):
+    """Per-method kwargs for the methods that should stream this file, or {} to decode as usual.
+    stream_options: {'min_seconds': ..., 'max_spec_frames': ...}"""
+    if not stream_options or not any(name in STREAMING_METHOD_FUNCS for name in method_names):
+        return {}
+    try:
+        import soundfile as sf
+        duration = sf.info(str(file_path)).duration
+    except Exception:
+        return {}
+    if duration < stream_options.get('min_seconds', 0):
+        return {}
+    streamed = {name: dict(method_params[name]) for name in method_names if name in STREAMING_METHOD_FUNCS}
+    for name in STREAMING_SPEC_METHODS & streamed.keys():
+        streamed[name]['max_spec_frames'] = stream_options.get('max_spec_frames')
+    return streamed
+
+
+def compute_file_methods(file_path, method_names, method_params, cache=None, stream_options=None,
+                         return_timings=False):
+    """Decode one file and run each named method on the shared buffer.
+    With a ResultCache, cached methods are loaded instead and the file is only decoded on a miss.
+    Long files (see streamed_method_params) run STREAMING_METHOD_FUNCS block-wise from disk.
+    STFT_PLAN_METHODS share one jelfun.STFTPlan, so coinciding transforms are computed once.
+    Returns one entry per method: its result tuple, or the exception it raised.
+    With return_timings, returns (results, jelly_metrics.StageMetrics) with a 'decode'
+    stage and one 'psd:<method>' stage per method."""
+    results, metrics = compute_file_batch([file_path], method_names, method_params, cache, stream_options)[0]
+    return (results, metrics) if return_timings else results
+
+
+def compute_file_batch(file_paths, method_names, method_params, cache=None, stream_options=None):
+    """compute_file_methods for several files, returning one (results, StageMetrics) pair per file.
+    BATCHED_METHOD_FUNCS methods run in one call over every small file of the batch that
+    needs them (see BATCH_MAX_FILE_BYTES; not cached, not streamed), so their setup and
+    transforms are shared; the batch call's time is split evenly over those files'
+    psd:<method> stages."""
+    files = []
+    for file_path in file_paths:
+        streamed_params = streamed_method_params(file_path, method_names, method_params, stream_options)
+        cache_keys = {}
+        if cache is not None:
+            try:
+                file_hash = file_content_hash(file_path)
+                cache_keys = {name: cache.make_key(file_hash, name, streamed_params.get(name, method_params[name]))
+                              for name in method_names}
+            except OSError as e:
+                print(f"Result cache skipped for {file_path}: {e}")
+        try:
+            batchable = os.path.getsize(file_path) <= BATCH_MAX_FILE_BYTES
+        except OSError:
+            batchable = False
+        files.append({'path': file_path, 'streamed_params': streamed_params, 'cache_keys': cache_keys,
+                      'batchable': batchable, 'audio': None, 'batched': {}, 'metrics': StageMetrics()})
+
+    def decode(entry):
+        if entry['audio'] is None:
+            with entry['metrics'].stage('decode'):
+                entry['audio'] = jelfun.load_audio(entry['path'])
+        return entry['audio']
+
+    for method_name in method_names:
+        if method_name not in BATCHED_METHOD_FUNCS:
+            continue
+        pending = [entry for entry in files
+                   if entry['batchable'] and method_name not in entry['streamed_params']
+                   and not (method_name in entry['cache_keys'] and entry['cache_keys'][method_name] in cache)]
+        if len(pending) < 2:
+            continue
+        decoded = []
+        for entry in pending:
+            try:
+                decode(entry)
+                decoded.append(entry)
+            except Exception:
+                pass  # The file-by-file pass below records the error
+
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            batch_results = BATCHED_METHOD_FUNCS[method_name]([entry['audio'] for entry in decoded],
+                                                              **method_params[method_name])
+        except Exception as e:
+            print(f"Batched {method_name} failed ({e}), computing file by file")
+            continue
+        wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+        for entry, result in zip(decoded, batch_results):
+            entry['batched'][method_name] = result
+            entry['metrics'].add(f"psd:{method_name}", wall / len(decoded), cpu / len(decoded), count=0)
+
+    rows = []
+    for entry in files:
+        file_path, metrics = entry['path'], entry['metrics']
+        streamed_params, cache_keys = entry['streamed_params'], entry['cache_keys']
+        stft_plan = None
+        results = []
+        for method_name in method_names:
+            with metrics.stage(f"psd:{method_name}"):
+                if method_name in cache_keys and method_name not in entry['batched']:
+                    cached = cache.get(cache_keys[method_name])
+                    if cached is not None:
+                        results.append(cached)
+                        continue
+
+                try:
+                    if method_name in entry['batched']:
+                        result = entry['batched'][method_name]
+                    elif method_name in streamed_params:
+                        result = STREAMING_METHOD_FUNCS[method_name](file_path, **streamed_params[method_name])
+                    else:
+                        # Decode once, on the first method that actually needs the samples
+                        y, sr = decode(entry)
+                        kwargs = method_params[method_name]
+                        if method_name in STFT_PLAN_METHODS:
+                            if stft_plan is None:
+                                stft_plan = jelfun.STFTPlan(y)
+                            kwargs = dict(kwargs, stft_plan=stft_plan)
+                        result = PSD_METHOD_FUNCS[method_name](y, sr, **kwargs)
+                except Exception as e:
+                    results.append(e)
+                    continue
+
+                if method_name in cache_keys:
+                    try:
+                        cache.put(cache_keys[method_name], result)
+                    except OSError as e:
+                        print(f"Could not cache {method_name} for {file_path}: {e}")
+                results.append(result)
+
+        # Release the samples before the next file's methods run
+        entry['audio'] = None
+        if stft_plan is not None:
+            stats = stft_plan.stats()
+            print(f"STFT plan for {os.path.basename(file_path)}: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['bytes'] / 1024**2:.1f} MB")
+        rows.append((results, metrics))
+    return rows
+
+
+def compute_method_grid(file_paths, method_names, method_params, n_workers=None, cache=None,
+                        progress_callback=None, stream_options=None, metrics=None, batch_size=64):
+    """Compute the file x method result grid, one row per file in input order.
+    Runs serially unless n_workers > 1 (or <= 0 for one worker per CPU), in which case
+    files are spread over a process pool and only the numeric results come back.
+    Files go through compute_file_batch batch_size at a time, so BATCHED_METHOD_FUNCS
+    share their work across a batch; a batch's decoded audio is held until it completes.
+    progress_callback(files_done, files_total) is called after each file row completes.
+    metrics: optional jelly_metrics.StageMetrics; every file's decode and psd:<method> stages are merged in."""
+    if n_workers is not None and n_workers <= 0:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers or 1, len(file_paths))
+    # Keep every worker busy: no batch larger than an even share of the files
+    batch_size = max(1, min(batch_size, -(-len(file_paths) // max(n_workers, 1))))
+    batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+
+    def collect(batch_rows):
+        grid = []
+        for rows in batch_rows:
+            for row, file_metrics in rows:
+                if metrics is not None:
+                    metrics.merge(file_metrics)
+                grid.append(row)
+                if progress_callback is not None:
+                    progress_callback(len(grid), len(file_paths))
+        return grid
+
+    if n_workers <= 1:
+        return collect(compute_file_batch(batch, method_names, method_params, cache, stream_options)
+                       for batch in batches)
+
+    from concurrent.futures import ProcessPoolExecutor
+    print(f"Computing {len(file_paths)} files x {len(method_names)} methods on {n_workers} worker processes")
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # map() yields in submission order, so the grid layout is deterministic
+        return collect(executor.map(compute_file_batch, batches,
+                                    [method_names] * len(batches),
+                                    [method_params] * len(batches),
+                                    [cache] * len(batches),
+                                    [stream_options] * len(batches)))
+
+
 def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5, 
                                 # Legacy parameter for backward compatibility
                                 n_fft=None, hop_length=None, 
@@ -1538,7 +1953,11 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
                                 height_percentile=0.6, prominence_factor=0.05,
                                 min_width=0.6, methods=None, 
                                 selected_files=None, use_db_scale=True, 
-                                num_veins=6):
+                                num_veins=6, n_workers=None, cache=None, 
+                                headless=False, progress_callback=None,
+                                stream_min_seconds=None, stream_max_spec_frames=4000,
+                                feature_store=None, metrics=None, batch_size=64,
+                                spectrogram_store=None):
     """
     Create an interactive PSD analysis for all audio files, using multiple methods.
     Each row displays a different audio file, and each column shows a different method.
@@ -1562,9 +1981,22 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
         methods: List of method names to use ["FFT_DUAL", "CQT", "Chirplet Zero", "Multi-Res"]
         selected_files: List of filenames to process (if None, use all .wav files)
         use_db_scale: If True, display PSD in dB scale; if False, use linear scale
+        n_workers: Worker processes for the file x method grid (None/1 = serial, <= 0 = all CPUs)
+        cache: Optional jelly_cache.ResultCache; PSD results are reused across runs on the same audio
+        headless: If True, skip matplotlib entirely and return PSDAnalysisResult objects as plots
+        progress_callback: Optional callable(files_done, files_total) reporting PSD computation progress
+        stream_min_seconds: Files at least this long compute FFT_DUAL and Stationary Wavelet block-wise from disk (None = never)
+        stream_max_spec_frames: Time-column cap for streamed spectrograms (frames are averaged to fit)
+        feature_store: Optional jelly_store.FeatureStore; the Save button also records peaks and pairs there
+        metrics: Optional jelly_metrics.StageMetrics; records decode, psd:<method> and peaks stages
+        batch_size: Files computed together; small files of one sample rate share batched FFT_DUAL and CQT transforms (1 = file by file)
+        spectrogram_store: jelly_spectrograms.SpectrogramStore the plots' spectrograms are written to and memory-mapped from;
+            None creates a temporary one for this analysis, False keeps spectrograms in memory. A store passed in
+            is left open for the caller to close. A temporary one is closed before headless results are returned
+            (their memmaps stay readable); with a figure it is each plot's spectrogram_store, for the caller to close
         
     Returns:
-        Tuple of (figure, plots, save_function)
+        Tuple of (figure, plots, save_function, dir_short_name); figure and save_function are None when headless
     """
 
     # Get audio files
@@ -1604,87 +2036,11 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
         methods = ["FFT_DUAL", "Chirplet Zero"]  # Default to two common methods
     
 
-    # METHOD FUNCTION DICTIONARY
-    method_funcs = {
-        "FFT_DUAL": lambda path: jelfun.calculate_psd_spectro(
-            path, 
-            psd_n_fft=default_params['psd_n_fft'],
-            psd_hop_length=default_params['psd_hop_length'],
-            spec_n_fft=default_params['spec_n_fft'],
-            spec_hop_length=default_params['spec_hop_length'],
-            use_dual_resolution=True,
-            verbose=True
-        ),
-        
-        # "FFT_BASIC": lambda path: jelfun.calculate_psd_spectro(
-        #     path, 
-        #     psd_n_fft=default_params['n_fft'],
-        #     psd_hop_length=default_params['hop_length'],
-        #     spec_n_fft=default_params['n_fft'],  # Same resolution for basic
-        #     spec_hop_length=default_params['hop_length'],  # Same resolution for basic
-        #     use_dual_resolution=False,  # Single resolution mode
-        #     verbose=True
-        # ),
-        
-        "CQT": lambda path: cqt_based_psd(
-            path, 
-            bins_per_octave=36, 
-            n_bins=150, 
-            fmin=600, 
-            fmax=default_params['plot_fmax'] * 1.2, 
-            hop_length=default_params['hop_length'],
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Wavelet": lambda path: wavelet_packet_psd(
-            path, 
-            wavelet='sym8', 
-            max_level=6, 
-            hop_length=default_params['hop_length'],
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Improved Wavelet": lambda path: improved_wavelet_packet_psd(
-            path, 
-            wavelet='sym8', 
-            max_level=6, 
-            hop_length=default_params['hop_length'],
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Stationary Wavelet": lambda path: stationary_wavelet_psd(
-            path, 
-            wavelet='sym8', 
-            max_level=4, 
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Chirplet": lambda path: chirplet_transform(
-            path, 
-            n_chirps=100, 
-            min_freq=20, 
-            max_freq=default_params['plot_fmax'] * 1.2, 
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Chirplet Zero": lambda path: chirplet_transform_zero_padding(
-            path, 
-            n_chirps=100, 
-            min_freq=20, 
-            max_freq=default_params['plot_fmax'] * 1.2, 
-            n_fft=default_params['n_fft']
-        ),
-        
-        "Multi-Res": lambda path: multi_resolution_psd(
-            path, 
-            fft_sizes=[512, 1024, 2048, 4096], 
-            n_fft=default_params['n_fft'], 
-            hop_length=default_params['hop_length']
-        ),
-    }
+    # METHOD PARAMETERS (functions live in PSD_METHOD_FUNCS)
+    method_params = build_method_params(default_params)
 
     # Filter to only use valid methods
-    valid_methods = [(name, method_funcs[name]) for name in methods if name in method_funcs]
+    valid_methods = [name for name in methods if name in PSD_METHOD_FUNCS]
     n_methods = len(valid_methods)
     
     if n_methods == 0:
@@ -1697,58 +2053,78 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
     total_rows = n_files * rows_per_file
     total_cols = cols_per_row
     
-    # Create figure
-    fig, axs = plt.subplots(total_rows, total_cols, figsize=(5*total_cols, 4*rows_per_file*n_files))
-    
-    # Ensure axs is a 2D array even for single plot
-    if total_rows == 1 and total_cols == 1:
-        axs = np.array([[axs]])
-    elif total_rows == 1:
-        axs = axs.reshape(1, -1)
-    elif total_cols == 1:
-        axs = axs.reshape(-1, 1)
-    
     # Get directory name
     dir_short_name = os.path.basename(audio_directory)
     
-    # Add a main title
-    fig.suptitle(f"PSD Analysis Methods Comparison - Dir: {dir_short_name}", fontsize=16)
-    
-    # Add instruction text
-    instruction_text = fig.text(0.08, 0.94, 
-        'LEFT-CLICK: Select peak\n'
-        'RIGHT-CLICK: Pair selected peaks\n'
-        'DOUBLE-CLICK: Remove point/pair\n'
-        'C key: Clear selections\n'
-        'R key: Reset all\n'
-        'D key: Toggle db scale view', 
-        verticalalignment='top',
-        bbox=dict(boxstyle='round', facecolor='lightblue', edgecolor='black', alpha=0.7),
-        fontsize=10)
-
-    # Create interactive plots
-    plots = []
+    # Headless mode returns PSDAnalysisResult objects and never touches matplotlib
+    if not headless:
+        # Create figure
+        plt = get_pyplot()
+        fig, axs = plt.subplots(total_rows, total_cols, figsize=(5*total_cols, 4*rows_per_file*n_files))
+    
+        # Ensure axs is a 2D array even for single plot
+        if total_rows == 1 and total_cols == 1:
+            axs = np.array([[axs]])
+        elif total_rows == 1:
+            axs = axs.reshape(1, -1)
+        elif total_cols == 1:
+            axs = axs.reshape(-1, 1)
+    
+        # Add a main title
+        fig.suptitle(f"PSD Analysis Methods Comparison - Dir: {dir_short_name}", fontsize=16)
+    
+        # Add instruction text
+        instruction_text = fig.text(0.08, 0.94, 
+            'LEFT-CLICK: Select peak\n'
+            'RIGHT-CLICK: Pair selected peaks\n'
+            'DOUBLE-CLICK: Remove point/pair\n'
+            'C key: Clear selections\n'
+            'R key: Reset all\n'
+            'D key: Toggle db scale view', 
+            verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='lightblue', edgecolor='black', alpha=0.7),
+            fontsize=10)
+
+    # Compute every PSD up front (optionally in parallel); plots are assembled below
+    stream_options = None
+    if stream_min_seconds is not None:
+        stream_options = {'min_seconds': stream_min_seconds, 'max_spec_frames': stream_max_spec_frames}
+    file_paths = [os.path.join(audio_directory, filename) for filename in audio_files]
+    grid_results = compute_method_grid(file_paths, valid_methods, method_params, 
+                                       n_workers=n_workers, cache=cache,
+                                       progress_callback=progress_callback,
+                                       stream_options=stream_options,
+                                       metrics=metrics, batch_size=batch_size)
+
+    def report_failure(filename, method_name, row, col, e):
+        print(f"Error from compare_methods with {filename}, method {method_name}: {e}")
+        if not headless:
+            base_filename = os.path.splitext(filename)[0]
+            axs[row, col].text(0.5, 0.5, f"Error:\n{e}", transform=axs[row, col].transAxes,
+                             horizontalalignment='center', verticalalignment='center')
+            axs[row, col].set_title(f"{base_filename} - {method_name} - Failed")
+
+    # Unpack and sanitize every grid cell first, so peaks can be detected for the whole grid at once
+    cells = []
     
     for file_idx, filename in enumerate(audio_files):
-        file_path = os.path.join(audio_directory, filename)
-        base_filename = os.path.splitext(filename)[0]
-        
         # Starting row for this file
         start_row = file_idx * rows_per_file
         # Process each method for this file
-        for method_idx, (method_name, method_func) in enumerate(valid_methods):
+        for method_idx, method_name in enumerate(valid_methods):
             # Calculate row and column for this plot
             row = start_row + (method_idx // cols_per_row)
             col = method_idx % cols_per_row
             
-            # Skip if we're out of grid bounds
-            if row >= total_rows or col >= total_cols:
+            # Skip if we're out of the figure's grid bounds; headless results have no grid
+            if not headless and (row >= total_rows or col >= total_cols):
                 continue
                 
-            # Calculate PSD using the current method
+            # PSD from the current method
             try:
-                #frequencies, psd = method_func(file_path)
-                result = method_func(file_path)
+                result = grid_results[file_idx][method_idx]
+                if isinstance(result, Exception):
+                    raise result
                 if len(result) == 5:  # Support for dual resolution format
                     psd_frequencies, spec_frequencies, times, spectrogram, psd = result
                     frequencies = psd_frequencies  # Use PSD frequencies for peak detection
@@ -1770,8 +2146,59 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
                 
                 # Ensure all values are positive for log scale
                 psd = np.maximum(psd, 1e-10)
-                
-                # Create plot with the results
+                cells.append((filename, method_name, row, col, frequencies, psd, times_arg, spectrogram_arg))
+
+            except Exception as e:
+                report_failure(filename, method_name, row, col, e)
+
+    # Same dB conversion and defaults as the plot classes
+    with measure(metrics, 'peaks'):
+        grid_peaks = detect_peaks_grid(
+            [(cell[4], 10 * np.log10(np.maximum(cell[5], 1e-15))) for cell in cells],
+            peak_fmin, peak_fmax,
+            height_percentile=height_percentile,
+            prominence_factor=prominence_factor,
+            min_width=min_width
+        )
+
+    # Spectrograms go to disk once and are memory-mapped back, so the plots do not hold them in RAM
+    owned_store = None
+    if spectrogram_store is None and any(cell[7] is not None for cell in cells):
+        spectrogram_store = owned_store = SpectrogramStore()
+    # From here on each cell's arrays are only referenced through cells
+    grid_results = result = spectrogram = None
+
+    # Create interactive plots
+    plots = []
+
+    for cell_index, peaks in enumerate(grid_peaks):
+        filename, method_name, row, col, frequencies, psd, times_arg, spectrogram_arg = cells[cell_index]
+        # Release the computed spectrogram as soon as its plot has stored it
+        cells[cell_index] = None
+        base_filename = os.path.splitext(filename)[0]
+        try:
+            # Create plot with the results
+            if headless:
+                plot = PSDAnalysisResult(
+                    frequencies, psd, 
+                    f"{base_filename} ({method_name})", 
+                    max_pairs=max_pairs,
+                    is_db_scale=use_db_scale,
+                    peak_fmin=peak_fmin, 
+                    peak_fmax=peak_fmax,
+                    plot_fmin=plot_fmin, 
+                    plot_fmax=plot_fmax,
+                    height_percentile=height_percentile,
+                    prominence_factor=prominence_factor,
+                    min_width=min_width,
+                    method_name=method_name, 
+                    times=times_arg,
+                    spectrogram=spectrogram_arg, 
+                    num_veins=6,
+                    peaks=peaks,
+                    spectrogram_store=spectrogram_store or None
+                )
+            else:
                 ax = axs[row, col]
                 plot = EnhancedInteractiveHarmonicPlot(
                     frequencies, psd, 
@@ -1792,15 +2219,22 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
                     spectrogram=spectrogram_arg, 
                     show_max_energy_ridge=True, # defaults to true, change to false to initialize off
                     show_spectral_veins=True, # defaults to true, change to false to initialize off
-                    num_veins=6
+                    num_veins=6,
+                    peaks=peaks,
+                    spectrogram_store=spectrogram_store or None
                 )
-                plots.append(plot)
+            # Audio file behind the plot, for the feature store
+            plot.source_path = os.path.join(audio_directory, filename)
+            plots.append(plot)
 
-            except Exception as e:
-                print(f"Error from compare_methods with {filename}, method {method_name}: {e}")
-                axs[row, col].text(0.5, 0.5, f"Error:\n{e}", transform=axs[row, col].transAxes,
-                                 horizontalalignment='center', verticalalignment='center')
-                axs[row, col].set_title(f"{base_filename} - {method_name} - Failed")
+        except Exception as e:
+            report_failure(filename, method_name, row, col, e)
+
+    if headless:
+        if owned_store is not None:
+            owned_store.close()
+        print(f"Headless PSD analysis ready: {len(plots)} results for {n_files} files with methods: {', '.join(valid_methods)}")
+        return None, plots, None, dir_short_name
 
     # Hide any unused subplots
     for row in range(total_rows):
@@ -1813,6 +2247,7 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
     plt.subplots_adjust(top=0.80, right=0.85, hspace=0.4, wspace=0.3)
     
     # Add a custom save button
+    from matplotlib.widgets import Button
     save_ax = fig.add_axes([0.92, 0.01, 0.07, 0.05])
     save_button = Button(save_ax, 'Save')
     
@@ -1821,14 +2256,16 @@ def compare_methods_psd_analysis(audio_directory, max_cols=4, max_pairs=5,
     def save_callback(event):
         fig_path, data_path = save_figure_with_timestamp(fig, plots, 
                                                         base_filename=f"psd_methods_comparison_nfft{n_fft}", 
-                                                        output_directory=f"{daily_dir}/jellyfish_dynamite")
+                                                        output_directory=f"{daily_dir}/jellyfish_dynamite",
+                                                        feature_store=feature_store)
         print(f"Plot saved successfully!")
     
     save_button.on_clicked(save_callback)
     
     # Create specific save function for this figure
     def save_this_figure(base_filename=f"psd_methods_comparison_nfft{n_fft}", output_directory=None):
-        return save_figure_with_timestamp(fig, plots, base_filename, output_directory)
+        return save_figure_with_timestamp(fig, plots, base_filename, output_directory,
+                                          feature_store=feature_store)
     
     method_names_str = ", ".join(methods)
     
@@ -2590,13 +3027,14 @@ document.addEventListener('DOMContentLoaded', function() {{
 
 
 
-from jellyfish_dynamite import save_jellyfish_template
-
-
 # ==================== SAVE FUNCTIONS ====================
 
-def save_figure_with_timestamp(fig, plots, base_filename="psd_anal", output_directory=None):
-    """Save a figure with timestamp as part of the filename for versioning."""
+def save_figure_with_timestamp(fig, plots, base_filename="psd_anal", output_directory=None,
+                               feature_store=None):
+    """
+    Save a figure with timestamp as part of the filename for versioning.
+    With a jelly_store.FeatureStore, peaks and pairs are also recorded there.
+    """
     if output_directory is None:
         daily_dir = jelfun.make_daily_directory()
         output_directory = f"{daily_dir}/jellyfish_dynamite_plots"
@@ -2637,11 +3075,74 @@ def save_figure_with_timestamp(fig, plots, base_filename="psd_anal", output_dire
     print(f"Figure saved to {fig_path}")
     print(f"Data saved to {data_path}")
 
+    if feature_store is not None:
+        record_features(feature_store, plots)
+
     return fig_path, data_path
 
 
-def save_jellyfish_jinja(template_vars, template_name, base_filename="psd_analysis", output_directory=None):
-    """Agnostic Jinja templating function - works with any template and data."""
+def record_features(feature_store, plots, params=None):
+    """Record plots in a jelly_store.FeatureStore; failures are reported, never raised."""
+    try:
+        n_recorded = feature_store.record_plots(plots, params=params)
+        print(f"Features recorded for {n_recorded} plots in {feature_store.db_path}")
+    except Exception as e:
+        print(f"Error recording features: {e}")
+
+
+# HTML templates live next to this module (and in templates/), whatever the working directory
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One Environment per template directory, so each template is compiled once per process
+_jinja_envs = {}
+
+
+def get_jinja_env(template_dir=None):
+    """
+    Cached Jinja environment for template_dir (default: TEMPLATE_DIR plus its templates/).
+    Compiled templates are kept in memory and in a bytecode cache on disk;
+    auto_reload recompiles a template only when its file's mtime changes.
+    """
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+    key = os.path.abspath(template_dir) if template_dir else None
+    if key not in _jinja_envs:
+        search_path = [key] if key else [TEMPLATE_DIR, os.path.join(TEMPLATE_DIR, 'templates')]
+        _jinja_envs[key] = Environment(
+            loader=FileSystemLoader(search_path),
+            bytecode_cache=FileSystemBytecodeCache(),
+            auto_reload=True,
+        )
+    return _jinja_envs[key]
+
+
+def get_jellyfish_template(template_name):
+    """
+    Compiled template by name from TEMPLATE_DIR, or by path for templates elsewhere.
+    Raises jinja2.TemplateNotFound if neither exists.
+    """
+    from jinja2 import TemplateNotFound
+
+    try:
+        return get_jinja_env().get_template(template_name)
+    except TemplateNotFound:
+        # Backward compatibility: a template path relative to the CWD, or absolute
+        if os.path.isfile(template_name):
+            template_dir, name = os.path.split(os.path.abspath(template_name))
+            return get_jinja_env(template_dir).get_template(name)
+        raise
+
+
+def stream_jellyfish_jinja(template_vars, template_name):
+    """Render template_name chunk by chunk (a generator of str), e.g. for a streamed HTTP response."""
+    return get_jellyfish_template(template_name).generate(**template_vars)
+
+
+def save_jellyfish_jinja(template_vars, template_name, base_filename="psd_analysis", output_directory=None,
+                         open_browser=True):
+    """Agnostic Jinja templating function - works with any template and data.
+    Streams the rendered template straight into the output file."""
+    from jinja2 import TemplateNotFound
     
     # Custom JSON encoder for NumPy types
     class NumpyEncoder(json.JSONEncoder):
@@ -2663,29 +3164,28 @@ def save_jellyfish_jinja(template_vars, template_name, base_filename="psd_analys
     # Create directory if it doesn't exist
     os.makedirs(output_directory, exist_ok=True)
     
-    # Load template file
-    if not os.path.exists(template_name):
+    # Load compiled template (cached per process)
+    try:
+        template = get_jellyfish_template(template_name)
+    except TemplateNotFound:
         print(f"Template not found: {template_name}")
-        print(f"Current directory: {os.getcwd()}")
+        print(f"Template directory: {TEMPLATE_DIR}, current directory: {os.getcwd()}")
         return None, None, None
     
-    with open(template_name, 'r', encoding='utf-8') as f:
-        template_content = f.read()
-    
-    # Create Jinja2 template and render
-    template = Template(template_content)
-    html_str = template.render(**template_vars)
-    
     # Define file paths
     html_filename = f"{base_filename}_{jelfun.get_timestamp()}.html"
     html_path = os.path.join(output_directory, html_filename)
     
-    # Save HTML file
+    # Save HTML file - streamed, so the page is never held as one string
     with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_str)
+        for chunk in template.generate(**template_vars):
+            f.write(chunk)
     
     print(f"HTML saved to: {html_path}")
     
+    if not open_browser:
+        return html_path
+
     try:
         webbrowser.open(f'file://{os.path.abspath(html_path)}')
         print(f"Opening HTML file in browser...")
@@ -2698,8 +3198,50 @@ def save_jellyfish_jinja(template_vars, template_name, base_filename="psd_analys
 
 # PLOTLY TEMPLATE ... TEMPLOT??
 
-def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scale=True, **kwargs):
-    """Prepare template variables specifically for Plotly templates with dual scale support."""
+# Typed-array codes shared with decodeTypedArray() in jellyfish_dynamite_plotly.html
+TYPED_ARRAY_CODES = {'float32': '<f4', 'float64': '<f8', 'uint16': '<u2', 'uint8': '<u1'}
+
+
+def encode_typed_array(arr, dtype=None):
+    """
+    Pack a numpy array as a base64 payload for the Plotly template, instead of a JSON list.
+    dtype None keeps float32 data as float32 and everything else as float64 (lossless);
+    'uint16'/'uint8' quantize linearly: value = offset + code * scale.
+    """
+    arr = np.asarray(arr)
+    if dtype is None:
+        dtype = 'float32' if arr.dtype == np.float32 else 'float64'
+    payload = {'shape': list(arr.shape)}
+
+    if dtype in ('uint16', 'uint8'):
+        finite = arr[np.isfinite(arr)]
+        lo, hi = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 0.0)
+        levels = np.iinfo(dtype).max
+        scale = (hi - lo) / levels if hi > lo else 1.0
+        # Non-finite values (e.g. log of zero power) land on the range floor
+        codes = np.round((np.nan_to_num(arr, nan=lo, neginf=lo, posinf=hi).clip(lo, hi) - lo) / scale)
+        data = codes.astype(TYPED_ARRAY_CODES[dtype])
+        payload.update(scale=scale, offset=lo)
+    else:
+        data = np.ascontiguousarray(arr, dtype=TYPED_ARRAY_CODES[dtype])
+
+    payload['dtype'] = TYPED_ARRAY_CODES[dtype][1:]
+    payload['bdata'] = base64.b64encode(data.tobytes()).decode('ascii')
+    return payload
+
+
+def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scale=True,
+                                 spectrogram_dtype='float32', metrics=None, **kwargs):
+    """Prepare template variables specifically for Plotly templates with dual scale support.
+    plots may be EnhancedInteractiveHarmonicPlot or headless PSDAnalysisResult objects.
+
+    Large arrays (frequencies, PSDs, spectrograms) travel once each in ARRAY_DATA as base64
+    typed arrays; traces and meta hold {'__array__': key} references that the template
+    resolves before plotting. spectrogram_dtype: 'float32', 'uint16' or 'uint8'.
+    metrics: optional jelly_metrics.StageMetrics; records ridge_veins and json_serialize stages."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    from plotly.utils import PlotlyJSONEncoder
 
     # Custom JSON encoder for NumPy types
     class NumpyEncoder(json.JSONEncoder):
@@ -2751,6 +3293,14 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
         else:
             return arr
 
+    # Binary payloads, each encoded once and referenced from traces/meta by key
+    array_data = {}
+    trace_array_refs = []  # (trace index, attribute, reference) patched in after to_dict()
+
+    def array_ref(key, arr, dtype=None):
+        array_data[key] = encode_typed_array(arr, dtype)
+        return {'__array__': key}
+
 
     # Process each plot
     for i, plot in enumerate(plots):
@@ -2764,11 +3314,11 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
         row = file_idx + 1
         col = method_idx + 1
                 
-        frequencies = safe_tolist(plot.frequencies)        
+        frequencies = array_ref(f"frequencies_{i}", plot.frequencies)
         
         # Get both linear and dB versions of the data
-        linear_psd = safe_tolist(plot.original_psd if hasattr(plot, 'original_psd') else plot.psd)
-        db_psd = safe_tolist(plot.psd_db)
+        linear_psd = array_ref(f"linear_psd_{i}", plot.original_psd if hasattr(plot, 'original_psd') else plot.psd)
+        db_psd = array_ref(f"db_psd_{i}", plot.psd_db)
         
         # Also get peak data in both scales
         peak_freqs = safe_tolist(plot.peak_freqs)
@@ -2782,6 +3332,8 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
             peak_powers_db.append(float(plot.psd_db[freq_idx]))
 
         # Use the scale parameter to determine starting data
+        starting_psd_values = np.asarray(plot.psd_db if use_db_scale else
+                                         (plot.original_psd if hasattr(plot, 'original_psd') else plot.psd))
         starting_psd = db_psd if use_db_scale else linear_psd
         starting_peak_powers = peak_powers_db if use_db_scale else peak_powers_linear
 
@@ -2790,25 +3342,31 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
         ridge_data = None
         veins_data = None
 
+        # dB spectrogram, computed on access; shared by the veins and the heatmap below
+        spectrogram_db = getattr(plot, 'spectrogram_db', None) if getattr(plot, 'has_spectrogram', False) else None
+
         # BEFORE adding spectrogram to Plotly:
         # Check if this plot has spectrogram data (FFT_DUAL method)
         if (hasattr(plot, 'has_spectrogram') and plot.has_spectrogram and 
             hasattr(plot, 'spectrogram_linear') and plot.spectrogram_linear is not None):
             try:
                 # Calculate spectral ridge
-                ridge_times, ridge_freqs = find_max_energy_ridge(
-                    plot.spectrogram_linear, plot.frequencies, plot.times
-                )
+                with measure(metrics, 'ridge_veins'):
+                    ridge_times, ridge_freqs = find_max_energy_ridge(
+                        plot.spectrogram_linear, plot.frequencies, plot.times
+                    )
                 ridge_data = {
                     'times': safe_tolist(ridge_times),
                     'freqs': safe_tolist(ridge_freqs)
                 }
                 
                 # Calculate spectral veins
-                veins = find_spectral_veins(
-                    plot.spectrogram_linear, plot.frequencies, plot.times, 
-                    num_veins=getattr(plot, 'num_veins', 6)
-                )
+                with measure(metrics, 'ridge_veins'):
+                    veins = find_spectral_veins(
+                        plot.spectrogram_linear, plot.frequencies, plot.times, 
+                        num_veins=getattr(plot, 'num_veins', 6),
+                        spectrogram_db=spectrogram_db
+                    )
                 veins_data = []
                 for vein in veins:
                     veins_data.append({
@@ -2846,7 +3404,7 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
                 print(f"  veins_data length: {len(veins_data)}")
                 print(f"  first vein sample: {veins_data[0] if veins_data else 'None'}")
 
-            times = safe_tolist(plot.times)
+            times = array_ref(f"times_{i}", plot.times)
 
 
         # S P E C T R O G R A M !!!!!
@@ -2854,40 +3412,37 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
 
         # BEFORE adding spectrogram to Plotly:
         if hasattr(plot, 'has_spectrogram') and plot.has_spectrogram:
-            times = safe_tolist(plot.times)
+            times = array_ref(f"times_{i}", plot.times)
             
             # Scale time to PSD range**
-            psd_min = np.min(starting_psd)
-            psd_max = np.max(starting_psd)
+            psd_min = np.min(starting_psd_values)
+            psd_max = np.max(starting_psd_values)
             time_min = np.min(plot.times)
             time_max = np.max(plot.times)
 
             # Scale times to use 50% of PSD range at the top
             psd_range = psd_max - psd_min
-            scaled_times = []
-            for t in plot.times:
-                # Map time to top 50% of PSD range
-                normalized_time = (t - time_min) / (time_max - time_min)  # 0 to 1
-                scaled_time = psd_max - (psd_range * 0.5) + (normalized_time * psd_range * 0.5)
-                scaled_times.append(scaled_time)            
+            # Map time to top 50% of PSD range
+            normalized_times = (np.asarray(plot.times, dtype=np.float64) - time_min) / (time_max - time_min)  # 0 to 1
+            scaled_times = psd_max - (psd_range * 0.5) + (normalized_times * psd_range * 0.5)
 
             # Right before the problematic line:
             print(f"About to check spectrogram for plot {i}")
-            print(f"plot.spectrogram_db type: {type(getattr(plot, 'spectrogram_db', 'MISSING'))}")
+            print(f"plot.spectrogram_db type: {type(spectrogram_db)}")
             
             # Keep as numpy array until the last moment
-            spec_array = plot.spectrogram_db  # Already numpy array
-            spec_array_transposed = spec_array.T  # Transpose the numpy array
+            spec_array = spectrogram_db  # Already numpy array
             
-            # Convert to list only for Plotly
-            spectrogram_data = spec_array_transposed.tolist()
+            # Encoded once, time x frequency; shared by the heatmap z and the PSD trace meta
+            spectrogram_data = array_ref(f"spectrogram_db_{i}", spec_array.T, spectrogram_dtype)
+            heatmap_index = len(plotly_fig.data)
+            trace_array_refs.extend([(heatmap_index, 'x', frequencies),
+                                     (heatmap_index, 'y', array_ref(f"scaled_times_{i}", scaled_times)),
+                                     (heatmap_index, 'z', spectrogram_data)])
             
-            # Add as background heatmap (same axes as PSD)
+            # Add as background heatmap (same axes as PSD); x/y/z are filled in from array_data
             plotly_fig.add_trace(
                 go.Heatmap(
-                    x=frequencies,  # X-axis: frequency (matches PSD)
-                    y=scaled_times,        # Y-axis: time (will be scaled to fit PSD y-range)
-                    z=spectrogram_data,  # converted to list from transposed numpy aray
                     colorscale='magma', #'viridis', 'magma', 'plasma', 'hot', 'turbo', 'jet'
                     opacity=1.0,  # Low opacity for background effect
                     showscale=False, # Remove sidebar for gradient legend
@@ -2901,10 +3456,10 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
             )
 
         # Add main PSD curve with both scales stored on primary Y-axis
+        trace_array_refs.extend([(len(plotly_fig.data), 'x', frequencies),
+                                 (len(plotly_fig.data), 'y', starting_psd)])
         plotly_fig.add_trace(
             go.Scatter(
-                x=frequencies,
-                y=starting_psd,
                 mode='lines',
                 name=f"psd_{i}",
                 line=dict(color='black', width=2),
@@ -2916,8 +3471,8 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
                     'scale_type': 'main_trace',
                     # Add spectrogram meta if available
                     'has_spectrogram': hasattr(plot, 'has_spectrogram') and plot.has_spectrogram,
-                    'spectrogram_linear': safe_tolist(plot.spectrogram_linear) if hasattr(plot, 'spectrogram_linear') else None,
-                    'spectrogram_db': safe_tolist(plot.spectrogram_db) if hasattr(plot, 'spectrogram_db') else None,
+                    # Same payload as the heatmap z (time x frequency); linear is 10 ** (dB / 10)
+                    'spectrogram_db': spectrogram_data if hasattr(plot, 'has_spectrogram') and plot.has_spectrogram else None,
                     'times': times if hasattr(plot, 'has_spectrogram') and plot.has_spectrogram else None,
                     # Add veins and ridges
                     'ridge_data': ridge_data,
@@ -2981,21 +3536,28 @@ def prepare_plotly_template_vars(plots, methods=None, dir_name=None, use_db_scal
         margin=dict(l=50, r=50, t=100, b=50)
     )
 
-    # Convert to JSON
-    fig_json = plotly_fig.to_json()
-    fig_dict = json.loads(fig_json)
+    # Plain dict (no JSON round trip), then point the big trace arrays at array_data
+    fig_dict = plotly_fig.to_dict()
+    for trace_index, attribute, reference in trace_array_refs:
+        fig_dict['data'][trace_index][attribute] = reference
 
 
         
     subplot_titles = [getattr(plot, 'filename', f"Plot {i+1}") for i, plot in enumerate(plots)]
 
+    with measure(metrics, 'json_serialize'):
+        plot_json = json.dumps(fig_dict['data'], cls=PlotlyJSONEncoder)
+        layout_json = json.dumps(fig_dict['layout'], cls=PlotlyJSONEncoder)
+        array_json = json.dumps(array_data)
+
     # Return template variables for Plotly
     return {
         'PLOT_ID': f"plot_{jelfun.get_timestamp()}",
         'PLOT_HEIGHT': max(600, 500 * n_rows),
         'PLOT_WIDTH': max(800, 300 * n_cols),
-        'PLOT_DATA': json.dumps(fig_dict['data']),
-        'LAYOUT_DATA': json.dumps(fig_dict['layout']),
+        'PLOT_DATA': plot_json,
+        'LAYOUT_DATA': layout_json,
+        'ARRAY_DATA': array_json,
         'SUBPLOT_TITLES': json.dumps(subplot_titles), 
         'DIR_NAME': dir_name, 
         'USE_DB_SCALE': 'true' if use_db_scale else 'false',
@@ -3028,6 +3590,7 @@ def save_spectrogram_images(plots, output_directory):
             print(f"DEBUG: Processing spectrogram for plot {i}")
             try:
                 # Create matplotlib figure for spectrogram
+                plt = get_pyplot()
                 fig_spec, ax_spec = plt.subplots(figsize=(8, 6))
                 
                 # FIXED: Use imshow instead of pcolormesh for easier handling
@@ -3073,8 +3636,20 @@ def save_spectrogram_images(plots, output_directory):
 
 def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_directory=None, 
                         methods=None, dir_name=None, 
-                        use_db_scale=True, **kwargs):
-    """Convenience wrapper for saving Plotly plots using Jinja templates."""
+                        use_db_scale=True, export_spectrogram_images=True, 
+                        spectrogram_dtype='float32', template_name="jellyfish_dynamite_plotly.html",
+                        extra_template_vars=None, open_browser=True, feature_store=None, metrics=None, **kwargs):
+    """
+    Convenience wrapper for saving Plotly plots using Jinja templates.
+    Accepts EnhancedInteractiveHarmonicPlot or headless PSDAnalysisResult objects;
+    export_spectrogram_images=False skips the matplotlib PNG side files.
+    spectrogram_dtype='uint16' or 'uint8' quantizes the embedded spectrograms for smaller HTML.
+    template_name may be a child template extending jellyfish_dynamite_plotly.html
+    (e.g. templates/analysis_result.html), with its own variables in extra_template_vars.
+    feature_store: optional jelly_store.FeatureStore to record peaks, parameters and pairs in.
+    metrics: optional jelly_metrics.StageMetrics; records png_export, plotly_build (exclusive of
+    ridge_veins and json_serialize), template_render and feature_store stages.
+    """
     n_fft = kwargs.get('n_fft')
     nfft_suffix = f"_nfft{n_fft}" if n_fft else ""
 
@@ -3085,10 +3660,16 @@ def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_dir
     os.makedirs(output_directory, exist_ok=True)
 
     # generate spectrogram images with proper output directory
-    spectrogram_images = save_spectrogram_images(plots, output_directory)
+    if export_spectrogram_images:
+        with measure(metrics, 'png_export'):
+            spectrogram_images = save_spectrogram_images(plots, output_directory)
+    else:
+        spectrogram_images = [None] * len(plots)
 
     # Prepare Plotly-specific template variables
-    template_vars = prepare_plotly_template_vars(plots, methods, dir_name, use_db_scale)
+    with measure(metrics, 'plotly_build'):
+        template_vars = prepare_plotly_template_vars(plots, methods, dir_name, use_db_scale,
+                                                     spectrogram_dtype=spectrogram_dtype, metrics=metrics)
 
     # ADD SPECTROGRAM DATA TO TEMPLATE VARS
     template_vars['SPECTROGRAM_IMAGES'] = json.dumps(spectrogram_images)
@@ -3119,11 +3700,13 @@ def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_dir
     print(f"DEBUG: Grid dimensions - {n_files} files × {n_methods} methods = {len(plots)} total plots")
 
 
-    # Use the Plotly template
-    template_name = "jellyfish_dynamite_plotly.html"
+    if extra_template_vars:
+        template_vars.update(extra_template_vars)
 
     # Call the agnostic Jinja function
-    html_path = save_jellyfish_jinja(template_vars, template_name, base_filename, output_directory)
+    with measure(metrics, 'template_render'):
+        html_path = save_jellyfish_jinja(template_vars, template_name, base_filename, output_directory,
+                                         open_browser=open_browser)
 
     # Save pair and graph data (existing code from original function)
     data_filename = f"{dir_name}_{base_filename}{nfft_suffix}_{jelfun.get_timestamp()}_pairdata.json"
@@ -3146,7 +3729,7 @@ def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_dir
                     })
         export_data.append(file_data)
 
-    with open(data_path, 'w', encoding='utf-8') as f:
+    with measure(metrics, 'json_serialize'), open(data_path, 'w', encoding='utf-8') as f:
         json.dump(export_data, f, indent=2)
 
     # Save graph data
@@ -3192,12 +3775,16 @@ def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_dir
         }
         graph_export_data.append(file_data)
 
-    with open(graph_path, 'w', encoding='utf-8') as f:
+    with measure(metrics, 'json_serialize'), open(graph_path, 'w', encoding='utf-8') as f:
         json.dump(graph_export_data, f, indent=2)
 
     print(f"Data saved to: {data_path}")
     print(f"Graph data saved to: {graph_path}")
 
+    if feature_store is not None:
+        with measure(metrics, 'feature_store'):
+            record_features(feature_store, plots, params=kwargs)
+
     return html_path, data_path, graph_path
 
 
@@ -3206,6 +3793,12 @@ def save_jellyfish_plotly(plots, base_filename="psd_analysis_plotly", output_dir
 # GEOLOGY MODS
 def main():
     import platform
+    import matplotlib
+    plt = get_pyplot()
+
+    # 2453 [58] has fewest number of chirps. 70 directories total. 
+    slicedir = Path('tranche/slices')
+    all_slicedirs = jelfun.get_subdir_pathlist(slicedir)
 
     try:
         import ipympl
@@ -3284,6 +3877,9 @@ def main():
             show_ridge=True, 
             show_veins=True
         )
+        # The figure's plots share one temporary spectrogram store
+        if plots and plots[0].spectrogram_store is not None:
+            plots[0].spectrogram_store.close()
     else:
         print("No audio files found or analysis failed.")
 
@@ -0,0 +1,14 @@
+# conftest.py
+
+# The modules live at the top level of the repository, next to this directory
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_AUDIO_DIR = os.path.join(REPO_DIR, 'test_audio')
+sys.path.insert(0, REPO_DIR)
+
+# Importing jelly_app must not create a feature store or result cache in the working directory
+os.environ.setdefault('FEATURE_STORE_PATH', '')
+os.environ.setdefault('RESULT_CACHE_DIR', '')
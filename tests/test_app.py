@@ -0,0 +1,47 @@
+# test_app.py
+
+import io
+import os
+
+import pytest
+
+from conftest import TEST_AUDIO_DIR
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import jelly_app
+
+    monkeypatch.setitem(jelly_app.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    return jelly_app.app.test_client()
+
+
+def wav_upload(name='slice_1.wav'):
+    with open(os.path.join(TEST_AUDIO_DIR, name), 'rb') as f:
+        return io.BytesIO(f.read()), name
+
+
+def test_process_invalid_parameters_is_json_400(client, tmp_path):
+    response = client.post('/process', data={'files': wav_upload(), 'psd_n_fft': 'abc'},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid analysis parameters')
+    assert os.listdir(tmp_path) == []
+
+
+def test_process_without_audio_files_is_json_400(client, tmp_path):
+    response = client.post('/process', data={'files': (io.BytesIO(b'text'), 'notes.txt')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No valid audio files uploaded'
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_too_large_is_json_413(client, tmp_path, monkeypatch):
+    import jelly_app
+
+    monkeypatch.setitem(jelly_app.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = client.post('/process', data={'files': wav_upload()}, content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert 'too large' in response.get_json()['error']
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,33 @@
+# test_batch.py
+
+import os
+import shutil
+
+import jelly_batch
+from jelly_store import FeatureStore
+from conftest import TEST_AUDIO_DIR
+
+METHODS = ['FFT_DUAL', 'CQT', 'Multi-Res', 'Wavelet', 'Improved Wavelet', 'Stationary Wavelet']
+
+
+def test_batch_records_every_file_and_method(tmp_path):
+    # Two numbered slice directories of five distinct slices each
+    root = tmp_path / 'slices'
+    for dir_idx in range(2):
+        slice_dir = root / f"slices_{dir_idx + 1}"
+        slice_dir.mkdir(parents=True)
+        for i in range(5):
+            name = f"slice_{dir_idx * 5 + i + 1}.wav"
+            shutil.copyfile(os.path.join(TEST_AUDIO_DIR, name), slice_dir / name)
+    store_path = str(tmp_path / 'features.sqlite')
+    argv = [str(root), '--methods', *METHODS, '--store', store_path, '--cache-dir', '', '--workers', '1']
+
+    assert jelly_batch.main(argv) == 0
+    analyses = FeatureStore(store_path).analyses()
+    assert len(analyses) == 10 * len(METHODS)
+    assert {(row['name'], row['method']) for row in analyses} == {
+        (f"slice_{i}.wav", method) for i in range(1, 11) for method in METHODS}
+
+    # Nothing is left to analyze on a rerun
+    assert jelly_batch.main(argv) == 0
+    assert len(FeatureStore(store_path).analyses()) == 10 * len(METHODS)
@@ -0,0 +1,30 @@
+# test_cqt.py
+
+import warnings
+
+import librosa
+import numpy as np
+import pytest
+
+from jelly_cqt import cqt_plan
+
+
+@pytest.mark.parametrize('sr, fmin, n_bins, bins_per_octave, hop_length', [
+    (44100, 600.0, 150, 36, 128),   # build_method_params defaults
+    (22050, 32.7, 84, 12, 256),
+    (44100, 20.0, 144, 36, 512),    # early downsampling before the first octave
+])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_plan_matches_librosa_cqt_for_every_length(sr, fmin, n_bins, bins_per_octave, hop_length, dtype):
+    plan = cqt_plan(sr, fmin, n_bins, bins_per_octave, hop_length, dtype)
+    rng = np.random.default_rng(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        # One plan serves every signal length
+        for length in (2205, 30001, 44100):
+            y = rng.normal(size=length).astype(dtype)
+            expected = librosa.cqt(y, sr=sr, fmin=fmin, n_bins=n_bins, bins_per_octave=bins_per_octave,
+                                   hop_length=hop_length)
+            actual = plan.transform(y)
+            assert actual.dtype == expected.dtype
+            np.testing.assert_array_equal(actual, expected)
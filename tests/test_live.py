@@ -0,0 +1,37 @@
+# test_live.py
+
+import numpy as np
+
+from jelly_live import FrameRing, LiveSession
+
+SR = 16000
+
+
+def tone(seconds, freq=1000.0):
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_frame_ring_counts_frames_beyond_capacity():
+    ring = FrameRing(1, 4)
+    ring.append(np.arange(10, dtype=np.float32)[np.newaxis, :])
+    assert ring.total == 10
+    assert ring.first_index == 6
+    np.testing.assert_array_equal(ring.ordered()[0], [6, 7, 8, 9])
+    ring.append(np.array([[10, 11]], dtype=np.float32))
+    np.testing.assert_array_equal(ring.ordered()[0], [8, 9, 10, 11])
+
+
+def test_one_large_push_matches_chunked_pushes():
+    samples = tone(3.0)
+    whole = LiveSession(SR, window_seconds=1.0)
+    whole.push(samples)
+    chunked = LiveSession(SR, window_seconds=1.0)
+    for offset in range(0, len(samples), 800):
+        chunked.push(samples[offset:offset + 800])
+
+    expected, actual = chunked.snapshot(), whole.snapshot()
+    assert actual['spectrogram']['times'][0] > 1.9
+    assert actual['spectrogram']['times'] == expected['spectrogram']['times']
+    assert actual['ridge'] == expected['ridge']
+    np.testing.assert_allclose(actual['psd_db'], expected['psd_db'], atol=0.01)
@@ -0,0 +1,28 @@
+# test_store.py
+
+from types import SimpleNamespace
+
+from jelly_store import FeatureStore, plot_pairs
+
+
+def make_plot(source_path, **extra):
+    return SimpleNamespace(source_path=str(source_path), method_name='FFT_DUAL', filename='slice',
+                           peak_freqs=[0.0, 1000.0, 1500.0], peak_powers=[-40.0, -10.0, -12.0],
+                           is_db_scale=True, **extra)
+
+
+def test_record_plots_skips_pairs_with_a_zero_hz_peak(tmp_path):
+    source_path = tmp_path / 'slice.wav'
+    source_path.write_bytes(b'not really audio')
+    pairs = [{'f0': 0.0, 'f1': 1000.0, 'color': 'red'},
+             {'f0': 1500.0, 'f1': 1000.0, 'color': 'blue'}]
+    edges = [{'source': 1000.0, 'target': 0.0, 'color': 'red'},
+             {'source': 1000.0, 'target': 1500.0, 'color': 'blue'}]
+    graph_plot = make_plot(source_path, get_graph_data=lambda: {'edges': edges})
+    assert plot_pairs(graph_plot) == [(1000.0, 1500.0, 1.5, 'blue')]
+
+    store = FeatureStore(str(tmp_path / 'features.sqlite'))
+    assert store.record_plots([make_plot(source_path, pairs=pairs)]) == 1
+    found = store.find_pairs(1.5)
+    assert [(row['f0'], row['f1'], row['color']) for row in found] == [(1000.0, 1500.0, 'blue')]
+    assert len(store.find_peaks(0, 2000)) == 3
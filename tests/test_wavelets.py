@@ -0,0 +1,35 @@
+# test_wavelets.py
+
+import numpy as np
+import pywt
+
+import jellyfish_plotly_browser as jelbrow
+from jelly_wavelets import stationary_wavelet_energies
+
+SR = 22050
+
+
+def test_stationary_wavelet_energies_match_pywt_swt():
+    y = np.random.default_rng(0).normal(size=4096)
+    detail_energies, approx_energies = stationary_wavelet_energies(y, 'sym8', 5)
+    # pywt.swt lists the deepest level first
+    coeffs = pywt.swt(y, 'sym8', level=5)[::-1]
+    np.testing.assert_allclose(detail_energies, [np.sum(cD**2) for _, cD in coeffs], rtol=1e-12)
+    np.testing.assert_allclose(approx_energies, [np.sum(cA**2) for cA, _ in coeffs], rtol=1e-12)
+
+
+def test_stationary_wavelet_psd_keeps_level_one_approximation_band():
+    y = np.random.default_rng(1).normal(size=SR).astype(np.float32)
+    freqs, psd = jelbrow.stationary_wavelet_psd_from_array(y, SR, max_level=6)
+
+    # Reference: the original all-levels pywt.swt implementation, whose lowest band
+    # took the power of coeffs[-1][0] (the level-1 approximation)
+    y_padded = np.pad(y, (0, 2**15 - len(y)))
+    coeffs = pywt.swt(y_padded, 'sym8', level=6)
+    detail_energies = np.array([np.sum(np.abs(cD)**2, dtype=np.float64) for _, cD in reversed(coeffs)])
+    approx_energies = np.array([np.sum(np.abs(coeffs[-1][0])**2, dtype=np.float64)])
+    expected_freqs, expected_psd = jelbrow.stationary_wavelet_psd_from_energies(
+        detail_energies, approx_energies, len(y_padded), SR)
+
+    np.testing.assert_array_equal(freqs, expected_freqs)
+    np.testing.assert_allclose(psd, expected_psd, rtol=1e-6)